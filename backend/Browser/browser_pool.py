@@ -0,0 +1,151 @@
+# browser_pool.py
+import asyncio
+import tempfile
+from typing import Optional, Set
+
+from .webrover_browser import WebRoverBrowser
+
+
+class BrowserPool:
+    """Keeps pre-launched Chrome instances warm and hands them out to sessions.
+
+    Every instance runs on its own free debug port with its own temporary
+    user-data dir, so several research runs can share one host without
+    killing each other's Chrome.
+    """
+
+    def __init__(self,
+                 size: int = 2,
+                 max_size: Optional[int] = None,
+                 headless: bool = False,
+                 proxy: Optional[str] = None):
+        # Number of idle instances kept warm
+        self.size = size
+        # Hard cap on instances alive at once (idle + checked out + launching)
+        self.max_size = max(max_size or size, size)
+        self.headless = headless
+        self.proxy = proxy
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._in_use: Set[WebRoverBrowser] = set()
+        self._launching: Set[asyncio.Task] = set()
+        self._closed = False
+
+    def _total(self) -> int:
+        return self._idle.qsize() + len(self._in_use) + len(self._launching)
+
+    async def _launch(self) -> Optional[WebRoverBrowser]:
+        """Launch one Chrome instance on a free port with a fresh profile dir"""
+        user_data_dir = tempfile.mkdtemp(prefix="webrover_chrome_")
+        browser = WebRoverBrowser(
+            user_data_dir=user_data_dir,
+            headless=self.headless,
+            proxy=self.proxy,
+            debug_port=None,
+        )
+        try:
+            await browser.connect_to_chrome()
+            print(f"Pooled Chrome ready on port {browser.debug_port}")
+            return browser
+        except Exception as e:
+            print(f"Failed to launch pooled Chrome: {e}")
+            # close() also removes the temporary profile dir
+            await browser.close()
+            return None
+
+    async def _launch_into_pool(self):
+        browser = await self._launch()
+        if browser is None:
+            return
+        if self._closed:
+            await browser.close()
+            return
+        await self._idle.put(browser)
+
+    def _replenish(self):
+        """Top up launching tasks until `size` instances are idle or about to be"""
+        if self._closed:
+            return
+        while (self._idle.qsize() + len(self._launching) < self.size
+               and self._total() < self.max_size):
+            task = asyncio.create_task(self._launch_into_pool())
+            self._launching.add(task)
+            task.add_done_callback(self._launching.discard)
+
+    async def start(self):
+        """Launch the warm instances and wait until they are ready"""
+        self._closed = False
+        self._replenish()
+        if self._launching:
+            await asyncio.gather(*list(self._launching), return_exceptions=True)
+        print(f"Browser pool warmed: {self.stats()}")
+
+    async def checkout(self, timeout: float = 60) -> WebRoverBrowser:
+        """Take a healthy browser out of the pool, launching one if none is idle"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            if self._idle.empty() and not self._launching and self._total() < self.max_size:
+                task = asyncio.create_task(self._launch_into_pool())
+                self._launching.add(task)
+                task.add_done_callback(self._launching.discard)
+
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise RuntimeError(f"No browser available in pool after {timeout} seconds")
+            try:
+                browser = await asyncio.wait_for(self._idle.get(), timeout=min(remaining, 1))
+            except asyncio.TimeoutError:
+                continue
+
+            if not browser.is_connected():
+                print(f"Discarding dead pooled Chrome on port {browser.debug_port}")
+                await browser.close()
+                continue
+
+            self._in_use.add(browser)
+            # Start warming a replacement for the one just handed out
+            self._replenish()
+            return browser
+
+    async def checkin(self, browser: WebRoverBrowser):
+        """Return a browser to the pool, replacing it if it is no longer usable"""
+        self._in_use.discard(browser)
+        if self._closed or not browser.is_connected():
+            await browser.close()
+            self._replenish()
+            return
+
+        try:
+            await browser.reset()
+        except Exception as e:
+            print(f"Failed to reset pooled Chrome, replacing it: {e}")
+            await browser.close()
+            self._replenish()
+            return
+
+        if self._idle.qsize() >= self.size:
+            # More idle instances than we keep warm, shrink back down
+            await browser.close()
+        else:
+            await self._idle.put(browser)
+
+    async def close(self):
+        """Shut down every instance owned by the pool"""
+        self._closed = True
+        for task in list(self._launching):
+            task.cancel()
+        browsers = list(self._in_use)
+        self._in_use.clear()
+        while not self._idle.empty():
+            browsers.append(self._idle.get_nowait())
+        for browser in browsers:
+            await browser.close()
+
+    def stats(self) -> dict:
+        return {
+            "idle": self._idle.qsize(),
+            "in_use": len(self._in_use),
+            "launching": len(self._launching),
+            "size": self.size,
+            "max_size": self.max_size,
+        }
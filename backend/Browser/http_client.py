@@ -0,0 +1,144 @@
+# http_client.py
+import asyncio
+import os
+from typing import Optional
+
+import aiohttp
+from dotenv import load_dotenv
+
+load_dotenv()
+
+try:
+    import brotli  # noqa: F401  aiohttp decodes "br" responses when it is installed
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36"
+    ),
+    "Accept-Encoding": ACCEPT_ENCODING,
+}
+
+
+class HttpClient:
+    """One pooled aiohttp session shared by every fetcher in the process.
+
+    Connections are kept alive and reused per host, DNS answers are cached,
+    and each host gets at most `limit_per_host` concurrent connections so a
+    fan-out over one site can't hammer it.
+    """
+
+    def __init__(self,
+                 limit: int = 100,
+                 limit_per_host: int = 8,
+                 dns_ttl: int = 300,
+                 total_timeout: float = 60,
+                 connect_timeout: float = 10,
+                 read_timeout: float = 30):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_ttl = dns_ttl
+        self.timeout = aiohttp.ClientTimeout(
+            total=total_timeout,
+            connect=connect_timeout,
+            sock_read=read_timeout,
+        )
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._counters = {
+            "requests": 0,
+            "errors": 0,
+            "connections_created": 0,
+            "connections_reused": 0,
+            "dns_cache_hits": 0,
+            "dns_cache_misses": 0,
+        }
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        trace = aiohttp.TraceConfig()
+
+        def count(name):
+            async def handler(session, context, params):
+                self._counters[name] += 1
+            return handler
+
+        trace.on_request_start.append(count("requests"))
+        trace.on_request_exception.append(count("errors"))
+        trace.on_connection_create_end.append(count("connections_created"))
+        trace.on_connection_reuseconn.append(count("connections_reused"))
+        trace.on_dns_cache_hit.append(count("dns_cache_hits"))
+        trace.on_dns_cache_miss.append(count("dns_cache_misses"))
+        return trace
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """The shared session, created on first use in the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            if self._session is not None and not self._session.closed:
+                self._discard(self._session, self._loop)
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_ttl,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout,
+                headers=DEFAULT_HEADERS,
+                auto_decompress=True,
+                trace_configs=[self._trace_config()],
+            )
+            self._loop = loop
+        return self._session
+
+    @staticmethod
+    def _discard(session: aiohttp.ClientSession, loop: Optional[asyncio.AbstractEventLoop]):
+        """Close a session left behind by another event loop, so its pooled sockets don't leak"""
+        if loop is not None and loop.is_running():
+            # Still serving another thread, close it there
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+            return
+        connector = session.connector
+        session.detach()
+        if connector is not None:
+            asyncio.ensure_future(HttpClient._close_connector(connector))
+
+    @staticmethod
+    async def _close_connector(connector: aiohttp.BaseConnector):
+        try:
+            await connector.close()
+        except RuntimeError as e:
+            # The loop is closed, its transports went with it
+            print(f"Discarded HTTP session of a closed event loop: {e}")
+
+    def get(self, url: str, **kwargs):
+        """`async with http_client.get(url) as response:` on the shared session"""
+        return self.session.get(url, **kwargs)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def stats(self) -> dict:
+        stats = dict(self._counters)
+        stats.update({"limit": self.limit, "limit_per_host": self.limit_per_host, "open": False})
+        if self._session is not None and not self._session.closed:
+            connector = self._session.connector
+            stats.update({
+                "open": True,
+                # Private connector state, aiohttp exposes no public pool counters
+                "in_use": len(getattr(connector, "_acquired", ())),
+                "idle": sum(len(conns) for conns in getattr(connector, "_conns", {}).values()),
+            })
+        return stats
+
+
+http_client = HttpClient(
+    limit=int(os.getenv("HTTP_POOL_LIMIT", "100")),
+    limit_per_host=int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "8")),
+)
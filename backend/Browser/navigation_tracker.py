@@ -0,0 +1,88 @@
+# navigation_tracker.py
+import time
+from typing import Dict, Optional
+from urllib.parse import urldefrag, urlparse
+from weakref import WeakKeyDictionary, WeakSet
+
+from playwright.async_api import BrowserContext, Page, Response
+
+
+def content_kind(content_type: str, url: str = "") -> str:
+    """Classify a Content-Type as pdf, html or binary, the url breaks ties for generic types"""
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type == "application/pdf" or (
+        content_type in ("", "application/octet-stream", "binary/octet-stream")
+        and urlparse(url).path.lower().endswith(".pdf")
+    ):
+        return "pdf"
+    if not content_type or content_type.startswith("text/") or "html" in content_type or "xml" in content_type \
+            or "json" in content_type:
+        return "html"
+    return "binary"
+
+
+class NavigationRecord:
+    """What the main frame's last navigation response said about the document"""
+
+    def __init__(self, url: str, status: int, headers: Dict[str, str], response: Optional[Response] = None):
+        self.url = url
+        # Kept for the cookie and auth headers, which `headers` leaves out
+        self.response = response
+        self.status = status
+        self.content_type = headers.get("content-type", "")
+        self.kind = content_kind(self.content_type, url)
+        self.etag = headers.get("etag")
+        self.last_modified = headers.get("last-modified")
+        self.recorded_at = time.time()
+
+    @property
+    def validators(self) -> Dict[str, Optional[str]]:
+        return {"etag": self.etag, "last_modified": self.last_modified}
+
+
+class NavigationTracker:
+    """Records the Content-Type, final URL and validators of every page's main-frame navigation.
+
+    Attached once per browser context, it follows every tab the context
+    opens. Routing reads the record instead of probing the DOM, so a DOI or
+    /download link that lands on a PDF is recognised without an evaluate
+    round-trip.
+    """
+
+    def __init__(self):
+        self._contexts: WeakSet = WeakSet()
+        self._records: WeakKeyDictionary = WeakKeyDictionary()
+        self._counters = {"pdf": 0, "html": 0, "binary": 0}
+
+    def attach(self, context: BrowserContext):
+        if context in self._contexts:
+            return
+        self._contexts.add(context)
+        context.on("page", self._watch)
+        for page in context.pages:
+            self._watch(page)
+
+    def _watch(self, page: Page):
+        def on_response(response: Response):
+            request = response.request
+            # Redirect hops are navigation responses too, only the document that landed counts
+            if not request.is_navigation_request() or response.frame != page.main_frame or 300 <= response.status < 400:
+                return
+            record = NavigationRecord(response.url, response.status, response.headers, response)
+            self._records[page] = record
+            self._counters[record.kind] += 1
+
+        page.on("response", on_response)
+
+    def get(self, page: Page) -> Optional[NavigationRecord]:
+        """The record of the document `page` shows, None if unknown or the page has moved on since"""
+        record = self._records.get(page)
+        if record is None or urldefrag(record.url)[0] != urldefrag(page.url)[0]:
+            return None
+        return record
+
+    def stats(self) -> dict:
+        return {"contexts": len(self._contexts), "pages": len(self._records), "navigations": dict(self._counters)}
+
+
+navigation_tracker = NavigationTracker()
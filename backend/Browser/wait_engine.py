@@ -0,0 +1,169 @@
+# wait_engine.py
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Iterable, Optional
+
+from playwright.async_api import Page
+
+# Per-action upper bounds in ms, most waits resolve far sooner on a page signal
+ACTION_TIMEOUTS = {
+    "click": 5000,
+    "type": 8000,
+    "go_back": 8000,
+    "wait": 10000,
+}
+DEFAULT_TIMEOUT = 5000
+
+# Resolves once no resource has finished loading for `quietMs`
+NETWORK_QUIET_JS = """
+    (quietMs) => new Promise((resolve) => {
+        let timer;
+        const observer = new PerformanceObserver(() => {
+            clearTimeout(timer);
+            timer = setTimeout(done, quietMs);
+        });
+        function done() {
+            observer.disconnect();
+            resolve(true);
+        }
+        observer.observe({ type: 'resource', buffered: false });
+        timer = setTimeout(done, quietMs);
+    })
+"""
+
+# Resolves once the DOM hasn't mutated for `quietMs`
+DOM_STABLE_JS = """
+    (quietMs) => new Promise((resolve) => {
+        let timer;
+        const observer = new MutationObserver(() => {
+            clearTimeout(timer);
+            timer = setTimeout(done, quietMs);
+        });
+        function done() {
+            observer.disconnect();
+            resolve(true);
+        }
+        observer.observe(document.documentElement, { childList: true, subtree: true, attributes: true, characterData: true });
+        timer = setTimeout(done, quietMs);
+    })
+"""
+
+
+class WaitEngine:
+    """Waits on page signals instead of fixed sleeps and records how long each wait took.
+
+    Signals:
+        navigation   - the main frame committed a new document
+        load         - the load event fired
+        network_idle - no resource finished loading for `quiet_ms`
+        dom_stable   - no DOM mutation for `quiet_ms`
+        selector     - `selector` is visible
+    A navigation started by the action is always waited for, whatever the signals.
+    """
+
+    def __init__(self, quiet_ms: int = 300, history: int = 200):
+        self.quiet_ms = quiet_ms
+        self._timings: Dict[str, deque] = {}
+        self._totals: Dict[str, Dict[str, float]] = {}
+        self.history = history
+
+    @asynccontextmanager
+    async def watch(self,
+                    page: Page,
+                    action: str,
+                    until: Iterable[str] = ("dom_stable",),
+                    timeout: Optional[int] = None,
+                    selector: Optional[str] = None):
+        """Run the body (the action), then wait until the page settles or `timeout` ms pass"""
+        loop = asyncio.get_running_loop()
+        navigated = loop.create_future()
+        nav_requested = False
+
+        def on_request(request):
+            nonlocal nav_requested
+            if request.is_navigation_request() and request.frame == page.main_frame:
+                nav_requested = True
+
+        def on_navigated(frame):
+            if frame == page.main_frame and not navigated.done():
+                navigated.set_result(frame.url)
+
+        # Listen before the action runs so a fast navigation isn't missed
+        page.on("request", on_request)
+        page.on("framenavigated", on_navigated)
+        try:
+            yield
+            if timeout is None:
+                # 0 is a real timeout, a "wait 0" must not fall back to the action default
+                timeout = ACTION_TIMEOUTS.get(action, DEFAULT_TIMEOUT)
+            start = loop.time()
+            timed_out = False
+            try:
+                await asyncio.wait_for(
+                    self._settle(page, tuple(until), selector, navigated, lambda: nav_requested),
+                    timeout / 1000,
+                )
+            except asyncio.TimeoutError:
+                # The page is usable even if it never went fully quiet
+                timed_out = True
+            self._record(action, (loop.time() - start) * 1000, timed_out)
+        finally:
+            page.remove_listener("request", on_request)
+            page.remove_listener("framenavigated", on_navigated)
+            if not navigated.done():
+                navigated.cancel()
+
+    async def wait_for(self, page: Page, action: str, until: Iterable[str] = ("dom_stable",),
+                       timeout: Optional[int] = None, selector: Optional[str] = None):
+        """Wait for the page to settle after an action that already ran"""
+        async with self.watch(page, action, until, timeout, selector):
+            pass
+
+    async def _settle(self, page, until, selector, navigated, nav_requested):
+        if "navigation" in until or nav_requested():
+            await navigated
+        await page.wait_for_load_state("domcontentloaded")
+
+        for signal in until:
+            if signal == "load":
+                await page.wait_for_load_state("load")
+            elif signal == "network_idle":
+                await self._quiet(page, NETWORK_QUIET_JS)
+            elif signal == "dom_stable":
+                await self._quiet(page, DOM_STABLE_JS)
+            elif signal == "selector" and selector:
+                await page.wait_for_selector(selector, state="visible")
+
+    async def _quiet(self, page: Page, script: str):
+        try:
+            await page.evaluate(script, self.quiet_ms)
+        except Exception:
+            # The document navigated away mid-wait, settle on the new one instead
+            await page.wait_for_load_state("domcontentloaded")
+            await page.evaluate(script, self.quiet_ms)
+
+    def _record(self, action: str, elapsed_ms: float, timed_out: bool):
+        print(f"Waited {elapsed_ms:.0f}ms after {action}{' (timed out)' if timed_out else ''}")
+        self._timings.setdefault(action, deque(maxlen=self.history)).append(elapsed_ms)
+        totals = self._totals.setdefault(action, {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "timeouts": 0})
+        totals["count"] += 1
+        totals["total_ms"] += elapsed_ms
+        totals["max_ms"] = max(totals["max_ms"], elapsed_ms)
+        totals["timeouts"] += int(timed_out)
+
+    def stats(self) -> dict:
+        stats = {}
+        for action, totals in self._totals.items():
+            recent = sorted(self._timings[action])
+            stats[action] = {
+                "count": totals["count"],
+                "avg_ms": round(totals["total_ms"] / totals["count"], 1),
+                "p50_ms": round(recent[len(recent) // 2], 1),
+                "max_ms": round(totals["max_ms"], 1),
+                "timeouts": totals["timeouts"],
+            }
+        return stats
+
+
+wait_engine = WaitEngine()
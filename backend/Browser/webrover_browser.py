@@ -2,7 +2,7 @@
 import asyncio
 import platform
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Optional, Set, Tuple
 from playwright.async_api import async_playwright, Browser, BrowserContext, Page
 import re
 import os
@@ -11,23 +11,38 @@ import socket
 import subprocess
 import psutil
 import time
+from urllib.parse import urlparse
+
+from .http_client import http_client
+
+# Chrome prints this to stderr once the debugging endpoint is accepting connections
+DEVTOOLS_LISTENING_RE = re.compile(r"DevTools listening on (ws://\S+)")
 
 class WebRoverBrowser:
     def __init__(self, 
                  user_data_dir: Optional[str] = None,
                  headless: bool = False,
-                 proxy: Optional[str] = None):
+                 proxy: Optional[str] = None,
+                 debug_port: Optional[int] = 9222):
         base_dir = self._default_user_dir()
         # Initially just store the base Chrome directory
         self.base_user_dir = base_dir
-        # Will be set after profile selection
-        self.user_data_dir = None
+        # Temporary profile for the launched Chrome, defaults to ./temp_chrome_data
+        self.user_data_dir = user_data_dir
+        # None lets Chrome pick a free port at launch time (used by the browser pool)
+        self.debug_port = debug_port
         self.headless = headless
         self.proxy = proxy
         self._browser: Optional[Browser] = None
         self._context: Optional[BrowserContext] = None
         self._playwright = None
         self.chrome_process = None
+        self.ws_endpoint: Optional[str] = None
+        self._stderr_drain: Optional[asyncio.Task] = None
+        # Origins pages navigated to since the last reset, their site data is cleared on reset
+        self._visited_origins: Set[str] = set()
+        # Chrome keeps HTTP auth credentials per browser with no way to clear them over CDP
+        self._saw_auth_challenge = False
 
     def _default_user_dir(self) -> str:
         """Get platform-specific default user data directory"""
@@ -72,6 +87,14 @@ class WebRoverBrowser:
         
         raise RuntimeError(f"Chrome executable not found on {system}")
 
+    @property
+    def context(self) -> Optional[BrowserContext]:
+        return self._context
+
+    def is_connected(self) -> bool:
+        """Check if the CDP connection to Chrome is still alive"""
+        return self._browser is not None and self._browser.is_connected()
+
     def _kill_existing_chrome_processes(self):
         """Kill any existing Chrome processes that might be using the debug port"""
         try:
@@ -79,7 +102,7 @@ class WebRoverBrowser:
                 try:
                     if proc.info['name'] and 'chrome' in proc.info['name'].lower():
                         cmdline = proc.info.get('cmdline', [])
-                        if cmdline and any('--remote-debugging-port=9222' in arg for arg in cmdline):
+                        if cmdline and any(f'--remote-debugging-port={self.debug_port}' in arg for arg in cmdline):
                             print(f"Killing existing Chrome process with PID {proc.info['pid']}")
                             proc.kill()
                             proc.wait(timeout=5)
@@ -88,8 +111,9 @@ class WebRoverBrowser:
         except Exception as e:
             print(f"Warning: Could not kill existing Chrome processes: {e}")
 
-    def _is_port_available(self, port: int = 9222) -> bool:
+    def _is_port_available(self, port: Optional[int] = None) -> bool:
         """Check if the debug port is available"""
+        port = port or self.debug_port
         try:
             with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
                 sock.settimeout(1)
@@ -104,43 +128,29 @@ class WebRoverBrowser:
         """Connect to existing Chrome instance with retry logic"""
         self._playwright = await async_playwright().start()
         
-        # Kill any existing Chrome processes using the debug port
-        self._kill_existing_chrome_processes()
-        
-        # Wait a bit for processes to fully terminate
-        await asyncio.sleep(2)
+        if self.debug_port is not None:
+            # Kill any existing Chrome processes using the debug port
+            # (waits for each process to exit, so no extra settle time is needed)
+            self._kill_existing_chrome_processes()
         
         print("Starting Chrome with remote debugging...")
-        chrome_process = await self.launch_chrome_with_remote_debugging()
-        
-        # Wait longer for Chrome to start
-        await asyncio.sleep(5)
+        chrome_process = await self.launch_chrome_with_remote_debugging(timeout=timeout)
         
         print("Attempting to connect to Chrome...")
+        backoff = 0.1
         for attempt in range(retries):
             try:
-                # Get the WebSocket endpoint from Chrome's debugging API
-                ws_endpoint = None
-                print("Getting browser websocket URL")
-                
-                async with aiohttp.ClientSession() as session:
-                    try:
-                        async with session.get("http://127.0.0.1:9222/json/version", timeout=10) as response:
-                            if response.status == 200:
-                                data = await response.json()
-                                ws_endpoint = data.get('webSocketDebuggerUrl')
-                            else:
-                                raise aiohttp.ClientError(f"HTTP {response.status}")
-                    except Exception as e:
-                        print(f"Failed to get WebSocket endpoint: {e}")
-                        raise
+                # First attempt uses the endpoint Chrome announced at startup,
+                # retries rediscover it through the debugging API
+                ws_endpoint = self.ws_endpoint or await self._fetch_ws_endpoint()
                 
                 if not ws_endpoint:
                     raise RuntimeError("Could not get WebSocket debugger URL")
                 
                 print(f"Connecting to WebSocket endpoint: {ws_endpoint}")
                 self._browser = await self._playwright.chromium.connect_over_cdp(
-                    ws_endpoint
+                    ws_endpoint,
+                    timeout=timeout * 1000
                 )
 
                 print("Connected to browser:", self._browser)
@@ -150,6 +160,7 @@ class WebRoverBrowser:
                 if not contexts:
                     raise RuntimeError("No browser contexts available after connection")
                 self._context = contexts[0]
+                self._track_origins()
                 print("Context: ", self._context)
                 
                 print("Successfully connected to Chrome")
@@ -157,6 +168,7 @@ class WebRoverBrowser:
             
             except Exception as e:
                 print(f"Connection attempt {attempt + 1} failed: {str(e)}")
+                self.ws_endpoint = None
                 if attempt == retries - 1:
                     # If all attempts failed, try to restart Chrome
                     if chrome_process and chrome_process.returncode is None:
@@ -168,10 +180,81 @@ class WebRoverBrowser:
                     
                     raise RuntimeError(f"Failed to connect to Chrome after {retries} attempts: {str(e)}")
                 
-                # Wait before retrying
-                await asyncio.sleep(3)
+                # Exponential backoff before retrying
+                await asyncio.sleep(backoff)
+                backoff *= 2
+
+    async def _fetch_ws_endpoint(self) -> Optional[str]:
+        """Get the browser WebSocket URL from Chrome's debugging API"""
+        print("Getting browser websocket URL")
+        url = f"http://127.0.0.1:{self.debug_port}/json/version"
+        async with http_client.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
+            if response.status != 200:
+                raise aiohttp.ClientError(f"HTTP {response.status}")
+            data = await response.json()
+            return data.get('webSocketDebuggerUrl')
+
+    async def _read_ws_from_stderr(self, stderr: asyncio.StreamReader) -> Optional[str]:
+        """Return the endpoint from Chrome's "DevTools listening on" line, None if stderr closes first"""
+        while True:
+            line = await stderr.readline()
+            if not line:
+                return None
+            match = DEVTOOLS_LISTENING_RE.search(line.decode(errors="ignore"))
+            if match:
+                return match.group(1)
+
+    async def _read_ws_from_active_port_file(self) -> str:
+        """Poll the DevToolsActivePort file Chrome writes into its profile dir, backing off exponentially"""
+        active_port_file = Path(self.user_data_dir) / "DevToolsActivePort"
+        delay = 0.02
+        while True:
+            try:
+                lines = active_port_file.read_text().splitlines()
+                if len(lines) >= 2:
+                    return f"ws://127.0.0.1:{lines[0].strip()}{lines[1].strip()}"
+            except (FileNotFoundError, PermissionError):
+                pass
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+    async def _drain_stderr(self, stderr: asyncio.StreamReader):
+        """Keep reading Chrome's stderr so a full pipe never blocks the browser"""
+        try:
+            while await stderr.readline():
+                pass
+        except Exception:
+            pass
+
+    async def _wait_for_devtools_endpoint(self, process, timeout: float) -> str:
+        """Resolve the browser WebSocket URL as soon as Chrome announces it"""
+        watchers = {asyncio.create_task(self._read_ws_from_active_port_file())}
+        stderr = getattr(process, 'stderr', None)
+        if isinstance(stderr, asyncio.StreamReader):
+            watchers.add(asyncio.create_task(self._read_ws_from_stderr(stderr)))
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        pending = watchers
+        try:
+            while pending:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    endpoint = task.result()
+                    if endpoint:
+                        return endpoint
+                    # stderr closed without announcing an endpoint
+                    raise RuntimeError(f"Chrome exited before opening the debugging port (code {process.returncode})")
+            raise RuntimeError(f"Chrome did not expose a debugging endpoint within {timeout} seconds")
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
 
-    async def launch_chrome_with_remote_debugging(self):
+    async def launch_chrome_with_remote_debugging(self, timeout: float = 30):
         """Launch Chrome with remote debugging port"""
         chrome_path = self._find_chrome_executable()
         
@@ -179,12 +262,17 @@ class WebRoverBrowser:
             raise RuntimeError(f"Chrome executable not found at {chrome_path}")
 
         # Create a temporary user data directory to avoid conflicts
-        temp_user_data = Path.cwd() / "temp_chrome_data"
-        temp_user_data.mkdir(exist_ok=True)
+        temp_user_data = Path(self.user_data_dir) if self.user_data_dir else Path.cwd() / "temp_chrome_data"
+        temp_user_data.mkdir(parents=True, exist_ok=True)
+        self.user_data_dir = str(temp_user_data)
+
+        # A leftover file from a previous run would point at a dead endpoint
+        (temp_user_data / "DevToolsActivePort").unlink(missing_ok=True)
 
         cmd = [
             chrome_path,
-            f"--remote-debugging-port=9222",
+            # Port 0 lets Chrome pick a free port and report it back
+            f"--remote-debugging-port={self.debug_port or 0}",
             f"--user-data-dir={temp_user_data}",
             "--no-first-run",
             "--no-default-browser-check",
@@ -204,6 +292,7 @@ class WebRoverBrowser:
                 "--disable-setuid-sandbox"
             ])
 
+        process = None
         try:
             print("Launching Chrome with command:", " ".join(cmd))
             
@@ -211,8 +300,8 @@ class WebRoverBrowser:
             if platform.system() == "Windows":
                 process = subprocess.Popen(
                     cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
                     creationflags=subprocess.CREATE_NEW_PROCESS_GROUP
                 )
                 # Convert to asyncio process-like object
@@ -220,47 +309,73 @@ class WebRoverBrowser:
             else:
                 process = await asyncio.create_subprocess_exec(
                     *cmd,
-                    stdout=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.DEVNULL,
                     stderr=asyncio.subprocess.PIPE
                 )
                 self.chrome_process = process
             
-            print("Waiting for Chrome to start and verify port is listening")
-            # Wait for Chrome to start and verify port is listening
-            for i in range(20):  # Try for 20 seconds
-                await asyncio.sleep(1)
-                try:
-                    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    sock.settimeout(1)
-                    result = sock.connect_ex(('127.0.0.1', 9222))
-                    sock.close()
-                    if result == 0:
-                        print(f"Chrome started successfully with remote debugging port (attempt {i+1})")
-                        return process
-                except Exception as conn_e:
-                    print(f"Connection check {i+1} failed: {conn_e}")
-                    continue
-            
-            # If we get here, Chrome didn't start properly
-            if hasattr(process, 'stderr') and process.stderr:
-                try:
-                    stderr = await asyncio.wait_for(process.stderr.read(), timeout=1)
-                    print(f"Chrome stderr output: {stderr.decode()}")
-                except:
-                    pass
-            
-            raise RuntimeError("Chrome failed to start with remote debugging port after 20 seconds")
+            print("Waiting for Chrome to announce its DevTools endpoint")
+            started = time.monotonic()
+            self.ws_endpoint = await self._wait_for_devtools_endpoint(process, timeout)
+            self.debug_port = urlparse(self.ws_endpoint).port
+            print(f"Chrome started with remote debugging on port {self.debug_port} in {time.monotonic() - started:.2f}s")
+
+            if isinstance(process.stderr, asyncio.StreamReader):
+                self._stderr_drain = asyncio.create_task(self._drain_stderr(process.stderr))
+            return process
             
         except Exception as e:
             print(f"Error launching Chrome: {e}")
-            if hasattr(process, 'stderr') and process.stderr:
-                try:
-                    stderr = await asyncio.wait_for(process.stderr.read(), timeout=1)
-                    print(f"Chrome stderr output: {stderr.decode()}")
-                except:
-                    pass
+            if process is not None and process.returncode is None:
+                process.kill()
             raise RuntimeError(f"Failed to launch Chrome: {str(e)}")
 
+    def _track_origins(self):
+        def remember(frame):
+            parsed = urlparse(frame.url)
+            if parsed.scheme in ("http", "https"):
+                self._visited_origins.add(f"{parsed.scheme}://{parsed.netloc}")
+
+        def challenged(response):
+            if response.status in (401, 407):
+                self._saw_auth_challenge = True
+
+        def watch(page):
+            page.on("framenavigated", remember)
+            page.on("response", challenged)
+
+        for page in self._context.pages:
+            watch(page)
+        self._context.on("page", watch)
+
+    async def reset(self):
+        """Return the browser to a blank single tab with no state left from the previous tenant"""
+        if not self._context:
+            return
+        if self._saw_auth_challenge:
+            # The pool replaces a browser whose reset fails
+            raise RuntimeError("A page asked for HTTP auth, the cached credentials can't be cleared")
+        # A fresh tab instead of navigating the old one drops its history and sessionStorage
+        old_pages = list(self._context.pages)
+        await self._context.new_page()
+        for page in old_pages:
+            try:
+                await page.close()
+            except Exception as e:
+                print(f"Error closing page during reset: {e}")
+
+        # Logins and granted permissions must not carry over to the next checkout
+        await self._context.clear_cookies()
+        await self._context.clear_permissions()
+        origins, self._visited_origins = self._visited_origins, set()
+        session = await self._browser.new_browser_cdp_session()
+        try:
+            for origin in origins:
+                # localStorage, IndexedDB, service workers, cache storage and the rest
+                await session.send("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+        finally:
+            await session.detach()
+
     async def create_context(self, 
                            viewport: dict = {"width": 2560, "height": 1440},
                            user_agent: str = None) -> BrowserContext:
@@ -284,6 +399,7 @@ class WebRoverBrowser:
             proxy=self._proxy_settings(),
             color_scheme="light",
         )
+        self._track_origins()
 
         await self._add_anti_detection()
         await self._configure_network()
@@ -353,6 +469,9 @@ class WebRoverBrowser:
         except Exception as e:
             print(f"Error stopping playwright: {e}")
             
+        if self._stderr_drain:
+            self._stderr_drain.cancel()
+
         # Clean up Chrome process
         try:
             if self.chrome_process:
@@ -375,7 +494,7 @@ class WebRoverBrowser:
             
         # Clean up temporary user data directory
         try:
-            temp_user_data = Path.cwd() / "temp_chrome_data"
+            temp_user_data = Path(self.user_data_dir) if self.user_data_dir else Path.cwd() / "temp_chrome_data"
             if temp_user_data.exists():
                 import shutil
                 shutil.rmtree(temp_user_data, ignore_errors=True)
@@ -1,19 +1,33 @@
 from Browser.webrover_browser import WebRoverBrowser
+from Browser.browser_pool import BrowserPool
+from Browser.navigation_tracker import navigation_tracker
 from typing import Dict, Any, Tuple
 from playwright.async_api import Page, Browser
 import asyncio
+import os
 
-async def setup_browser(go_to_page: str) -> Tuple[Browser, Page]:
+# Pre-warmed Chrome instances shared by every session of this process
+browser_pool = BrowserPool(
+    size=int(os.getenv("BROWSER_POOL_SIZE", "2")),
+    max_size=int(os.getenv("BROWSER_POOL_MAX_SIZE", "4")),
+    headless=os.getenv("BROWSER_HEADLESS", "false").lower() == "true",
+    proxy=os.getenv("BROWSER_PROXY"),
+)
+
+async def setup_browser(go_to_page: str) -> Tuple[WebRoverBrowser, Page]:
     """
-    Sets up a browser instance and returns the browser and page objects.
+    Checks out a warm browser from the pool and returns the browser and page objects.
     """
     print(f"Setting up browser for {go_to_page}")
     
     try:
-        browser = WebRoverBrowser()
-        browser_obj, context = await browser.connect_to_chrome()
+        browser = await browser_pool.checkout()
+        context = browser.context
+        # Records each tab's navigation Content-Type, so routing never has to probe the DOM
+        navigation_tracker.attach(context)
 
-        page = await context.new_page()
+        # Reuse the blank tab left behind by the pool instead of opening another one
+        page = context.pages[0] if context.pages else await context.new_page()
         
         # Set longer timeout and better error handling
         try:
@@ -35,23 +49,23 @@ async def setup_browser(go_to_page: str) -> Tuple[Browser, Page]:
         
     except Exception as e:
         print(f"Failed to setup browser: {e}")
-        # Make sure to cleanup on failure
+        # Make sure to hand the browser back on failure
         try:
             if 'browser' in locals():
-                await browser.close()
+                await browser_pool.checkin(browser)
         except:
             pass
         raise RuntimeError(f"Browser setup failed: {str(e)}")
 
 async def cleanup_browser_session(browser: WebRoverBrowser) -> None:
     """
-    Cleans up browser session using WebRoverBrowser's close method.
-    This ensures proper cleanup of all resources including context, browser, and playwright.
+    Cleans up browser session by returning the browser to the pool.
+    The pool resets it to a blank tab, or closes and replaces it if it is no longer healthy.
     """
     try:
         if browser:
             print("Starting browser cleanup...")
-            await browser.close()
+            await browser_pool.checkin(browser)
             print("Browser session cleaned up successfully")
     except Exception as e:
         print(f"Error during browser cleanup: {e}")
@@ -0,0 +1,134 @@
+from dotenv import load_dotenv
+import os
+import re
+from collections import deque
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Tuple
+
+# Sentence segmentation and token-sized chunking, run on the CPU pool
+
+load_dotenv()
+
+# Chunks are sized in tokens of the model that embeds them, so none is truncated at embedding time
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+
+# A sentence ends at . ! or ? (plus closing quotes or brackets) before a capitalised word, or at a blank line
+BOUNDARY_RE = re.compile(r"""[.!?]+['"”’)\]]*(?=\s+['"“‘(\[]?[A-Z0-9])|\n[ \t]*\n""")
+LAST_WORD_RE = re.compile(r"([A-Za-z][A-Za-z.]*)$")
+ESTIMATE_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+ABBREVIATIONS = frozenset({
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "vs", "etc", "e.g", "i.e", "al", "approx",
+    "fig", "figs", "eq", "eqs", "ref", "refs", "sec", "ch", "no", "nos", "vol", "pp", "ed", "eds",
+    "inc", "ltd", "co", "corp", "dept", "univ", "jan", "feb", "mar", "apr", "jun", "jul", "aug",
+    "sep", "sept", "oct", "nov", "dec", "u.s", "u.k", "ph.d",
+})
+
+
+class Chunk(NamedTuple):
+    text: str
+    start: int
+    end: int
+    tokens: int
+
+
+def _is_abbreviation(text: str, dot: int) -> bool:
+    match = LAST_WORD_RE.search(text, max(0, dot - 16), dot)
+    if not match:
+        return False
+    word = match.group(1).lower()
+    # Single letters are initials ("J. Smith")
+    return len(word) == 1 or word in ABBREVIATIONS
+
+
+def _trimmed(text: str, start: int, end: int) -> Tuple[int, int]:
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def split_sentences(text: str) -> List[Tuple[int, int]]:
+    """(start, end) offsets of each sentence in `text`, without surrounding whitespace"""
+    spans = []
+    start = 0
+    for match in BOUNDARY_RE.finditer(text):
+        if text[match.start()] == "." and _is_abbreviation(text, match.start()):
+            continue
+        span = _trimmed(text, start, match.end())
+        if span[0] < span[1]:
+            spans.append(span)
+        start = match.end()
+    span = _trimmed(text, start, len(text))
+    if span[0] < span[1]:
+        spans.append(span)
+    return spans
+
+
+@lru_cache(maxsize=None)
+def _tokenizer(model: str):
+    # Loaded once per worker process, None falls back to estimating
+    try:
+        from tokenizers import Tokenizer
+        tokenizer = Tokenizer.from_pretrained(model)
+        tokenizer.no_truncation()
+        tokenizer.no_padding()
+        return tokenizer
+    except Exception as e:
+        print(f"Tokenizer for {model} unavailable, estimating token counts: {e}")
+        return None
+
+
+def count_tokens(texts: List[str], model: str = EMBEDDING_MODEL) -> List[int]:
+    tokenizer = _tokenizer(model)
+    if tokenizer is None:
+        return [len(ESTIMATE_TOKEN_RE.findall(text)) for text in texts]
+    return [len(encoding.ids) for encoding in tokenizer.encode_batch(texts, add_special_tokens=False)]
+
+
+def _token_offsets(text: str, model: str) -> List[Tuple[int, int]]:
+    tokenizer = _tokenizer(model)
+    if tokenizer is None:
+        return [match.span() for match in ESTIMATE_TOKEN_RE.finditer(text)]
+    return tokenizer.encode(text, add_special_tokens=False).offsets
+
+
+def chunk_text(text: str,
+               chunk_tokens: int,
+               overlap_tokens: int = 0,
+               model: Optional[str] = None) -> List[Chunk]:
+    """Pack whole sentences into chunks of at most `chunk_tokens` tokens.
+
+    Consecutive chunks share up to `overlap_tokens` tokens of trailing
+    sentences. A sentence longer than a chunk is cut at token boundaries.
+    Offsets index into `text`, and each chunk's text is `text[start:end]`.
+    """
+    model = model or EMBEDDING_MODEL
+    spans = split_sentences(text)
+    lengths = count_tokens([text[start:end] for start, end in spans], model)
+
+    pieces = []
+    for (start, end), tokens in zip(spans, lengths):
+        if tokens <= chunk_tokens:
+            pieces.append((start, end, tokens))
+            continue
+        offsets = _token_offsets(text[start:end], model)
+        for i in range(0, len(offsets), chunk_tokens):
+            group = offsets[i:i + chunk_tokens]
+            pieces.append((start + group[0][0], start + group[-1][1], len(group)))
+
+    chunks = []
+    window = deque()
+    window_tokens = 0
+    for piece in pieces:
+        if window and window_tokens + piece[2] > chunk_tokens:
+            chunks.append(Chunk(text[window[0][0]:window[-1][1]], window[0][0], window[-1][1], window_tokens))
+            # Keep the trailing sentences that fit in the overlap and still leave room for this one
+            while window and (window_tokens > overlap_tokens or window_tokens + piece[2] > chunk_tokens):
+                window_tokens -= window.popleft()[2]
+        window.append(piece)
+        window_tokens += piece[2]
+    if window:
+        chunks.append(Chunk(text[window[0][0]:window[-1][1]], window[0][0], window[-1][1], window_tokens))
+    return chunks
@@ -0,0 +1,176 @@
+from dotenv import load_dotenv
+import hashlib
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .document_cache import normalize_url
+from .executor import executor
+
+# SimHash fingerprints of stored documents and chunks, so mirrors and syndicated copies are embedded once
+
+load_dotenv()
+
+# Max differing bits out of 64 for two texts to count as near-duplicates
+DEDUP_DOC_DISTANCE = int(os.getenv("DEDUP_DOC_DISTANCE", "3"))
+DEDUP_CHUNK_DISTANCE = int(os.getenv("DEDUP_CHUNK_DISTANCE", "3"))
+
+SHINGLE_SIZE = 3
+# Texts with fewer shingles than this fingerprint too coarsely to compare
+MIN_SHINGLES = 8
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def simhash(text: str) -> Optional[int]:
+    """64-bit SimHash over word 3-gram shingles, None for texts too short to fingerprint"""
+    tokens = TOKEN_RE.findall(text.lower())
+    shingles = {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+    if len(shingles) < MIN_SHINGLES:
+        return None
+    digests = b"".join(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest() for s in shingles)
+    # One row of 64 bits per shingle, a fingerprint bit is set when most shingles set it
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    majority = bits.sum(axis=0, dtype=np.int64) * 2 > len(shingles)
+    return int.from_bytes(np.packbits(majority, bitorder="little").tobytes(), "little")
+
+
+def simhash_many(texts: List[str]) -> List[Optional[int]]:
+    return [simhash(text) for text in texts]
+
+
+class FingerprintIndex:
+    """Finds a stored fingerprint within `distance` bits of a query.
+
+    The 64 bits are split into distance + 1 bands. Two fingerprints that
+    differ in at most `distance` bits agree exactly on at least one band, so
+    only entries sharing a band with the query are compared.
+    """
+
+    def __init__(self, distance: int):
+        self.distance = distance
+        self.bands = distance + 1
+        self.width = 64 // self.bands
+        self._buckets: List[Dict[int, List[Tuple[int, str]]]] = [{} for _ in range(self.bands)]
+        self.size = 0
+
+    def _band_keys(self, fingerprint: int):
+        for band in range(self.bands):
+            shift = band * self.width
+            # The last band takes the bits left over by the integer division
+            width = 64 - shift if band == self.bands - 1 else self.width
+            yield band, (fingerprint >> shift) & ((1 << width) - 1)
+
+    def find(self, fingerprint: int) -> Optional[str]:
+        for band, key in self._band_keys(fingerprint):
+            for other, value in self._buckets[band].get(key, ()):
+                if (fingerprint ^ other).bit_count() <= self.distance:
+                    return value
+        return None
+
+    def add(self, fingerprint: int, value: str):
+        for band, key in self._band_keys(fingerprint):
+            self._buckets[band].setdefault(key, []).append((fingerprint, value))
+        self.size += 1
+
+    def remove(self, value: str):
+        removed = 0
+        for buckets in self._buckets:
+            for key, entries in list(buckets.items()):
+                kept = [entry for entry in entries if entry[1] != value]
+                removed += len(entries) - len(kept)
+                if kept:
+                    buckets[key] = kept
+                else:
+                    del buckets[key]
+        self.size -= removed // self.bands
+
+
+class DedupIndex:
+    """Document and chunk fingerprints per vector store collection.
+
+    A document and its chunks are claimed before they are embedded so
+    concurrent scrapes of two mirrors can't both get in, and released
+    together if storing them fails, so a retry isn't filtered out.
+    Fingerprints live in memory and start empty with the process.
+    """
+
+    def __init__(self, doc_distance: int = DEDUP_DOC_DISTANCE, chunk_distance: int = DEDUP_CHUNK_DISTANCE):
+        self.doc_distance = doc_distance
+        self.chunk_distance = chunk_distance
+        self._documents: Dict[str, FingerprintIndex] = {}
+        self._chunks: Dict[str, FingerprintIndex] = {}
+        self._urls: Dict[str, Dict[str, str]] = {}
+        self._counters = {"documents": 0, "duplicate_documents": 0, "chunks": 0, "duplicate_chunks": 0}
+
+    def _index(self, indexes: Dict[str, FingerprintIndex], collection: str, distance: int) -> FingerprintIndex:
+        if collection not in indexes:
+            indexes[collection] = FingerprintIndex(distance)
+        return indexes[collection]
+
+    async def claim_document(self, collection: str, url: str, text: str) -> Optional[str]:
+        """The url of a stored near-duplicate of `text`, or None after registering `url` as stored"""
+        self._counters["documents"] += 1
+        urls = self._urls.setdefault(collection, {})
+        url_key = normalize_url(url)
+        if url_key in urls:
+            self._counters["duplicate_documents"] += 1
+            return urls[url_key]
+
+        fingerprint = await executor.run_cpu("fingerprint", simhash, text)
+        index = self._index(self._documents, collection, self.doc_distance)
+        # Looked up again, another scrape may have claimed the url while this one was hashing
+        duplicate_of = urls.get(url_key) or (index.find(fingerprint) if fingerprint is not None else None)
+        if duplicate_of is not None:
+            self._counters["duplicate_documents"] += 1
+            return duplicate_of
+
+        urls[url_key] = url
+        if fingerprint is not None:
+            index.add(fingerprint, url)
+        return None
+
+    def release_document(self, collection: str, url: str):
+        """Forget a claimed document that could not be stored, and the chunk fingerprints registered for it"""
+        self._urls.get(collection, {}).pop(normalize_url(url), None)
+        if collection in self._documents:
+            self._documents[collection].remove(url)
+        if collection in self._chunks:
+            self._chunks[collection].remove(url)
+
+    async def filter_chunks(self, collection: str, docs: list) -> list:
+        """The chunks that aren't near-duplicates of stored ones, each kept chunk is registered under its source url"""
+        fingerprints = await executor.run_cpu("fingerprint", simhash_many, [doc.page_content for doc in docs])
+        index = self._index(self._chunks, collection, self.chunk_distance)
+        kept = []
+        for doc, fingerprint in zip(docs, fingerprints):
+            self._counters["chunks"] += 1
+            if fingerprint is not None:
+                if index.find(fingerprint) is not None:
+                    self._counters["duplicate_chunks"] += 1
+                    continue
+                index.add(fingerprint, doc.metadata.get("source", ""))
+            kept.append(doc)
+        return kept
+
+    def clear(self, collection: str):
+        """Drop every fingerprint of a collection, after it is deleted"""
+        self._documents.pop(collection, None)
+        self._chunks.pop(collection, None)
+        self._urls.pop(collection, None)
+
+    def stats(self) -> dict:
+        stats = dict(self._counters)
+        stats["collections"] = {
+            collection: {
+                "documents": len(self._urls.get(collection, {})),
+                "chunks": self._chunks[collection].size if collection in self._chunks else 0,
+            }
+            for collection in set(self._urls) | set(self._chunks)
+        }
+        return stats
+
+
+dedup_index = DedupIndex()
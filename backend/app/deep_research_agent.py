@@ -6,12 +6,11 @@ from playwright.async_api import Page, Locator
 from operator import add
 from pydantic import BaseModel, Field
 from Browser.webrover_browser import WebRoverBrowser
+from Browser.wait_engine import wait_engine
+from Browser.navigation_tracker import navigation_tracker
 from playwright.async_api import async_playwright
 import asyncio
 import platform
-from langchain_text_splitters import NLTKTextSplitter, SpacyTextSplitter
-from newspaper import Article
-import aiohttp
 import asyncio
 import re
 from io import BytesIO
@@ -19,25 +18,22 @@ from langchain_core.output_parsers import StrOutputParser
 import json
 from datetime import datetime
 from dateutil import parser
-from bs4 import BeautifulSoup
 from datetime import datetime, timedelta
 from io import BytesIO
-from PyPDF2 import PdfReader
 from langchain_core.documents import Document
-from langchain_chroma import Chroma
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import SystemMessage, HumanMessage
 from langchain_core.prompts import ChatPromptTemplate
 from langgraph.graph import START, END, StateGraph
-from IPython.display import Image, display
-from langchain_huggingface import HuggingFaceEmbeddings
-import nltk
+from .dom_marking import execute_script, remove_highlights
+from .dom_ranking import rank_elements, resolve_action_element, UnresolvedElement
+from .vector_store import run_collection, vector_stores
+from .model_registry import models
+from .document_cache import document_cache
+from .search import build_search_url, is_results_page, search_engine_host, search_home_url, select_result_links
+from .prefetch import prefetch_registry, PREFETCH_LINKS
+from .rag_pipeline import RagPipeline, duplicate_action, shareable_response
 from urllib.parse import urlparse
 
-#nltk.download('punkt')
-
-embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-
 
 os.environ["CHROMA_TELEMETRY_ENABLED"] = "false"
 load_dotenv()
@@ -53,9 +49,10 @@ for var in vars:
     set_env_vars(var)
 
 
-llm_flash_lite = ChatGoogleGenerativeAI(model="gemini-2.5-flash-lite", temperature=0,api_key=os.getenv("GEMINI_API_KEY"))
-llm_flash = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0,api_key=os.getenv("GEMINI_API_KEY"))
-llm_pro = ChatGoogleGenerativeAI(model="gemini-2.5-pro", temperature=0,api_key=os.getenv("GEMINI_API_KEY"))
+# Built on first use and shared with the other agent, importing the module creates no clients
+llm_flash_lite = models.lazy("gemini-2.5-flash-lite")
+llm_flash = models.lazy("gemini-2.5-flash")
+llm_pro = models.lazy("gemini-2.5-pro")
 
 
 class SourceQuality(BaseModel):
@@ -112,7 +109,7 @@ class DomElement(TypedDict):
 
 class Action(TypedDict):
     thought : str
-    action_type : Literal["click", "type", "scroll_read", "close_page", "wait", "go_back", "go_to_search", "retry"]
+    action_type : Literal["click", "type", "scroll_read", "close_page", "wait", "go_back", "go_to_search", "search", "scrape_results", "retry"]
     args : str 
     action_element : DomElement
 
@@ -141,8 +138,10 @@ class FinalAnswerComponents(BaseModel):
 
 class AgentState(TypedDict):
     input: str
+    run_id: str
     page : Page
     dom_elements : List[DomElement]
+    prompt_elements : List[dict]
     action : Action
     actions_taken : Annotated[List[str], add]
     visited_urls : Annotated[List[str], add]
@@ -154,6 +153,7 @@ class AgentState(TypedDict):
     subtopics: List[str]
     subtopic_status: Annotated[List[str], add]
     subtopic_to_research: str
+    collection: str
     number_of_urls_visited: int
     collect_more_info: Literal[True, False]
 
@@ -163,6 +163,7 @@ async def setup_browser(go_to_page: str):
     print(f"Setting up browser for {go_to_page}")
     browser = WebRoverBrowser()
     browser, context = await browser.connect_to_chrome()
+    navigation_tracker.attach(context)
 
     page = await context.new_page()
     
@@ -181,74 +182,6 @@ async def setup_browser(go_to_page: str):
 from playwright.async_api import async_playwright
 import asyncio
 
-# Load the JavaScript file
-with open("marking_scripts/final_marking.js", "r", encoding="utf-8") as f:
-    marking_script = f.read()
-
-async def execute_script(page):
-
-    await asyncio.sleep(3)
-    
-    # Run the JavaScript marking function
-    dom_tree = await page.evaluate(f"""
-        (function() {{
-            {marking_script}
-            return captureInteractiveElements();
-        }})();
-    """)
-
-        
-    return dom_tree
-
-async def remove_highlights(page):
-
-    await asyncio.sleep(1)
-    # Ensure the function is executed properly
-    await page.evaluate("""
-        (function() {
-            if (typeof unmarkElements === 'function') {
-                unmarkElements();
-            } else {
-                console.error('unmarkElements() not found. Re-injecting...');
-                (function() {
-                    function unmarkElements() {
-                        console.log("Removing highlights...");
-
-                        // Remove highlight container
-                        const highlightContainer = document.getElementById('web-agent-highlight-container');
-                        if (highlightContainer) {
-                            highlightContainer.remove();
-                            console.log("Highlight container removed.");
-                        }
-
-                        // Remove all highlight overlays
-                        document.querySelectorAll("div").forEach(el => {
-                            const style = window.getComputedStyle(el);
-                            if (
-                                (el.id && el.id.includes("highlight")) || 
-                                style.border.includes("2px solid") || 
-                                style.backgroundColor.includes("22") || 
-                                style.zIndex === "2147483647"
-                            ) {
-                                el.remove();
-                            }
-                        });
-
-                        // Remove lingering elements
-                        setTimeout(() => {
-                            document.querySelectorAll("[id^='highlight-'], div[style*='border: 2px solid'], div[style*='z-index: 2147483647']")
-                                .forEach(el => el.remove());
-                        }, 100);
-                    }
-
-                    unmarkElements();
-                })();
-            }
-        })();
-    """)
-
-
-
 # Click
 
 async def click(state: AgentState):
@@ -389,7 +322,8 @@ async def click(state: AgentState):
                 "new_page": False
             }
 
-    await asyncio.sleep(2)
+    # Resolves as soon as the clicked page stops changing
+    await wait_engine.wait_for(state["page"], "click", until=("dom_stable",))
     
     element_description = (
         f"{state['action']['action_element']['type']} element "
@@ -423,29 +357,23 @@ async def type(state: AgentState):
     try:
         bbox_x, bbox_y = state["action"]["action_element"]["x"], state["action"]["action_element"]["y"]
         await page.mouse.click(bbox_x, bbox_y, click_count=3)
-        await asyncio.sleep(1)
         select_all = "Meta+A" if platform.system() == "Darwin" else "Control+A"
         await page.keyboard.press(select_all)
-        await asyncio.sleep(1)
         await page.keyboard.press("Backspace")
-        await asyncio.sleep(1)
         await page.keyboard.type(text)
-        await asyncio.sleep(4)
 
     except Exception as e:
         xpath = state["action"]["action_element"]["xpath"]
         await page.locator(f'xpath={xpath}').click()
-        await asyncio.sleep(1)
         select_all = "document.execCommand('selectAll', false, null);"
         await page.locator(f'xpath={xpath}').evaluate(select_all)
-        await asyncio.sleep(1)
         await page.locator(f'xpath={xpath}').type(text)
-        await asyncio.sleep(4)
         
 
     element_description = f"{state['action']['action_element']['type']} element {state['action']['action_element']['description']}"
-    await page.keyboard.press("Enter")
-    await asyncio.sleep(2)
+    # Submitting usually navigates to a results page, the watch waits for it to commit
+    async with wait_engine.watch(page, "type", until=("dom_stable",)):
+        await page.keyboard.press("Enter")
     
     return {"actions_taken": [f"Typed {text} into {element_description}"]}
 
@@ -539,24 +467,26 @@ async def close_opened_link(state: AgentState):
 # Wait
 
 async def wait(state: AgentState):
-    """Waits for a specified amount of time."""
-    seconds = state["action"]["args"]
-    await asyncio.sleep(5)
-    return {"actions_taken": [f"Waited for {seconds} seconds"]}
+    """Waits for the page to settle, for at most the requested number of seconds."""
+    try:
+        seconds = max(0.0, min(float(state["action"]["args"]), 10))
+    except (TypeError, ValueError):
+        seconds = 5
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    await wait_engine.wait_for(state["page"], "wait", until=("network_idle", "dom_stable"), timeout=int(seconds * 1000))
+    return {"actions_taken": [f"Waited {loop.time() - start:.1f} seconds for the page to settle"]}
 
 
 # Go Back 
 
 async def go_back(state: AgentState):
-    """Goes back to the previous page by calling window.history.back() and waiting for a known element."""
+    """Goes back to the previous page by calling window.history.back() and waiting for it to commit and settle."""
     page = state["page"]
     # Trigger back navigation via JavaScript.
     previous_page = page.url
-    await page.evaluate("window.history.back()")
-    # Wait a bit for the navigation to complete.
-    # Optionally, you can wait for a specific selector you expect on the previous page:
-    # await page.wait_for_selector("css=selector-of-known-element", timeout=30000)
-    await page.wait_for_timeout(5000)
+    async with wait_engine.watch(page, "go_back", until=("navigation", "dom_stable")):
+        await page.evaluate("window.history.back()")
     current_page = page.url
     return {"actions_taken": [f"Navigated back to {current_page} from {previous_page}"]}
 
@@ -565,200 +495,84 @@ async def go_back(state: AgentState):
 # Go to Search 
 
 async def go_to_search(state: AgentState):
-    """Goes to google.com"""
+    """Goes to the search engine's home page"""
     page = state["page"]
-    await page.goto("https://www.google.com", timeout=30000, wait_until="domcontentloaded")
-    return {"actions_taken": [f"Navigated to Google"]}
+    await page.goto(search_home_url(), timeout=30000, wait_until="domcontentloaded")
+    return {"actions_taken": [f"Navigated to {search_engine_host()}"]}
 
-# Scrape Text
-def extract_text_from_html(html_content):
-    """Extract clean text from HTML"""
-    try:
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # Remove unwanted elements
-        for element in soup(['script', 'style', 'nav', 'header', 'footer', 'aside', 'advertisement']):
-            element.decompose()
-        
-        # Try different content selectors in order of preference
-        content_selectors = [
-            # Academic paper selectors
-            '.ltx_document', '.paper-content', '.full-text', '.article-text',
-            # General article selectors  
-            'article', 'main', '.content', '.post-content', '.entry-content',
-            '.article-body', '.story-body', '.text-content', '.main-text',
-            # Fallback selectors
-            '#content', '#main-content', '.main-content', '.container'
-        ]
-        
-        text = ""
-        for selector in content_selectors:
-            elements = soup.select(selector)
-            if elements:
-                text = '\n'.join([elem.get_text(separator=' ', strip=True) for elem in elements])
-                if len(text.strip()) > 100:  # Only use if substantial content
-                    break
-        
-        # If no specific content found, try body
-        if not text or len(text.strip()) < 100:
-            body = soup.find('body')
-            if body:
-                text = body.get_text(separator=' ', strip=True)
-        
-        # Clean up text
-        if text:
-            # Remove excessive whitespace
-            text = re.sub(r'\s+', ' ', text)
-            # Remove common boilerplate
-            text = re.sub(r'(cookies?|privacy policy|terms of service|subscribe|newsletter).*?(?=\.|$)', '', text, flags=re.IGNORECASE)
-            # Clean up
-            text = text.strip()
-        
-        return text if text and len(text.strip()) > 50 else ""
-        
-    except Exception as e:
-        return ""
-async def scrape_text(page):
-    """Enhanced text scraping with multiple extraction methods"""
-    url = page.url
-    
-    # Method 1: Try newspaper3k first
-    try:
-        article = Article(url)
-        article.download()
-        article.parse()
-        
-        if article.text and len(article.text.strip()) > 50:
-            return article.text
-    except:
-        pass
-    
-    # Method 2: Direct HTML scraping with BeautifulSoup
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    html = await response.text()
-                    text = extract_text_from_html(html)
-                    if text and len(text.strip()) > 50:
-                        return text
-    except:
-        pass
-    
-    # Method 3: Try to get content directly from the page object if it has HTML
-    try:
-        if hasattr(page, 'content'):
-            text = extract_text_from_html(page.content())
-            if text and len(text.strip()) > 50:
-                return text
-    except:
-        pass
-    
-    return "No data found"
-    
-# Scrape PDF
 
-async def scrape_pdf(page):
-    """Enhanced PDF scraping"""
-    url = page.url
-    
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                if response.status != 200:
-                    return "Forbidden"
-                
-                content = await response.read()
-                
-                # Check if it's actually a PDF
-                if not content.startswith(b'%PDF'):
-                    return "Not a valid PDF file"
-                
-                # Extract text from PDF
-                try:
-                    pdf_data = BytesIO(content)
-                    reader = PdfReader(pdf_data)
-                    
-                    if len(reader.pages) == 0:
-                        return "No data found"
-                    
-                    text_parts = []
-                    for page_num in range(len(reader.pages)):
-                        try:
-                            page_obj = reader.pages[page_num]
-                            page_text = page_obj.extract_text()
-                            if page_text and page_text.strip():
-                                # Clean up common PDF extraction issues
-                                page_text = re.sub(r'(\w)-\s*\n(\w)', r'\1\2', page_text)  # Fix hyphenated words
-                                page_text = re.sub(r'\s+', ' ', page_text)  # Normalize whitespace
-                                text_parts.append(page_text.strip())
-                        except Exception:
-                            continue  # Skip problematic pages
-                    
-                    full_text = '\n'.join(text_parts)
-                    
-                    if not full_text.strip():
-                        return "No data found"
-                    
-                    return full_text
-                    
-                except Exception as e:
-                    return "Forbidden"
-                    
-    except Exception as e:
-        return "Forbidden"
-# Docs from Text
-
-async def docs_from_text(data, url):
-    text_splitter = NLTKTextSplitter(chunk_size=1200, chunk_overlap=50)
-    texts = text_splitter.split_text(data)
-
-    # Dummy title extraction (can use page.title or OpenGraph scraping later)
-    title = url.split("/")[-1].replace("-", " ").replace(".html", "").title()
-    domain = urlparse(url).netloc
-
-    docs = [
-        Document(
-            page_content=text,
-            metadata={"source": url, "title": title, "domain": domain}
-        ) for text in texts
-    ]
-    return docs
+async def search_subtopic(state: AgentState):
+    """Opens the search results for the subtopic about to be researched"""
+    page = state["page"]
+    subtopic = state["subtopic_to_research"]
+    await page.goto(build_search_url(subtopic), timeout=30000, wait_until="domcontentloaded")
+    # Each subtopic gets its own collection, numbered by the subtopics already answered
+    collection = run_collection(state.get("run_id"), len(state.get("subtopic_status", [])))
+    return {"actions_taken": [f"Searched for {subtopic}"], "collection": collection}
 
 
-async def store_doc_embeddings(docs):
+# Search
 
+async def search(state: AgentState):
+    """Loads the results page for the query in args in a single navigation"""
+    page = state["page"]
+    query = state["action"]["args"]
+    await page.goto(build_search_url(query), timeout=30000, wait_until="domcontentloaded")
+    return {"actions_taken": [f"Searched for {query}"]}
 
-    vector_store = Chroma(
-        collection_name="webpage_rag",
-        embedding_function=embeddings,
-        persist_directory="./rag_store_webpage",  # Where to save data locally, remove if not necessary
-    )
+# WebPage RAG
+
+rag = RagPipeline(chunk_size=250, chunk_overlap=16, clean_pdf=True, page_metadata=True, html_fallback=True)
+
+
+def rag_collection(state: AgentState) -> str:
+    """Vector store collection of the subtopic being researched, set by search_subtopic"""
+    return state.get("collection") or run_collection(state.get("run_id"))
 
-    vector_store.add_documents(docs)
 
 async def web_page_rag(state: AgentState):
     """Searches the web page for relevant information based on the User input"""
     page = state["page"]
 
-    if state["is_pdf"]:
-        result = await scrape_pdf(page)
-    else:
-        result = await scrape_text(page)
+    # Pages seen in this or an earlier run, or prefetched for this one, skip download and extraction
+    cached = await rag.store_cached(page.url, rag_collection(state), state.get("run_id"))
+    if cached:
+        return {"actions_taken": [cached]}
+
+    navigation = navigation_tracker.get(page)
+    if navigation is not None and navigation.kind == "binary":
+        return {"actions_taken": [f"The url {page.url} is a {navigation.content_type} file, not a readable page, should try another url"]}
+
+    is_pdf = navigation.kind == "pdf" if navigation is not None else state["is_pdf"]
+    if is_pdf:
+        return {"actions_taken": [await rag.store_pdf(page.url, rag_collection(state))]}
+
+    result = await rag.scrape_text(page)
 
     if result == "Forbidden":
         return {"actions_taken": [f"Scraping the webpage {page.url} failed, should try another url"]}
     elif result == "No data found":
         return {"actions_taken": [f"No textual content found on the webpage {page.url}, try looking for url that has data"]}
     else:
-        docs = await docs_from_text(result, page.url)
-        print(len(docs))
-
-        await store_doc_embeddings(docs)
+        # The tab carries the session's cookies, only pages fetched without them are shared
+        if navigation is not None and await shareable_response(navigation.response):
+            await document_cache.put(page.url, result, title=await page.title(), **navigation.validators)
+        stored, duplicate_of = await rag.store_text(result, page.url, rag_collection(state))
+        if duplicate_of:
+            return {"actions_taken": [duplicate_action(page.url, duplicate_of)]}
+        print(stored)
 
         return {"actions_taken":[f"Scraped the url {page.url} and stored the information in a vector database for future reference"]}
 
 
+# Scrape Results
+
+async def scrape_results(state: AgentState):
+    """Scrapes the top result links of the current results page concurrently"""
+    return await rag.scrape_results(state["page"], state["dom_elements"], state.get("visited_urls", []),
+                                    rag_collection(state), state.get("run_id"))
+
+
 async def note_scroll_read(state: AgentState):
     page = state["page"]
    
@@ -931,7 +745,7 @@ async def research_router(state: AgentState):
     if subtopic_to_research == "ALL_DONE":
         return "compile_research"
     else:
-        return "go_to_search"
+        return "search_subtopic"
     
 
 async def annotate_page(state: AgentState):
@@ -941,6 +755,16 @@ async def annotate_page(state: AgentState):
 
     await remove_highlights(page)
 
+    if is_results_page(page.url):
+        # Fetch the top results while the LLM decides, a click on one of them then reads from the cache
+        prefetch_registry.schedule(
+            state.get("run_id"),
+            select_result_links(dom_elements, state.get("visited_urls", []), PREFETCH_LINKS),
+        )
+
+    navigation = navigation_tracker.get(page)
+    if navigation is not None:
+        return {"dom_elements": dom_elements, "is_pdf": navigation.kind == "pdf"}
     if dom_elements[0]["type"] == "pdf":
         return {"dom_elements": dom_elements, "is_pdf": True}
     else:
@@ -949,6 +773,14 @@ async def annotate_page(state: AgentState):
 
 
 
+async def rank_dom_elements(state: AgentState):
+    # Keep only what fits the prompt budget, llm_call_node maps the pick back by index
+    prompt_elements = rank_elements(state["dom_elements"], state["subtopic_to_research"])
+    print(f"Ranked {len(prompt_elements)} of {len(state['dom_elements'])} elements for the prompt")
+    return {"prompt_elements": prompt_elements}
+
+
+
 async def llm_call_node(state: AgentState):
 
     template = """ 
@@ -961,7 +793,9 @@ async def llm_call_node(state: AgentState):
     - **Scroll and Read (Scrape+RAG)**: Scroll to reveal and store relevant content.
     - **Close Page**: Close current tab and return to the last tab.
     - **Go Back**: Return to previous page.
-    - **Go to Search**: Navigate to Google.
+    - **Go to Search**: Navigate to the search engine's home page.
+    - **Scrape Results**: On a search results page, read the top unvisited result links at once in background tabs and store them.
+    - **Search**: Open the search results for the query given in args directly. Prefer it over Go to Search + Type in Inputs for new or refined queries.
     - **Wait**: Pause for page loading.
     - **Retry**: Use only when no clear next action exists.
     
@@ -974,8 +808,9 @@ async def llm_call_node(state: AgentState):
     6. **Progress logically** — each action should bring you closer to the final answer.
     
     ## Action Selection Rules
+    - If a results page lists several relevant, unvisited sources → Scrape Results.
     - If there is a relevant, high-quality link → Click it (only if URL not visited before).
-    - If you can refine or improve a search → Type in Inputs.
+    - If you can refine or improve a search → Search with the refined query in args.
     - If there is valuable info on the page without links → Scroll and Read.
     - If stuck after 3 similar actions → Change strategy (new query, new source).
     - If lost or off-track → Go Back or Go to Search.
@@ -984,7 +819,7 @@ async def llm_call_node(state: AgentState):
     Return **one coherent action or sequence**:
     - Thought: Why you chose this action now.
     - Action: The next step.
-    - DOM Element (if applicable): The exact element to interact with.
+    - DOM Element (if applicable): The exact element to interact with, always including its "index".
     - Reasoning: Step-by-step rationale tied to research progress.
     - Never repeat an unproductive search term — modify or try alternatives.
     """
@@ -1008,7 +843,7 @@ async def llm_call_node(state: AgentState):
 
 
     actions_taken = state.get("actions_taken", [])
-    dom_elements = state["dom_elements"]
+    dom_elements = state.get("prompt_elements") or state["dom_elements"]
     input = state["subtopic_to_research"]
     visited_urls = state.get("visited_urls", [])
     alt_queries = state.get("alternative_queries", [])
@@ -1016,7 +851,12 @@ async def llm_call_node(state: AgentState):
 
     response = llm_pro.with_structured_output(Action).invoke(prompt_value)
 
-    action = response
+    try:
+        action = resolve_action_element(response, state["dom_elements"])
+    except UnresolvedElement as e:
+        # Scan the page again and ask for a new pick rather than act without coordinates
+        return {"action": {**response, "action_type": "retry"},
+                "actions_taken": [f"{e}, picking again from the current list of elements"]}
     # Ensure action_element is always a dict
     #if action.get("action_element") is None:
         #action["action_element"] = {}
@@ -1033,6 +873,8 @@ tools = {
     "wait" : "wait",
     "go_back" : "go_back",
     "go_to_search" : "go_to_search",
+    "search" : "search",
+    "scrape_results" : "scrape_results",
 }
 
 def tool_router(state: AgentState):
@@ -1049,8 +891,13 @@ async def scroll_and_read(state: AgentState):
 
     page = state["page"]
     await page.wait_for_load_state("domcontentloaded")
-    
-    page = state["page"]
+
+    # The navigation response already says what the document is
+    navigation = navigation_tracker.get(page)
+    if navigation is not None:
+        return {"is_pdf": navigation.kind == "pdf"}
+
+    # Unknown for pages opened before tracking started, fall back to probing the DOM
     result = await page.evaluate("""
         () => {
             const url = window.location.href.toLowerCase();
@@ -1079,14 +926,8 @@ async def webpage_or_pdf(state: AgentState):
 
 
 async def self_review(state: AgentState):
-    vector_store = Chroma(
-    collection_name="webpage_rag",
-    embedding_function=embeddings,
-    persist_directory="./rag_store_webpage",
-)
-
     input_text = state["subtopic_to_research"]
-    relevant_docs = vector_store.similarity_search(input_text, k=40)
+    relevant_docs = await vector_stores.search(rag_collection(state), input_text, k=40)
 
     print(f"Number of documents: {len(relevant_docs)}")
 
@@ -1148,14 +989,8 @@ def format_references(docs: list[Document]) -> str:
 # Updated subtopic_answer_node with formatted references
 
 async def subtopic_answer_node(state: AgentState):
-    vector_store = Chroma(
-        collection_name="webpage_rag",
-        embedding_function=embeddings,
-        persist_directory="./rag_store_webpage",
-    )
-
     input_text = state["subtopic_to_research"]
-    relevant_docs = vector_store.similarity_search(input_text, k=60)
+    relevant_docs = await vector_stores.search(rag_collection(state), input_text, k=60)
     formatted_references = format_references(relevant_docs)
 
     system_message = """
@@ -1216,15 +1051,8 @@ async def subtopic_answer_node(state: AgentState):
 
 async def empty_rag_store(state : AgentState):
 
-    vector_store = Chroma(
-    collection_name="webpage_rag",
-    embedding_function=embeddings,
-    persist_directory="./rag_store_webpage",
-    )
-
     try:
-        client = vector_store._client  # Access the underlying Chroma client
-        client.delete_collection("webpage_rag")
+        await vector_stores.delete(rag_collection(state))
         return {"actions_taken" : ["Emptied Vector Store"]}
 
     except Exception as e:
@@ -1352,6 +1180,7 @@ builder.add_node("url_decide_node", url_decide_node)
 builder.add_node("topic_breakdown", topic_breakdown)
 builder.add_node("track_subtopic_status", track_subtopic_status)
 builder.add_node("annotate_page", annotate_page)
+builder.add_node("rank_dom_elements", rank_dom_elements)
 builder.add_node("llm_call_node", llm_call_node)
 builder.add_node("click", click)
 builder.add_node("type", type)
@@ -1364,6 +1193,9 @@ builder.add_node("close_page", close_page)
 builder.add_node("wait", wait)
 builder.add_node("go_back", go_back)
 builder.add_node("go_to_search", go_to_search)
+builder.add_node("search", search)
+builder.add_node("scrape_results", scrape_results)
+builder.add_node("search_subtopic", search_subtopic)
 builder.add_node("subtopic_answer_node", subtopic_answer_node)
 builder.add_node("empty_rag_store", empty_rag_store)
 builder.add_node("close_opened_link", close_opened_link)
@@ -1374,9 +1206,10 @@ builder.add_node("compile_research", compile_research)
 builder.add_edge(START, "url_decide_node")
 builder.add_edge("url_decide_node", "topic_breakdown")
 builder.add_edge("topic_breakdown", "track_subtopic_status")
-builder.add_conditional_edges("track_subtopic_status", research_router, ["go_to_search", "compile_research"])
-builder.add_edge("annotate_page", "llm_call_node")
-builder.add_conditional_edges("llm_call_node", tool_router, ["annotate_page", "click", "type", "scroll_and_read", "close_page", "wait", "go_back", "go_to_search"])
+builder.add_conditional_edges("track_subtopic_status", research_router, ["search_subtopic", "compile_research"])
+builder.add_edge("annotate_page", "rank_dom_elements")
+builder.add_edge("rank_dom_elements", "llm_call_node")
+builder.add_conditional_edges("llm_call_node", tool_router, ["annotate_page", "click", "type", "scroll_and_read", "close_page", "wait", "go_back", "go_to_search", "search", "scrape_results"])
 builder.add_edge("scroll_and_read", "web_page_rag")
 builder.add_conditional_edges("scroll_and_read", webpage_or_pdf, ["scroll_page", "scroll_pdf"])
 builder.add_edge("scroll_pdf", "note_scroll_read")
@@ -1394,5 +1227,8 @@ builder.add_edge("close_page", "annotate_page")
 builder.add_edge("wait", "annotate_page")
 builder.add_edge("go_back", "annotate_page")
 builder.add_edge("go_to_search", "annotate_page")
+builder.add_edge("search", "annotate_page")
+builder.add_edge("scrape_results", "self_review")
+builder.add_edge("search_subtopic", "annotate_page")
 
 deep_research_agent = builder.compile()
\ No newline at end of file
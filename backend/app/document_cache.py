@@ -0,0 +1,316 @@
+from dotenv import load_dotenv
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+from Browser.http_client import http_client
+from .executor import executor
+
+# On-disk cache of extracted documents, shared by runs and revalidated over HTTP
+
+load_dotenv()
+
+DOC_CACHE_DIR = os.getenv("DOC_CACHE_DIR", "./doc_cache")
+DOC_CACHE_MAX_BYTES = int(os.getenv("DOC_CACHE_MAX_BYTES", str(500 * 1024 * 1024)))
+# Served without asking the origin for this long, revalidated after that
+DOC_CACHE_FRESH_FOR = int(os.getenv("DOC_CACHE_FRESH_FOR", str(24 * 3600)))
+# Dropped after this long no matter what
+DOC_CACHE_MAX_AGE = int(os.getenv("DOC_CACHE_MAX_AGE", str(30 * 24 * 3600)))
+# Expired entries are swept at most this often
+DOC_CACHE_EVICT_INTERVAL = int(os.getenv("DOC_CACHE_EVICT_INTERVAL", "600"))
+# Size eviction stops once the cache is back under this share of the cap
+EVICT_LOW_WATERMARK = 0.9
+
+TRACKING_PARAMS = ("utm_", "gclid", "fbclid", "mc_cid", "mc_eid", "ref_src")
+
+
+def normalize_url(url: str) -> str:
+    """Cache key for a URL: no fragment, tracking params or default port, sorted query"""
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or "").lower()
+    if parsed.port and not ((scheme == "http" and parsed.port == 80) or (scheme == "https" and parsed.port == 443)):
+        host = f"{host}:{parsed.port}"
+    path = parsed.path or "/"
+    if len(path) > 1 and path.endswith("/"):
+        path = path.rstrip("/")
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if not key.lower().startswith(TRACKING_PARAMS)
+    )
+    return urlunparse((scheme, host, path, "", urlencode(query), ""))
+
+
+def is_shareable(response_headers: Dict[str, str], request_headers: Optional[Dict[str, str]] = None) -> bool:
+    """Whether a response can go in the cache every session reads: fetched without credentials and not private"""
+    response_headers = {key.lower(): value for key, value in (response_headers or {}).items()}
+    request_headers = {key.lower(): value for key, value in (request_headers or {}).items()}
+    if "cookie" in request_headers or "authorization" in request_headers or "set-cookie" in response_headers:
+        return False
+    cache_control = response_headers.get("cache-control", "").lower()
+    return "private" not in cache_control and "no-store" not in cache_control
+
+
+def validators_from_headers(headers: Dict[str, str]) -> Dict[str, Optional[str]]:
+    headers = {key.lower(): value for key, value in (headers or {}).items()}
+    return {"etag": headers.get("etag"), "last_modified": headers.get("last-modified")}
+
+
+class CachedDocument:
+    def __init__(self, url, text, title, domain, content_hash, etag, last_modified, fetched_at):
+        self.url = url
+        self.text = text
+        self.title = title
+        self.domain = domain
+        self.content_hash = content_hash
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+
+
+class DocumentCache:
+    """Extracted text keyed by normalized URL, stored once per content hash.
+
+    Entries younger than `fresh_for` are served as is. Older ones are
+    revalidated with If-None-Match / If-Modified-Since and served again on a
+    304. Entries past `max_age`, and the least recently used ones once the
+    cache grows past `max_bytes`, are evicted.
+    """
+
+    def __init__(self,
+                 root: str = DOC_CACHE_DIR,
+                 max_bytes: int = DOC_CACHE_MAX_BYTES,
+                 fresh_for: int = DOC_CACHE_FRESH_FOR,
+                 max_age: int = DOC_CACHE_MAX_AGE,
+                 evict_interval: int = DOC_CACHE_EVICT_INTERVAL):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.fresh_for = fresh_for
+        self.max_age = max_age
+        self.evict_interval = evict_interval
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._entries = 0
+        self._total_bytes = 0
+        self._last_evict = 0.0
+        self._counters = {"hits": 0, "misses": 0, "revalidated": 0, "stale": 0, "evicted": 0}
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            (self.root / "blobs").mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.root / "index.sqlite", check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    url_key TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    title TEXT,
+                    domain TEXT,
+                    etag TEXT,
+                    last_modified TEXT,
+                    size INTEGER NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS documents_hash ON documents(content_hash)")
+            # Summed once, then kept up to date by every write and removal
+            self._entries, self._total_bytes = self._conn.execute(
+                "SELECT (SELECT COUNT(*) FROM documents), "
+                "COALESCE(SUM(size), 0) FROM (SELECT DISTINCT content_hash, size FROM documents)"
+            ).fetchone()
+        return self._conn
+
+    def _blob_path(self, content_hash: str) -> Path:
+        return self.root / "blobs" / content_hash[:2] / f"{content_hash}.txt"
+
+    def _lookup(self, url_key: str):
+        with self._lock:
+            return self._db().execute(
+                "SELECT url, content_hash, title, domain, etag, last_modified, fetched_at "
+                "FROM documents WHERE url_key = ?", (url_key,)
+            ).fetchone()
+
+    async def contains(self, url: str) -> bool:
+        """Whether `url` has an entry, without revalidating it or counting a lookup"""
+        return await executor.run_io("doc_cache_lookup", self._lookup, normalize_url(url)) is not None
+
+    async def get(self, url: str) -> Optional[CachedDocument]:
+        """The cached document for `url` if it is still valid, None on a miss"""
+        url_key = normalize_url(url)
+        row = await executor.run_io("doc_cache_lookup", self._lookup, url_key)
+        if row is None:
+            self._counters["misses"] += 1
+            return None
+
+        cached_url, content_hash, title, domain, etag, last_modified, fetched_at = row
+        age = time.time() - fetched_at
+        if age > self.max_age or (age > self.fresh_for and not await self._revalidate(cached_url, etag, last_modified)):
+            self._counters["stale"] += 1
+            self._counters["misses"] += 1
+            await executor.run_io("doc_cache_remove", self._remove, url_key)
+            return None
+
+        text = await executor.run_io("doc_cache_read", self._read, url_key, content_hash, age > self.fresh_for)
+        if text is None:
+            self._counters["misses"] += 1
+            return None
+        self._counters["hits"] += 1
+        return CachedDocument(cached_url, text, title, domain, content_hash, etag, last_modified, fetched_at)
+
+    def _read(self, url_key: str, content_hash: str, revalidated: bool) -> Optional[str]:
+        try:
+            text = self._blob_path(content_hash).read_text(encoding="utf-8")
+        except FileNotFoundError:
+            self._remove(url_key)
+            return None
+
+        now = time.time()
+        with self._lock:
+            if revalidated:
+                # The origin confirmed the copy, it counts as freshly fetched again
+                self._db().execute("UPDATE documents SET fetched_at = ?, last_access = ? WHERE url_key = ?",
+                                   (now, now, url_key))
+            else:
+                self._db().execute("UPDATE documents SET last_access = ? WHERE url_key = ?", (now, url_key))
+            self._db().commit()
+        return text
+
+    async def _revalidate(self, url: str, etag: Optional[str], last_modified: Optional[str]) -> bool:
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        if not headers:
+            return False
+        try:
+            async with http_client.get(url, headers=headers) as response:
+                unchanged = response.status == 304 or (etag is not None and response.headers.get("ETag") == etag)
+        except Exception as e:
+            print(f"Revalidating {url} failed: {e}")
+            return False
+        if unchanged:
+            self._counters["revalidated"] += 1
+        return unchanged
+
+    async def put(self,
+                  url: str,
+                  text: str,
+                  title: str = "",
+                  domain: Optional[str] = None,
+                  etag: Optional[str] = None,
+                  last_modified: Optional[str] = None) -> str:
+        """Store the extracted text for `url`, returns its content hash"""
+        return await executor.run_io("doc_cache_write", self._write, url, text, title, domain, etag, last_modified)
+
+    def _write(self, url, text, title, domain, etag, last_modified) -> str:
+        data = text.encode("utf-8")
+        content_hash = hashlib.sha256(data).hexdigest()
+        url_key = normalize_url(url)
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            blob = self._blob_path(content_hash)
+            if not blob.exists():
+                blob.parent.mkdir(parents=True, exist_ok=True)
+                tmp = blob.with_suffix(f".{threading.get_ident()}.tmp")
+                tmp.write_bytes(data)
+                tmp.replace(blob)
+                self._total_bytes += len(data)
+
+            previous = db.execute("SELECT content_hash, size FROM documents WHERE url_key = ?", (url_key,)).fetchone()
+            db.execute(
+                "INSERT OR REPLACE INTO documents "
+                "(url_key, url, content_hash, title, domain, etag, last_modified, size, fetched_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url_key, url, content_hash, title, domain or urlparse(url).netloc,
+                 etag, last_modified, len(data), now, now),
+            )
+            db.commit()
+            if previous is None:
+                self._entries += 1
+            elif previous[0] != content_hash:
+                # The page changed, its old text may now be unreferenced
+                self._drop_blob_if_unused(*previous)
+
+            # Expired entries are dropped on a timer, least recently used ones once over the cap
+            if self._total_bytes > self.max_bytes or now - self._last_evict > self.evict_interval:
+                self._evict()
+        return content_hash
+
+    def _remove(self, url_key: str):
+        with self._lock:
+            row = self._db().execute("SELECT content_hash, size FROM documents WHERE url_key = ?", (url_key,)).fetchone()
+            if row is None:
+                return
+            self._db().execute("DELETE FROM documents WHERE url_key = ?", (url_key,))
+            self._db().commit()
+            self._entries -= 1
+            self._drop_blob_if_unused(*row)
+
+    def _drop_blob_if_unused(self, content_hash: str, size: int):
+        # Several URLs can share one blob, only the last reference removes it
+        if self._db().execute("SELECT 1 FROM documents WHERE content_hash = ? LIMIT 1", (content_hash,)).fetchone():
+            return
+        path = self._blob_path(content_hash)
+        if path.exists():
+            path.unlink(missing_ok=True)
+            self._total_bytes -= size
+
+    async def evict(self):
+        """Drop expired entries, then least recently used ones until under the size cap"""
+        def evict_locked():
+            with self._lock:
+                self._evict()
+        await executor.run_io("doc_cache_evict", evict_locked)
+
+    def _evict(self):
+        # Called with the lock held. Trims to a low watermark so the next writes don't evict again
+        db = self._db()
+        self._last_evict = time.time()
+        doomed = dict(db.execute(
+            "SELECT url_key, content_hash FROM documents WHERE fetched_at < ?",
+            (self._last_evict - self.max_age,),
+        ).fetchall())
+        target = self.max_bytes * EVICT_LOW_WATERMARK
+        if self._total_bytes > self.max_bytes:
+            rows = db.execute("SELECT url_key, content_hash, size FROM documents ORDER BY last_access").fetchall()
+            # A blob frees its bytes only once every URL sharing it is gone
+            references = Counter(content_hash for url_key, content_hash, _ in rows if url_key not in doomed)
+            total = self._total_bytes
+            for url_key, content_hash, size in rows:
+                if total <= target:
+                    break
+                if url_key not in doomed:
+                    doomed[url_key] = content_hash
+                    references[content_hash] -= 1
+                    if not references[content_hash]:
+                        total -= size
+
+        sizes = {}
+        for url_key, content_hash in doomed.items():
+            size = db.execute("SELECT size FROM documents WHERE url_key = ?", (url_key,)).fetchone()
+            sizes[content_hash] = size[0] if size else 0
+            db.execute("DELETE FROM documents WHERE url_key = ?", (url_key,))
+        db.commit()
+        for content_hash, size in sizes.items():
+            self._drop_blob_if_unused(content_hash, size)
+        self._entries -= len(doomed)
+        self._counters["evicted"] += len(doomed)
+
+    def stats(self) -> dict:
+        stats = dict(self._counters)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        stats.update({"entries": self._entries, "bytes": self._total_bytes, "max_bytes": self.max_bytes})
+        return stats
+
+
+document_cache = DocumentCache()
@@ -0,0 +1,110 @@
+from dotenv import load_dotenv
+import os
+import weakref
+from pathlib import Path
+from typing import Optional
+from playwright.async_api import Page, TimeoutError as PlaywrightTimeoutError
+
+# Screen Annotations
+
+load_dotenv()
+
+MARKING_SCRIPT_PATH = Path(__file__).resolve().parent.parent / "marking_scripts" / "final_marking.js"
+
+# Load the JavaScript file
+with open(MARKING_SCRIPT_PATH, "r", encoding="utf-8") as f:
+    marking_script = f.read()
+
+# Overlays only help someone watching the browser, headless runs skip drawing them
+HIGHLIGHT_ELEMENTS = os.getenv(
+    "HIGHLIGHT_ELEMENTS",
+    "false" if os.getenv("BROWSER_HEADLESS", "false").lower() == "true" else "true",
+).lower() == "true"
+
+# Contexts that already run the marking script on every new document
+_registered_contexts = weakref.WeakSet()
+
+# Last known element index per page, kept in sync with the in-page tracker
+_element_snapshots = weakref.WeakKeyDictionary()
+
+CAPTURE_ELEMENTS = """
+    (options) => typeof window.captureInteractiveElements === 'function'
+        ? window.captureInteractiveElements(options)
+        : null
+"""
+
+CAPTURE_ELEMENTS_DELTA = """
+    (options) => typeof window.captureInteractiveElementsDelta === 'function'
+        ? window.captureInteractiveElementsDelta(options)
+        : null
+"""
+
+
+async def ensure_marking_script(page: Page):
+    """Register the marking script once per browser context as an init script"""
+    context = page.context
+    if context in _registered_contexts:
+        return
+    await context.add_init_script(script=marking_script)
+    _registered_contexts.add(context)
+
+
+async def wait_for_page_ready(page: Page, timeout: int = 10000, load_timeout: int = 3000):
+    """Wait for the document to be parsed, then give the load event a short chance to fire"""
+    try:
+        await page.wait_for_load_state("domcontentloaded", timeout=timeout)
+        await page.wait_for_load_state("load", timeout=load_timeout)
+    except PlaywrightTimeoutError:
+        # Slow subresources shouldn't block annotation, the DOM is already usable
+        pass
+
+
+def apply_element_delta(snapshot: Optional[dict], delta: dict) -> dict:
+    """Merge a capture result from the in-page tracker into the page's element index"""
+    if delta["mode"] == "full" or not snapshot or snapshot["session_id"] != delta["sessionId"]:
+        elements = {element["index"]: element for element in delta["elements"]}
+    else:
+        elements = dict(snapshot["elements"])
+        for index in delta["removed"]:
+            elements.pop(index, None)
+        for element in delta["added"] + delta["changed"]:
+            elements[element["index"]] = element
+    return {"session_id": delta["sessionId"], "elements": elements}
+
+
+async def _capture(page: Page, script: str, options: dict):
+    # Only the capture call crosses the wire, the script itself lives in the page
+    result = await page.evaluate(script, options)
+
+    if result is None:
+        # Document was loaded before the init script was registered, install it into this one
+        await page.evaluate(f"() => {{ {marking_script} }}")
+        result = await page.evaluate(script, options)
+
+    return result
+
+
+async def execute_script(page: Page, incremental: bool = True):
+    await ensure_marking_script(page)
+    await wait_for_page_ready(page)
+
+    if not incremental:
+        return await _capture(page, CAPTURE_ELEMENTS, {"debugHighlight": HIGHLIGHT_ELEMENTS})
+
+    # Only elements added, removed or changed since the last capture come back
+    snapshot = _element_snapshots.get(page)
+    delta = await _capture(page, CAPTURE_ELEMENTS_DELTA, {
+        "debugHighlight": HIGHLIGHT_ELEMENTS,
+        "sessionId": snapshot["session_id"] if snapshot else None,
+    })
+    snapshot = apply_element_delta(snapshot, delta)
+    _element_snapshots[page] = snapshot
+
+    return [snapshot["elements"][index] for index in delta["order"] if index in snapshot["elements"]]
+
+
+async def remove_highlights(page: Page):
+    """Remove the overlays drawn by the last capture, only the registered ones are touched"""
+    if not HIGHLIGHT_ELEMENTS:
+        return
+    await page.evaluate("() => { if (typeof window.unmarkElements === 'function') window.unmarkElements(); }")
@@ -0,0 +1,130 @@
+from dotenv import load_dotenv
+import os
+import re
+from typing import Dict, List, Optional
+
+# Ranking and compaction of the interactive elements sent to llm_call_node
+
+load_dotenv()
+
+# Rough prompt budget for the element list, ~4 characters per token
+DOM_TOKEN_BUDGET = int(os.getenv("DOM_TOKEN_BUDGET", "1500"))
+MAX_TEXT_CHARS = 80
+# Share of the budget kept for inputs, so search boxes and form fields survive on link-heavy pages
+INPUT_BUDGET_SHARE = 0.3
+# Actions that act on the element the model picked
+ELEMENT_ACTIONS = ("click", "type")
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+ID_XPATH_RE = re.compile(r'^//\*\[@id="[^"]*"\]$')
+NAV_CHROME_RE = re.compile(
+    r"^(?:sign in|sign up|log in|login|logout|menu|skip to .*|settings|privacy.*|terms.*|cookies?.*|"
+    r"feedback|help|about|accessibility.*|advertising|business|send feedback|images|maps|shopping|"
+    r"videos|tools|apps|google apps|more|all|share|subscribe|newsletter|home|search)$"
+)
+STOPWORDS = {
+    "the", "and", "for", "are", "with", "what", "how", "why", "who", "when", "where", "which",
+    "that", "this", "from", "into", "about", "does", "was", "were", "has", "have", "its", "you",
+}
+
+
+class UnresolvedElement(Exception):
+    """The model picked an element index that isn't on the page"""
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+def _terms(text: str) -> set:
+    return {w for w in WORD_RE.findall(text.lower()) if len(w) > 2 and w not in STOPWORDS}
+
+
+def _clip(text: str) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= MAX_TEXT_CHARS else text[:MAX_TEXT_CHARS - 3] + "..."
+
+
+def compact_element(element: Dict) -> Dict:
+    """Only the fields the model needs to pick an element, the rest stays in the side table"""
+    compact = {"index": element["index"], "type": element["type"], "text": _clip(element.get("text") or "")}
+    description = _clip(element.get("description") or "")
+    if description and description != compact["text"]:
+        compact["description"] = description
+    xpath = element.get("xpath") or ""
+    # Positional xpaths are long and meaningless to the model, id-based ones are short and descriptive
+    if ID_XPATH_RE.match(xpath):
+        compact["xpath"] = xpath
+    return compact
+
+
+def score_element(element: Dict, query_terms: set) -> float:
+    label = f"{element.get('text') or ''} {element.get('description') or ''}"
+    overlap = len(query_terms & _terms(label))
+    score = overlap * 2.0
+    if element["type"] == "link" and len(label.split()) >= 4:
+        # Result titles are wordy, toolbar links are not
+        score += 0.5
+    return score
+
+
+def is_nav_chrome(element: Dict) -> bool:
+    label = " ".join((element.get("text") or element.get("description") or "").lower().split())
+    return not label or bool(NAV_CHROME_RE.match(label))
+
+
+def rank_elements(elements: List[Dict], query: str, budget: Optional[int] = None) -> List[Dict]:
+    """Return compacted elements relevant to `query`, in page order, within the token budget"""
+    budget = budget or DOM_TOKEN_BUDGET
+    if not elements or elements[0]["type"] == "pdf":
+        return [compact_element(element) for element in elements]
+
+    query_terms = _terms(query)
+    seen = set()
+    candidates = []
+    for position, element in enumerate(elements):
+        key = (element["type"], " ".join((element.get("text") or "").lower().split()),
+               element.get("description"))
+        if key in seen:
+            continue
+        seen.add(key)
+        score = score_element(element, query_terms)
+        # Nav chrome is dropped unless it actually mentions the query
+        if element["type"] != "input" and is_nav_chrome(element) and score == 0:
+            continue
+        candidates.append((score, position, compact_element(element)))
+
+    selected = {}
+    used = 0
+
+    def take(ranked, limit):
+        nonlocal used
+        for score, position, compact in ranked:
+            cost = estimate_tokens(str(compact))
+            if position in selected or used + cost > limit:
+                continue
+            used += cost
+            selected[position] = compact
+
+    ranked = sorted(candidates, key=lambda c: (-c[0], c[1]))
+    # Search boxes and form fields first, from their reserved share, then everything by score
+    take([c for c in ranked if c[2]["type"] == "input"], budget * INPUT_BUDGET_SHARE)
+    take(ranked, budget)
+
+    return [selected[position] for position in sorted(selected)]
+
+
+def resolve_action_element(action: Dict, elements: List[Dict]) -> Dict:
+    """Swap the model's compact pick for the full element so xpath and coordinates are exact.
+
+    Raises UnresolvedElement when a click or type names no element of the page,
+    the compact pick has no coordinates to act on.
+    """
+    picked = action.get("action_element")
+    index = picked.get("index") if picked else None
+    full = {element["index"]: element for element in elements}.get(index) if index is not None else None
+    if full is not None:
+        action["action_element"] = full
+    elif action.get("action_type") in ELEMENT_ACTIONS:
+        raise UnresolvedElement(f"The element index {index} is not on the page")
+    return action
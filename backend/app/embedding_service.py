@@ -0,0 +1,258 @@
+from dotenv import load_dotenv
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from .chunking import EMBEDDING_MODEL
+from .executor import executor
+
+# One embedding model per process behind a batching queue, with vectors cached on disk by chunk hash
+
+load_dotenv()
+
+# A batch goes to the model once it has this many chunks, or this many seconds after its first chunk
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "64"))
+EMBED_MAX_DELAY = float(os.getenv("EMBED_MAX_DELAY", "0.02"))
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "./embedding_cache")
+# Oldest vectors are dropped past this many, about 1.5 KB each for a 384-dimension model
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+# "torch" runs the PyTorch sentence-transformer, "onnx" its int8-quantized ONNX export
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_id(doc) -> str:
+    """Stable vector store id of a chunk, so storing a page again overwrites instead of duplicating"""
+    return text_hash(f"{doc.metadata.get('source', '')}\n{doc.page_content}")[:32]
+
+
+class EmbeddingService:
+    """Embeds chunks for every page of the process through one queue.
+
+    Chunks from concurrent pages are grouped into batches of up to
+    `max_batch`, waiting at most `max_delay` seconds to fill one, and run on a
+    dedicated worker thread so the event loop never blocks on the model.
+    Vectors are cached in SQLite keyed by (model, chunk hash), so a chunk
+    already seen is never embedded again, up to `max_entries` vectors.
+    """
+
+    def __init__(self,
+                 model_name: str = EMBEDDING_MODEL,
+                 backend: str = EMBEDDING_BACKEND,
+                 max_batch: int = EMBED_MAX_BATCH,
+                 max_delay: float = EMBED_MAX_DELAY,
+                 cache_dir: str = EMBEDDING_CACHE_DIR,
+                 max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.model_name = model_name
+        self.backend = backend
+        # Backends agree closely but not bit for bit, their vectors are cached apart
+        self.cache_key = model_name if backend == "torch" else f"{model_name}#{backend}"
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.cache_dir = Path(cache_dir)
+        self.max_entries = max_entries
+        self._entries = 0
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="agentr-embed")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._queue: Optional[asyncio.Queue] = None
+        self._batcher: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._counters = {"requests": 0, "chunks": 0, "cache_hits": 0, "embedded": 0, "batches": 0, "evicted": 0}
+
+    def model(self):
+        """The embedding model, loaded on first use"""
+        with self._model_lock:
+            if self._model is None:
+                if self.backend == "onnx":
+                    from .onnx_embeddings import OnnxEmbeddings
+                    self._model = OnnxEmbeddings(self.model_name)
+                else:
+                    from langchain_huggingface import HuggingFaceEmbeddings
+                    self._model = HuggingFaceEmbeddings(model_name=self.model_name)
+            return self._model
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.cache_dir / "vectors.sqlite", check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS vectors (
+                    model TEXT NOT NULL,
+                    hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    PRIMARY KEY (model, hash)
+                )
+            """)
+            # Counted once, then kept up to date by every write
+            self._entries = self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+        return self._conn
+
+    def _cache_get(self, hashes: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        with self._db_lock:
+            # Stay under SQLite's bound parameter limit
+            for i in range(0, len(hashes), 500):
+                batch = hashes[i:i + 500]
+                rows = self._db().execute(
+                    f"SELECT hash, vector FROM vectors WHERE model = ? AND hash IN ({','.join('?' * len(batch))})",
+                    (self.cache_key, *batch),
+                ).fetchall()
+                for hash_, blob in rows:
+                    found[hash_] = array("f", blob).tolist()
+        return found
+
+    def _cache_put(self, hashes: List[str], vectors: List[List[float]]):
+        with self._db_lock:
+            self._db().executemany(
+                "INSERT OR REPLACE INTO vectors (model, hash, vector) VALUES (?, ?, ?)",
+                [(self.cache_key, hash_, array("f", vector).tobytes()) for hash_, vector in zip(hashes, vectors)],
+            )
+            self._entries += len(hashes)
+            if self._entries > self.max_entries:
+                # Drop the oldest tenth beyond the cap at once, so the next writes don't trim again
+                excess = self._entries - int(self.max_entries * 0.9)
+                self._db().execute(
+                    "DELETE FROM vectors WHERE rowid IN (SELECT rowid FROM vectors ORDER BY rowid LIMIT ?)", (excess,)
+                )
+                self._entries = self._db().execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+                self._counters["evicted"] += excess
+            self._db().commit()
+
+    def _embed_and_cache(self, texts: List[str], hashes: List[str]) -> List[List[float]]:
+        vectors = self.model().embed_documents(texts)
+        self._cache_put(hashes, vectors)
+        return vectors
+
+    def _ensure_batcher(self):
+        loop = asyncio.get_running_loop()
+        if self._batcher is None or self._batcher.done() or self._loop is not loop:
+            self._queue = asyncio.Queue()
+            self._loop = loop
+            self._pending.clear()
+            self._batcher = loop.create_task(self._run_batcher())
+
+    async def _run_batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            hashes = [hash_ for hash_, _, _ in batch]
+            try:
+                vectors = await loop.run_in_executor(
+                    self._worker, self._embed_and_cache, [text for _, text, _ in batch], hashes,
+                )
+            except Exception as e:
+                print(f"Embedding a batch of {len(batch)} chunks failed: {e}")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                self._counters["batches"] += 1
+                self._counters["embedded"] += len(batch)
+                for (_, _, future), vector in zip(batch, vectors):
+                    if not future.done():
+                        future.set_result(vector)
+            finally:
+                for hash_ in hashes:
+                    self._pending.pop(hash_, None)
+
+    async def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Vectors for `texts`, from the cache or from a batch shared with concurrent callers"""
+        self._counters["requests"] += 1
+        self._counters["chunks"] += len(texts)
+        self._ensure_batcher()
+        loop = asyncio.get_running_loop()
+
+        hashes = [text_hash(text) for text in texts]
+        # Looked up on the I/O pool, not behind a model batch on the worker
+        vectors = await executor.run_io("embedding_cache", self._cache_get, list(dict.fromkeys(hashes)))
+        self._counters["cache_hits"] += sum(1 for hash_ in hashes if hash_ in vectors)
+
+        waiting = {}
+        for hash_, text in zip(hashes, texts):
+            if hash_ in vectors or hash_ in waiting:
+                continue
+            # Another page may already have queued the same chunk
+            future = self._pending.get(hash_)
+            if future is None:
+                future = loop.create_future()
+                self._pending[hash_] = future
+                self._queue.put_nowait((hash_, text, future))
+            waiting[hash_] = future
+
+        if waiting:
+            # The futures are shared with other callers, a cancelled caller must not cancel them for everyone
+            results = await asyncio.gather(*(asyncio.shield(future) for future in waiting.values()))
+            vectors.update(zip(waiting, results))
+        return [vectors[hash_] for hash_ in hashes]
+
+    def embed_documents_sync(self, texts: List[str]) -> List[List[float]]:
+        """Blocking variant through the same cache, for synchronous callers"""
+        hashes = [text_hash(text) for text in texts]
+        vectors = self._cache_get(list(dict.fromkeys(hashes)))
+        missing = {hash_: text for hash_, text in zip(hashes, texts) if hash_ not in vectors}
+        if missing:
+            vectors.update(zip(missing, self._embed_and_cache(list(missing.values()), list(missing))))
+        return [vectors[hash_] for hash_ in hashes]
+
+    def as_langchain(self) -> Embeddings:
+        return ServiceEmbeddings(self)
+
+    def close(self):
+        if self._batcher is not None:
+            self._batcher.cancel()
+            self._batcher = None
+        self._worker.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        stats = dict(self._counters)
+        stats.update({
+            "model": self.model_name,
+            "backend": self.backend,
+            "loaded": self._model is not None,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "cached_vectors": self._entries,
+            "avg_batch": round(stats["embedded"] / stats["batches"], 1) if stats["batches"] else 0.0,
+            "hit_rate": round(stats["cache_hits"] / stats["chunks"], 3) if stats["chunks"] else 0.0,
+        })
+        return stats
+
+
+class ServiceEmbeddings(Embeddings):
+    """LangChain view of the service for vector stores, queries go straight to the shared model"""
+
+    def __init__(self, service: EmbeddingService):
+        self.service = service
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.service.embed_documents_sync(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.service.model().embed_query(text)
+
+
+embedding_service = EmbeddingService()
@@ -0,0 +1,107 @@
+from dotenv import load_dotenv
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Dict, Optional
+
+# Worker pools for blocking pipeline stages, so scraping and embedding never stall the event loop
+
+load_dotenv()
+
+# Threads for libraries that block on I/O or release the GIL (HTTP clients, Chroma, torch)
+IO_POOL_SIZE = int(os.getenv("IO_POOL_SIZE", str(min(32, (os.cpu_count() or 1) + 4))))
+# Processes for pure-Python CPU work (HTML parsing, PDF text, sentence splitting)
+CPU_POOL_SIZE = int(os.getenv("CPU_POOL_SIZE", str(max(1, (os.cpu_count() or 2) - 1))))
+
+
+def _timed(fn, args, kwargs):
+    # Runs in the worker, wall clock timestamps are comparable across processes
+    started = time.time()
+    result = fn(*args, **kwargs)
+    return started, time.time(), result
+
+
+class StageExecutor:
+    """Dispatches pipeline stages to a thread or process pool and records each stage's queue wait"""
+
+    def __init__(self, io_workers: int = IO_POOL_SIZE, cpu_workers: int = CPU_POOL_SIZE):
+        self.io_workers = io_workers
+        self.cpu_workers = cpu_workers
+        self._io: Optional[ThreadPoolExecutor] = None
+        self._cpu: Optional[ProcessPoolExecutor] = None
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def _io_pool(self) -> ThreadPoolExecutor:
+        if self._io is None:
+            self._io = ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix="agentr-io")
+        return self._io
+
+    def _cpu_pool(self) -> ProcessPoolExecutor:
+        if self._cpu is None:
+            # spawn keeps workers from inheriting the event loop, Playwright and model state
+            self._cpu = ProcessPoolExecutor(
+                max_workers=self.cpu_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._cpu
+
+    async def _run(self, pool, stage: str, fn, args, kwargs):
+        loop = asyncio.get_running_loop()
+        submitted = time.time()
+        started, finished, result = await loop.run_in_executor(pool, partial(_timed, fn, args, kwargs))
+        self._record(stage, started - submitted, finished - started)
+        return result
+
+    async def run_io(self, stage: str, fn, *args, **kwargs):
+        """Run a blocking I/O-bound call on the thread pool"""
+        return await self._run(self._io_pool(), stage, fn, args, kwargs)
+
+    async def run_cpu(self, stage: str, fn, *args, **kwargs):
+        """Run a CPU-bound, picklable module-level function on the process pool"""
+        pool = self._cpu_pool()
+        try:
+            return await self._run(pool, stage, fn, args, kwargs)
+        except BrokenProcessPool:
+            # A worker died (OOM, segfault in a parser), start a fresh pool for the next call
+            if self._cpu is pool:
+                print(f"Process pool broke during {stage}, restarting it")
+                pool.shutdown(wait=False, cancel_futures=True)
+                self._cpu = None
+            raise
+
+    def _record(self, stage: str, wait: float, run: float):
+        stats = self._stats.setdefault(stage, {"count": 0, "wait_ms": 0.0, "max_wait_ms": 0.0, "run_ms": 0.0})
+        stats["count"] += 1
+        stats["wait_ms"] += max(wait, 0) * 1000
+        stats["max_wait_ms"] = max(stats["max_wait_ms"], wait * 1000)
+        stats["run_ms"] += run * 1000
+
+    def stats(self) -> dict:
+        return {
+            "io_workers": self.io_workers,
+            "cpu_workers": self.cpu_workers,
+            "stages": {
+                stage: {
+                    "count": s["count"],
+                    "avg_wait_ms": round(s["wait_ms"] / s["count"], 1),
+                    "max_wait_ms": round(s["max_wait_ms"], 1),
+                    "avg_run_ms": round(s["run_ms"] / s["count"], 1),
+                }
+                for stage, s in self._stats.items()
+            },
+        }
+
+    def shutdown(self):
+        if self._io is not None:
+            self._io.shutdown(wait=False, cancel_futures=True)
+            self._io = None
+        if self._cpu is not None:
+            self._cpu.shutdown(wait=False, cancel_futures=True)
+            self._cpu = None
+
+
+executor = StageExecutor()
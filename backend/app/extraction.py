@@ -0,0 +1,133 @@
+import mmap
+import re
+from typing import List, Tuple
+
+import lxml.html
+from lxml import etree
+from newspaper import Article
+from PyPDF2 import PdfReader
+
+# CPU-bound extraction steps, kept free of agent imports so process pool workers load them cheaply
+
+
+# Dropped with their subtree, tail text after them is kept
+STRIPPED_TAGS = ('script', 'style', 'nav', 'header', 'footer', 'aside', 'advertisement')
+
+# Content containers in order of preference, as (kind, name) of a tag, class or id selector
+CONTENT_SELECTORS = [
+    # Academic paper containers
+    ('class', 'ltx_document'), ('class', 'paper-content'), ('class', 'full-text'), ('class', 'article-text'),
+    # General article containers
+    ('tag', 'article'), ('tag', 'main'), ('class', 'content'), ('class', 'post-content'),
+    ('class', 'entry-content'), ('class', 'article-body'), ('class', 'story-body'),
+    ('class', 'text-content'), ('class', 'main-text'),
+    # Fallback containers
+    ('id', 'content'), ('id', 'main-content'), ('class', 'main-content'), ('class', 'container'),
+]
+_SELECTOR_RANKS = {
+    kind: {name: rank for rank, (k, name) in enumerate(CONTENT_SELECTORS) if k == kind}
+    for kind in ('tag', 'class', 'id')
+}
+
+MIN_CONTENT_CHARS = 100
+MIN_TEXT_CHARS = 50
+
+WHITESPACE_RE = re.compile(r'\s+')
+# A boilerplate phrase up to the end of its sentence
+BOILERPLATE_RE = re.compile(r'(?:cookies?|privacy policy|terms of service|subscribe|newsletter)[^.]*', re.IGNORECASE)
+BOILERPLATE_WORDS = ('cookie', 'privacy policy', 'terms of service', 'subscribe', 'newsletter')
+
+
+def _selector_ranks(element) -> set:
+    ranks = set()
+    rank = _SELECTOR_RANKS['tag'].get(element.tag)
+    if rank is not None:
+        ranks.add(rank)
+    classes = element.get('class')
+    if classes:
+        ranks.update(_SELECTOR_RANKS['class'][name] for name in classes.split() if name in _SELECTOR_RANKS['class'])
+    rank = _SELECTOR_RANKS['id'].get(element.get('id'))
+    if rank is not None:
+        ranks.add(rank)
+    return ranks
+
+
+def _element_text(element) -> str:
+    return ' '.join(piece for piece in (s.strip() for s in element.itertext()) if piece)
+
+
+def extract_text_from_html(html_content):
+    """Extract clean text from HTML"""
+    try:
+        root = lxml.html.fromstring(html_content)
+    except (etree.ParserError, ValueError):
+        return ""
+
+    etree.strip_elements(root, *STRIPPED_TAGS, with_tail=False)
+    etree.strip_tags(root, etree.Comment, etree.ProcessingInstruction)
+
+    # One walk over the tree buckets every content container under its selector's rank
+    matches = [[] for _ in CONTENT_SELECTORS]
+    for element in root.iter(etree.Element):
+        for rank in _selector_ranks(element):
+            matches[rank].append(element)
+
+    # The most preferred selector with substantial content wins
+    text = ""
+    for elements in matches:
+        if elements:
+            text = '\n'.join(_element_text(element) for element in elements)
+            if len(text.strip()) > MIN_CONTENT_CHARS:
+                break
+
+    if not text or len(text.strip()) < MIN_CONTENT_CHARS:
+        body = root if root.tag == 'body' else root.find('body')
+        if body is not None:
+            text = _element_text(body)
+
+    if text:
+        text = WHITESPACE_RE.sub(' ', text)
+        # Most pages carry no boilerplate phrase, skip the regex scan for them
+        lowered = text.lower()
+        if any(word in lowered for word in BOILERPLATE_WORDS):
+            text = BOILERPLATE_RE.sub('', text)
+        text = text.strip()
+
+    return text if text and len(text) > MIN_TEXT_CHARS else ""
+
+
+def parse_article(url: str, html: str) -> str:
+    """Article text newspaper finds in already downloaded HTML"""
+    article = Article(url)
+    article.download(input_html=html)
+    article.parse()
+    return article.text
+
+
+def _clean_pdf_text(page_text: str) -> str:
+    # Clean up common PDF extraction issues
+    page_text = re.sub(r'(\w)-\s*\n(\w)', r'\1\2', page_text)  # Fix hyphenated words
+    page_text = re.sub(r'\s+', ' ', page_text)  # Normalize whitespace
+    return page_text.strip()
+
+
+def pdf_page_count(path: str) -> int:
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        return len(PdfReader(data).pages)
+
+
+def extract_pdf_pages(path: str, page_numbers: List[int], clean: bool = False) -> List[Tuple[int, str]]:
+    """Text of the given pages of a PDF on disk, memory-mapped so only touched pages are read"""
+    pages = []
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        reader = PdfReader(data)
+        for page_number in page_numbers:
+            try:
+                page_text = reader.pages[page_number].extract_text() or ""
+            except Exception:
+                continue  # Skip problematic pages
+            if clean and page_text.strip():
+                page_text = _clean_pdf_text(page_text)
+            if page_text.strip():
+                pages.append((page_number, page_text))
+    return pages
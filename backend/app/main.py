@@ -2,23 +2,60 @@ from fastapi import FastAPI, HTTPException
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import asyncio
-from typing import Optional, Dict, Any, Literal
+from typing import Optional, Dict, Any, List, Literal
 from contextlib import asynccontextmanager
 import json
 import time
+import os
+import uuid
 # Import necessary functions from agent files
 from .deep_research_agent import deep_research_agent
-from .browser_manager import setup_browser, cleanup_browser_session
+from .browser_manager import browser_pool
+from .session_registry import session_registry, BrowserSession, SessionBusy
 from .research_agent import research_agent, type
+from Browser.wait_engine import wait_engine
+from Browser.http_client import http_client
+from Browser.navigation_tracker import navigation_tracker
+from .executor import executor
+from .document_cache import document_cache
+from .dedup import dedup_index
+from .prefetch import prefetch_registry
+from .embedding_service import embedding_service
+from .vector_store import vector_stores
+from .model_registry import models
 from fastapi.middleware.cors import CORSMiddleware
 
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 from playwright.async_api import async_playwright
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm the browser pool in the background so startup isn't blocked on Chrome
+    warmup = asyncio.create_task(browser_pool.start())
+    # Models load on first use, WARMUP_MODELS=true loads them in the background right away
+    model_warmup = None
+    if os.getenv("WARMUP_MODELS", "false").lower() == "true":
+        model_warmup = asyncio.create_task(asyncio.to_thread(models.warmup))
+    # Expires abandoned run collections and removes orphaned segment directories
+    janitor = asyncio.create_task(vector_stores.run_janitor())
+    # Hands the browsers of abandoned sessions back to the pool
+    reaper = asyncio.create_task(session_registry.run_reaper())
+    yield
+    reaper.cancel()
+    janitor.cancel()
+    warmup.cancel()
+    if model_warmup is not None:
+        model_warmup.cancel()
+    await session_registry.close_all()
+    await browser_pool.close()
+    # Writes still buffered go out on the I/O pool, before it shuts down
+    await vector_stores.close()
+    embedding_service.close()
+    executor.shutdown()
+    await http_client.close()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,76 +65,88 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global variables for browser session
-browser_session = {
-    "browser": None,
-    "page": None
-}
-
-# Global queue for browser events
-browser_events = asyncio.Queue()
-
 class BrowserSetupRequest(BaseModel):
     url: str = "https://www.google.com"
+    session_id: Optional[str] = None
+
+class CleanupRequest(BaseModel):
+    session_id: Optional[str] = None
+
+class WarmupRequest(BaseModel):
+    models: Optional[List[str]] = None
 
 class QueryRequest(BaseModel):
     query: str
     agent_type: Literal["task", "research", "deep_research"]
+    session_id: Optional[str] = None
 
 @app.post("/setup-browser")
 async def setup_browser_endpoint(request: BrowserSetupRequest):
     try:
-        # Clear any existing session
-        if browser_session["browser"]:
-            await cleanup_browser()
-            
-        # Setup new browser session
-        if request.url == "https://www.google.com":
-            print(f"Setting up browser for {request.url}")
-            browser, page = await setup_browser(request.url)
-        else:
-            browser, page = await setup_browser(request.url)
-        
-        # Store session info
-        browser_session.update({
-            "browser": browser,
-            "page": page
-        })
+        # Replaces only this session's browser, other sessions keep running
+        print(f"Setting up browser for {request.url}")
+        session = await session_registry.create(request.url, request.session_id)
         
-        return {"status": "success", "message": "Browser setup complete"}
+        return {"status": "success", "message": "Browser setup complete", "session_id": session.session_id}
+    except SessionBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to setup browser: {str(e)}")
 
 @app.post("/cleanup")
-async def cleanup_browser():
+async def cleanup_browser(request: Optional[CleanupRequest] = None):
     try:
-        if browser_session["browser"]:
-            # Use the proper cleanup function
-            await cleanup_browser_session(browser_session["browser"])
-            
-            # Clear the session
-            browser_session.update({
-                "browser": None,
-                "page": None
-            })
+        await session_registry.close(request.session_id if request else None)
         
         return {"status": "success", "message": "Browser cleanup complete"}
     except Exception as e:
         print(f"Cleanup error: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to cleanup browser: {str(e)}")
 
-async def emit_browser_event(event_type: str, data: Dict[str, Any]):
-    await browser_events.put({
+@app.post("/warmup")
+async def warmup_models(request: Optional[WarmupRequest] = None):
+    """Load models ahead of the first query, all of them unless a list is given"""
+    try:
+        loaded = await asyncio.to_thread(models.warmup, request.models if request else None)
+        return {"status": "success", "loaded": loaded}
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=f"Unknown model: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Warmup failed: {str(e)}")
+
+@app.get("/stats")
+async def stats():
+    return {
+        "browser_pool": browser_pool.stats(),
+        "sessions": session_registry.stats(),
+        "waits": wait_engine.stats(),
+        "navigation": navigation_tracker.stats(),
+        "executor": executor.stats(),
+        "http_client": http_client.stats(),
+        "document_cache": document_cache.stats(),
+        "dedup": dedup_index.stats(),
+        "prefetch": prefetch_registry.stats(),
+        "embeddings": embedding_service.stats(),
+        "vector_stores": vector_stores.stats(),
+        "models": models.stats(),
+    }
+
+async def emit_browser_event(session: BrowserSession, event_type: str, data: Dict[str, Any]):
+    await session.events.put({
         "type": event_type,
         "data": data
     })
 
 @app.get("/browser-events")
-async def browser_events_endpoint():
+async def browser_events_endpoint(session_id: Optional[str] = None):
+    session = session_registry.get(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Unknown session. Call /setup-browser first")
+
     async def event_generator():
         while True:
             try:
-                event = await browser_events.get()
+                event = await session.events.get()
                 yield f"data: {json.dumps(event)}\n\n"
             except asyncio.CancelledError:
                 break
@@ -111,9 +160,19 @@ async def browser_events_endpoint():
         }
     )
 
+async def drop_run_collections(run_id: str):
+    """Frees the run's vector collections, whether it finished or was cut short"""
+    try:
+        await vector_stores.drop_run(run_id)
+    except Exception as e:
+        print(f"Error dropping the collections of run {run_id}: {e}")
+
 async def stream_deep_research_agent_response(query: str, page, agent_graph):
+    run_id = uuid.uuid4().hex
+    prefetch_registry.start(run_id)
     try:
         initial_state = {
+            "run_id": run_id,
             "input": query,
             "page": page,
             "dom_elements": [],
@@ -154,7 +213,7 @@ async def stream_deep_research_agent_response(query: str, page, agent_graph):
                         yield f"data: {{\n  \"type\": \"thought\",\n  \"content\": {thought_json}\n}}\n\n"
                     
                     # Handle browser actions
-                    if any(key in event for key in ["click", "type", "wait", "go_back", "go_to_search"]):
+                    if any(key in event for key in ["click", "type", "wait", "go_back", "go_to_search", "search", "search_subtopic", "scrape_results"]):
                         action = event[list(event.keys())[0]]["actions_taken"]
                         action_json = json.dumps(action, ensure_ascii=False)
                         yield f"data: {{\n  \"type\": \"browser_action\",\n  \"content\": {action_json}\n}}\n\n"
@@ -218,14 +277,19 @@ async def stream_deep_research_agent_response(query: str, page, agent_graph):
         error_json = json.dumps(str(e), ensure_ascii=False)
         yield f"data: {{\n  \"type\": \"error\",\n  \"content\": {error_json}\n}}\n\n"
     finally:
+        prefetch_registry.finish(run_id)
+        await drop_run_collections(run_id)
         await asyncio.sleep(0.5)
         yield f"data: {{\n  \"type\": \"complete\",\n  \"content\": \"Processing completed\"\n}}\n\n"
         await asyncio.sleep(0.5)
         yield f"data: {{\n  \"type\": \"end\",\n  \"content\": \"Stream completed\"\n}}\n\n"
 
 async def stream_research_agent_response(query: str, page, agent_graph):
+    run_id = uuid.uuid4().hex
+    prefetch_registry.start(run_id)
     try:
         initial_state = {
+            "run_id": run_id,
             "input": query,
             "page": page,
             "dom_elements": [],
@@ -254,7 +318,7 @@ async def stream_research_agent_response(query: str, page, agent_graph):
                         yield f"data: {{\n  \"type\": \"thought\",\n  \"content\": {thought_json}\n}}\n\n"
                     
                     # Handle browser actions
-                    if any(key in event for key in ["click", "type", "wait", "go_back", "go_to_search"]):
+                    if any(key in event for key in ["click", "type", "wait", "go_back", "go_to_search", "search", "search_subtopic", "scrape_results"]):
                         actions = event[list(event.keys())[0]]["actions_taken"]
                         actions_json = json.dumps(actions, ensure_ascii=False)
                         yield f"data: {{\n  \"type\": \"action\",\n  \"content\": {actions_json}\n}}\n\n"
@@ -308,6 +372,8 @@ async def stream_research_agent_response(query: str, page, agent_graph):
         error_json = json.dumps(str(e), ensure_ascii=False)
         yield f"data: {{\n  \"type\": \"error\",\n  \"content\": {error_json}\n}}\n\n"
     finally:
+        prefetch_registry.finish(run_id)
+        await drop_run_collections(run_id)
         await asyncio.sleep(0.5)
         yield f"data: {{\n  \"type\": \"complete\",\n  \"content\": \"Processing completed\"\n}}\n\n"
         await asyncio.sleep(0.5)
@@ -315,13 +381,31 @@ async def stream_research_agent_response(query: str, page, agent_graph):
 
 
 
+async def stream_with_session_lock(session: BrowserSession, stream):
+    """Release the session lock taken by /query once the stream ends, so runs on one page never overlap"""
+    try:
+        async for chunk in stream:
+            session.touch()
+            yield chunk
+    finally:
+        session.lock.release()
+
+
 @app.post("/query")
 async def query_agent(request: QueryRequest):
-    if not browser_session["page"]:
+    session = session_registry.get(request.session_id)
+    if not session:
         raise HTTPException(
             status_code=400, 
             detail="Browser not initialized. Call /setup-browser first"
         )
+    if session.lock.locked():
+        raise HTTPException(
+            status_code=409,
+            detail="A query is already running for this session"
+        )
+    # Taken before responding, an unlocked asyncio.Lock is acquired without yielding to another request
+    await session.lock.acquire()
     
     agent_graphs = {
         "research": research_agent,
@@ -333,12 +417,18 @@ async def query_agent(request: QueryRequest):
         "deep_research": stream_deep_research_agent_response
     }
     
-    return StreamingResponse(
-        stream_handlers[request.agent_type](
+    try:
+        stream = stream_handlers[request.agent_type](
             request.query, 
-            browser_session["page"],
+            session.page,
             agent_graphs[request.agent_type]
-        ),
+        )
+    except Exception:
+        session.lock.release()
+        raise
+    
+    return StreamingResponse(
+        stream_with_session_lock(session, stream),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -351,13 +441,14 @@ async def query_agent(request: QueryRequest):
 @app.post("/api/docs/type")
 async def type_in_docs(request: Request):
     try:
-        if not browser_session["page"]:
+        data = await request.json()
+        session = session_registry.get(data.get('session_id'))
+        if not session:
             return JSONResponse(
                 status_code=400,
                 content={"error": "Browser not initialized. Call /setup-browser first"}
             )
 
-        data = await request.json()
         content = data.get('content')
         
         if not content:
@@ -366,7 +457,7 @@ async def type_in_docs(request: Request):
                 content={"error": "Content is required"}
             )
 
-        page = browser_session["page"]
+        page = session.page
         await page.goto('https://docs.google.com/document/create')
         await page.wait_for_load_state("domcontentloaded")
         await asyncio.sleep(2)  # Wait for editor to be fully loaded
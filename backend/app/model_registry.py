@@ -0,0 +1,91 @@
+from dotenv import load_dotenv
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from .embedding_service import embedding_service
+
+# Models and API clients built once on first use and shared by every agent
+
+load_dotenv()
+
+
+def _openai(model: str, **kwargs):
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model=model, **kwargs)
+
+
+def _gemini(model: str, **kwargs):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(model=model, api_key=os.getenv("GEMINI_API_KEY"), **kwargs)
+
+
+class ModelRegistry:
+    """Named factories whose products are built on first use, once per process"""
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._load_seconds: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        self._factories[name] = factory
+
+    def get(self, name: str) -> Any:
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            if name not in self._instances:
+                started = time.perf_counter()
+                self._instances[name] = self._factories[name]()
+                self._load_seconds[name] = round(time.perf_counter() - started, 3)
+                print(f"Loaded {name} in {self._load_seconds[name]}s")
+            return self._instances[name]
+
+    def lazy(self, name: str) -> "LazyModel":
+        if name not in self._factories:
+            raise KeyError(f"No model registered as {name}")
+        return LazyModel(self, name)
+
+    def warmup(self, names: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        """Build the named models (all by default) ahead of the first query, returns load seconds"""
+        for name in names or list(self._factories):
+            self.get(name)
+        return dict(self._load_seconds)
+
+    def stats(self) -> dict:
+        return {
+            "registered": sorted(self._factories),
+            "loaded": dict(self._load_seconds),
+        }
+
+
+class LazyModel:
+    """Stands in for a registered model and builds it on first attribute access"""
+
+    def __init__(self, registry: ModelRegistry, name: str):
+        self._registry = registry
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(self._registry.get(self._name), attr)
+
+    def __repr__(self):
+        return f"LazyModel({self._name!r})"
+
+
+models = ModelRegistry()
+
+models.register("embeddings", embedding_service.model)
+
+models.register("gpt-4o", lambda: _openai("gpt-4o", temperature=0))
+models.register("gpt-4o-mini", lambda: _openai("gpt-4o-mini", temperature=0))
+models.register("o3-mini", lambda: _openai("o3-mini", reasoning_effort="high"))
+models.register("o1-preview", lambda: _openai("o1-preview", temperature=1))
+
+models.register("gemini-2.5-flash-lite", lambda: _gemini("gemini-2.5-flash-lite", temperature=0))
+models.register("gemini-2.5-flash", lambda: _gemini("gemini-2.5-flash", temperature=0))
+models.register("gemini-2.5-pro", lambda: _gemini("gemini-2.5-pro", temperature=0))
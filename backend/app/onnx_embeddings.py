@@ -0,0 +1,85 @@
+from dotenv import load_dotenv
+import os
+import platform
+import threading
+from typing import List, Optional
+
+import numpy as np
+import onnxruntime as ort
+from huggingface_hub import hf_hub_download
+from langchain_core.embeddings import Embeddings
+from tokenizers import Tokenizer
+
+# int8-quantized ONNX export of the sentence-transformer, for CPU-only hosts
+
+load_dotenv()
+
+# sentence-transformers publishes quantized exports next to the PyTorch weights
+DEFAULT_ONNX_FILE = (
+    "onnx/model_qint8_arm64.onnx" if platform.machine().lower() in ("arm64", "aarch64")
+    else "onnx/model_quint8_avx2.onnx"
+)
+# A file in the model repo, or a path to a locally exported model
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", DEFAULT_ONNX_FILE)
+# 0 lets onnxruntime use every core
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))
+
+
+class OnnxEmbeddings(Embeddings):
+    """Sentence-transformer embeddings computed with onnxruntime.
+
+    Reproduces the model's PyTorch pipeline: word-piece tokenization
+    truncated to `max_length`, mean pooling over the attention mask and L2
+    normalization. Texts are batched by length so little time goes to padding.
+    """
+
+    def __init__(self,
+                 model_name: str,
+                 file_name: str = EMBEDDING_ONNX_FILE,
+                 max_length: int = 256,
+                 batch_size: int = 32,
+                 threads: int = EMBEDDING_THREADS):
+        self.model_name = model_name
+        self.file_name = file_name
+        self.batch_size = batch_size
+        path = file_name if os.path.exists(file_name) else hf_hub_download(model_name, file_name)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = threads
+        self._session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self._input_names = {model_input.name for model_input in self._session.get_inputs()}
+
+        self._tokenizer = Tokenizer.from_pretrained(model_name)
+        self._tokenizer.enable_truncation(max_length=max_length)
+        self._tokenizer.enable_padding()
+        # Tokenizer settings are per instance and not safe to share across threads mid-call
+        self._lock = threading.Lock()
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        with self._lock:
+            encodings = self._tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            inputs["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+        hidden = self._session.run(None, inputs)[0]
+        mask = attention_mask[:, :, None].astype(hidden.dtype)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for i, vector in zip(batch, self._embed_batch([texts[i] for i in batch])):
+                vectors[i] = vector.tolist()
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
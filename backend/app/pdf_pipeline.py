@@ -0,0 +1,123 @@
+from dotenv import load_dotenv
+import asyncio
+import os
+import tempfile
+from collections import deque
+from typing import AsyncIterator, List, Optional
+
+from Browser.http_client import http_client
+from .executor import executor
+from .extraction import extract_pdf_pages, pdf_page_count
+
+# Streaming, page-parallel PDF extraction with a page and character budget
+
+load_dotenv()
+
+PDF_MAX_BYTES = int(os.getenv("PDF_MAX_BYTES", str(50 * 1024 * 1024)))
+# Budget per document, so a 300 page thesis can't dominate a run
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "40"))
+PDF_MAX_CHARS = int(os.getenv("PDF_MAX_CHARS", "200000"))
+# Abstract and introduction live at the front, conclusion at the back, they are read first
+PDF_HEAD_PAGES = int(os.getenv("PDF_HEAD_PAGES", "10"))
+PDF_TAIL_PAGES = int(os.getenv("PDF_TAIL_PAGES", "5"))
+# Pages handed to one worker at a time
+PDF_PAGE_BATCH = int(os.getenv("PDF_PAGE_BATCH", "4"))
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# Downloaded bytes are collected up to this much and written off the event loop
+WRITE_BLOCK_SIZE = 1024 * 1024
+
+
+class PdfFetchError(Exception):
+    """The URL could not be downloaded as a PDF"""
+
+
+async def download_pdf(url: str, validators: Optional[dict] = None) -> str:
+    """Stream the PDF to a temp file and return its path, the caller removes it"""
+    fd, path = tempfile.mkstemp(prefix="agentr_pdf_", suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async with http_client.get(url) as response:
+                if response.status != 200:
+                    raise PdfFetchError(f"HTTP {response.status}")
+                if validators is not None:
+                    validators.update(etag=response.headers.get("ETag"),
+                                      last_modified=response.headers.get("Last-Modified"))
+                size = 0
+                block = bytearray()
+                async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                    if size == 0 and not chunk.startswith(b"%PDF"):
+                        raise PdfFetchError("Not a valid PDF file")
+                    size += len(chunk)
+                    if size > PDF_MAX_BYTES:
+                        raise PdfFetchError(f"PDF larger than {PDF_MAX_BYTES} bytes")
+                    block.extend(chunk)
+                    if len(block) >= WRITE_BLOCK_SIZE:
+                        await executor.run_io("pdf_write", f.write, bytes(block))
+                        block.clear()
+                if block:
+                    await executor.run_io("pdf_write", f.write, bytes(block))
+        return path
+    except BaseException:
+        os.remove(path)
+        raise
+
+
+def select_pages(page_count: int,
+                 max_pages: int = PDF_MAX_PAGES,
+                 head: int = PDF_HEAD_PAGES,
+                 tail: int = PDF_TAIL_PAGES) -> List[int]:
+    """Pages to read in priority order: the head, then the tail, then the middle until the budget is spent"""
+    if page_count <= max_pages:
+        return list(range(page_count))
+    head_pages = list(range(min(head, max_pages)))
+    tail_pages = list(range(max(page_count - tail, len(head_pages)), page_count))[:max_pages - len(head_pages)]
+    chosen = set(head_pages + tail_pages)
+    middle = [n for n in range(page_count) if n not in chosen][:max_pages - len(chosen)]
+    return head_pages + tail_pages + middle
+
+
+async def iter_pdf_text(url: str, clean: bool = False, validators: Optional[dict] = None) -> AsyncIterator[str]:
+    """Yield the PDF's text a batch of pages at a time, in `select_pages` priority order.
+
+    Batches are extracted in parallel but yielded in order, so the first one is
+    always the head pages, whichever worker finishes first. Dedup fingerprints
+    it, and mirrors of one PDF must give the same text.
+    `validators` is filled with the response's ETag and Last-Modified for caching.
+    """
+    path = await download_pdf(url, validators)
+    running = deque()
+    try:
+        page_count = await executor.run_cpu("pdf_pages", pdf_page_count, path)
+        pages = select_pages(page_count)
+        batches = [pages[i:i + PDF_PAGE_BATCH] for i in range(0, len(pages), PDF_PAGE_BATCH)]
+        print(f"Reading {len(pages)} of {page_count} pages from {url}")
+
+        chars = 0
+        window = max(1, executor.cpu_workers)
+        while batches or running:
+            # Keep every worker busy, in priority order, until the character budget is spent
+            while batches and len(running) < window and chars < PDF_MAX_CHARS:
+                batch = batches.pop(0)
+                running.append(asyncio.ensure_future(
+                    executor.run_cpu("pdf_extract", extract_pdf_pages, path, batch, clean)
+                ))
+            if not running:
+                break
+
+            # The oldest batch first, later ones keep extracting meanwhile
+            page_texts = sorted(await running.popleft())
+            text = "\n".join(page_text for _, page_text in page_texts)
+            if not text.strip() or chars >= PDF_MAX_CHARS:
+                continue
+            text = text[:PDF_MAX_CHARS - chars]
+            chars += len(text)
+            yield text
+    finally:
+        for task in running:
+            task.cancel()
+        try:
+            os.remove(path)
+        except OSError as e:
+            # Still mapped by a cancelled worker on Windows, the OS temp cleanup gets it later
+            print(f"Could not remove {path}: {e}")
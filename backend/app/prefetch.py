@@ -0,0 +1,192 @@
+from dotenv import load_dotenv
+import asyncio
+import os
+import re
+from typing import Dict, List, NamedTuple, Optional, Set
+
+from Browser.http_client import http_client
+from .document_cache import document_cache, is_shareable, normalize_url, validators_from_headers
+from .executor import executor
+from .extraction import parse_article
+
+# Speculative fetch of result links while the LLM decides what to click
+
+load_dotenv()
+
+# Result links prefetched per results page, in ranking order
+PREFETCH_LINKS = int(os.getenv("PREFETCH_LINKS", "3"))
+# Budget per run, so speculation on pages never clicked stays bounded
+PREFETCH_MAX_URLS = int(os.getenv("PREFETCH_MAX_URLS", "12"))
+PREFETCH_MAX_BYTES = int(os.getenv("PREFETCH_MAX_BYTES", str(8 * 1024 * 1024)))
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "2"))
+# How long a click waits for a prefetch of the same page that is still running
+PREFETCH_WAIT = float(os.getenv("PREFETCH_WAIT", "5"))
+# Article text shorter than this (JS shells, cookie walls) is dropped, the click extracts the rendered page
+PREFETCH_MIN_CHARS = int(os.getenv("PREFETCH_MIN_CHARS", "500"))
+
+READ_CHUNK_SIZE = 64 * 1024
+TITLE_RE = re.compile(r"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+
+
+class PrefetchBudgetExceeded(Exception):
+    """The page is larger than what is left of the run's byte budget"""
+
+
+class PrefetchedDocument(NamedTuple):
+    url: str
+    text: str
+    title: str
+    validators: Dict[str, Optional[str]]
+    # False when the page may depend on cookies, it then serves this run only
+    shareable: bool
+
+
+class Prefetcher:
+    """Fetches and extracts candidate links of one run, kept for that run only.
+
+    Pages are fetched over plain HTTP rather than in a tab, so prefetching
+    never touches the page the agent is driving. Only pages where newspaper
+    finds a substantial article are kept, since plain HTTP misses what
+    scripts render. The agent promotes a page into the shared document cache
+    when it opens it. A prefetched page that the agent later opens counts as
+    a hit, one it never opens as wasted bytes.
+    """
+
+    def __init__(self,
+                 run_id: str,
+                 max_urls: int = PREFETCH_MAX_URLS,
+                 max_bytes: int = PREFETCH_MAX_BYTES,
+                 concurrency: int = PREFETCH_CONCURRENCY):
+        self.run_id = run_id
+        self.max_urls = max_urls
+        self.max_bytes = max_bytes
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._prefetched: Dict[str, int] = {}
+        self._documents: Dict[str, PrefetchedDocument] = {}
+        self._aliases: Dict[str, str] = {}
+        self._used: Set[str] = set()
+        self._counters = {"scheduled": 0, "fetched": 0, "failed": 0, "skipped_cached": 0,
+                          "unsubstantial": 0, "bytes": 0}
+
+    def schedule(self, urls: List[str]):
+        """Start prefetching the urls not yet seen in this run, as far as the budget allows"""
+        for url in urls:
+            url_key = normalize_url(url)
+            if url_key in self._tasks or url.lower().endswith(".pdf"):
+                continue
+            if len(self._tasks) >= self.max_urls or self._counters["bytes"] >= self.max_bytes:
+                return
+            self._counters["scheduled"] += 1
+            self._tasks[url_key] = asyncio.create_task(self._prefetch(url, url_key))
+
+    async def _prefetch(self, url: str, url_key: str):
+        async with self._semaphore:
+            if await document_cache.contains(url):
+                self._counters["skipped_cached"] += 1
+                return
+            try:
+                html, headers, request_headers, final_url = await self._download(url)
+                text = await executor.run_cpu("parse_article", parse_article, url, html)
+                if not text or len(text.strip()) < PREFETCH_MIN_CHARS:
+                    self._counters["unsubstantial"] += 1
+                    return
+                title = TITLE_RE.search(html)
+                title = title.group(1).strip() if title else ""
+                self._documents[url_key] = PrefetchedDocument(
+                    url, text, title, validators_from_headers(headers), is_shareable(headers, request_headers))
+                if normalize_url(final_url) != url_key:
+                    # A redirect, the agent will see the final url after clicking
+                    self._aliases[normalize_url(final_url)] = url_key
+                self._prefetched[url_key] = len(html)
+                self._counters["fetched"] += 1
+            except Exception as e:
+                self._counters["failed"] += 1
+                print(f"Prefetching {url} failed: {e}")
+
+    async def _download(self, url: str):
+        async with http_client.get(url) as response:
+            content_type = response.headers.get("Content-Type", "")
+            if response.status != 200 or "html" not in content_type:
+                raise ValueError(f"HTTP {response.status} {content_type}")
+            data = bytearray()
+            async for chunk in response.content.iter_chunked(READ_CHUNK_SIZE):
+                self._counters["bytes"] += len(chunk)
+                data.extend(chunk)
+                if self._counters["bytes"] > self.max_bytes:
+                    raise PrefetchBudgetExceeded(f"byte budget of {self.max_bytes} spent")
+            return (bytes(data).decode(response.charset or "utf-8", errors="replace"),
+                    dict(response.headers), dict(response.request_info.headers), str(response.url))
+
+    async def take(self, url: str, timeout: float = PREFETCH_WAIT) -> Optional[PrefetchedDocument]:
+        """Let a running prefetch of `url` finish, returns the page if it was prefetched"""
+        url_key = normalize_url(url)
+        url_key = self._aliases.get(url_key, url_key)
+        task = self._tasks.get(url_key)
+        if task is not None and not task.done():
+            await asyncio.wait({task}, timeout=timeout)
+        document = self._documents.pop(url_key, None)
+        if document is not None:
+            self._used.add(url_key)
+        return document
+
+    def cancel(self):
+        for task in self._tasks.values():
+            task.cancel()
+
+    def stats(self) -> dict:
+        stats = dict(self._counters)
+        wasted = sum(size for url_key, size in self._prefetched.items() if url_key not in self._used)
+        stats.update({
+            "hits": len(self._used),
+            "hit_rate": round(len(self._used) / len(self._prefetched), 3) if self._prefetched else 0.0,
+            "wasted_bytes": wasted,
+        })
+        return stats
+
+
+class PrefetchRegistry:
+    """The prefetcher of every running query, keyed by run id"""
+
+    def __init__(self):
+        self._runs: Dict[str, Prefetcher] = {}
+        self._finished = {"runs": 0, "prefetched": 0, "hits": 0, "bytes": 0, "wasted_bytes": 0}
+
+    def start(self, run_id: str) -> Prefetcher:
+        self._runs[run_id] = Prefetcher(run_id)
+        return self._runs[run_id]
+
+    def get(self, run_id: Optional[str]) -> Optional[Prefetcher]:
+        return self._runs.get(run_id) if run_id else None
+
+    def schedule(self, run_id: Optional[str], urls: List[str]):
+        prefetcher = self.get(run_id)
+        if prefetcher is not None and urls:
+            prefetcher.schedule(urls)
+
+    async def take(self, run_id: Optional[str], url: str) -> Optional[PrefetchedDocument]:
+        prefetcher = self.get(run_id)
+        return await prefetcher.take(url) if prefetcher is not None else None
+
+    def finish(self, run_id: str):
+        """Cancel what is still in flight and fold the run's numbers into the totals"""
+        prefetcher = self._runs.pop(run_id, None)
+        if prefetcher is None:
+            return
+        prefetcher.cancel()
+        stats = prefetcher.stats()
+        print(f"Prefetch for run {run_id}: {stats}")
+        self._finished["runs"] += 1
+        self._finished["prefetched"] += stats["fetched"]
+        self._finished["hits"] += stats["hits"]
+        self._finished["bytes"] += stats["bytes"]
+        self._finished["wasted_bytes"] += stats["wasted_bytes"]
+
+    def stats(self) -> dict:
+        stats = dict(self._finished)
+        stats["hit_rate"] = round(stats["hits"] / stats["prefetched"], 3) if stats["prefetched"] else 0.0
+        stats["running"] = {run_id: prefetcher.stats() for run_id, prefetcher in self._runs.items()}
+        return stats
+
+
+prefetch_registry = PrefetchRegistry()
@@ -0,0 +1,231 @@
+import asyncio
+from contextlib import aclosing
+from typing import List, Optional, Tuple
+from urllib.parse import urlparse
+
+from langchain_core.documents import Document
+
+from Browser.navigation_tracker import content_kind
+from .chunking import chunk_text
+from .dedup import dedup_index
+from .document_cache import document_cache, is_shareable, normalize_url, validators_from_headers
+from .embedding_service import embedding_service
+from .executor import executor
+from .extraction import extract_text_from_html, parse_article
+from .pdf_pipeline import iter_pdf_text
+from .prefetch import prefetch_registry
+from .search import select_result_links, RESULTS_FAN_OUT, SCRAPE_CONCURRENCY
+from .vector_store import vector_stores
+
+# Page extraction, chunking and storage shared by the research agents
+
+
+def duplicate_action(url: str, duplicate_of: str) -> str:
+    if normalize_url(duplicate_of) == normalize_url(url):
+        return f"The url {url} is already stored in the vector database, try another url"
+    return f"Skipped the url {url}, it is a duplicate of {duplicate_of} which is already stored in the vector database"
+
+
+async def shareable_response(response) -> bool:
+    """Whether a page a browser tab loaded may go in the shared document cache.
+
+    Tabs carry their session's cookies, so a page is cached only when neither
+    the request nor the response involved credentials.
+    """
+    if response is None:
+        return False
+    try:
+        return is_shareable(await response.all_headers(), await response.request.all_headers())
+    except Exception as e:
+        print(f"Could not read headers of {response.url}: {e}")
+        return False
+
+
+class RagPipeline:
+    """Turns pages and PDFs into deduplicated, embedded chunks in a run's vector collection.
+
+    Each agent keeps its own instance: chunk sizes are in tokens of the
+    embedding model, `clean_pdf` strips headers and footers from PDF pages,
+    `page_metadata` adds a title and domain to every chunk, and
+    `html_fallback` retries pages newspaper can't parse with the
+    content-selector extractor.
+    """
+
+    def __init__(self,
+                 chunk_size: int,
+                 chunk_overlap: int,
+                 clean_pdf: bool = False,
+                 page_metadata: bool = False,
+                 html_fallback: bool = False):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.clean_pdf = clean_pdf
+        self.page_metadata = page_metadata
+        self.html_fallback = html_fallback
+
+    async def scrape_text(self, page) -> str:
+        """Extracts the article text from the HTML the page has already rendered, no second download"""
+        url = page.url
+        try:
+            # The live DOM includes JS-rendered content and anything behind the session's cookies
+            html = await page.content()
+        except Exception as e:
+            print(f"Error reading page content for {url}: {e}")
+            return "Forbidden"
+
+        try:
+            text = await executor.run_cpu("parse_article", parse_article, url, html) or ""
+        except Exception as e:
+            print(f"Error parsing article {url}: {e}")
+            text = ""
+        if self.html_fallback and len(text.strip()) <= 50:
+            text = await executor.run_cpu("extract_html", extract_text_from_html, html) or ""
+            if len(text.strip()) <= 50:
+                text = ""
+        return text or "No data found"
+
+    async def docs_from_text(self, data: str, url: str) -> List[Document]:
+        # Offsets locate each chunk in the page text
+        chunks = await executor.run_cpu("chunk_text", chunk_text, data, self.chunk_size, self.chunk_overlap)
+        metadata = {"source": url}
+        if self.page_metadata:
+            metadata["title"] = url.split("/")[-1].replace("-", " ").replace(".html", "").title()
+            metadata["domain"] = urlparse(url).netloc
+        return [
+            Document(page_content=chunk.text, metadata={
+                **metadata,
+                "chunk_index": index,
+                "start_index": chunk.start,
+                "end_index": chunk.end,
+                "tokens": chunk.tokens,
+            })
+            for index, chunk in enumerate(chunks)
+        ]
+
+    async def store_doc_embeddings(self, docs: List[Document], collection: str) -> int:
+        # Chunks repeated from pages already stored add nothing to retrieval
+        docs = await dedup_index.filter_chunks(collection, docs)
+        if docs:
+            # Embedded in batches shared with concurrent pages, known chunks come from the cache
+            vectors = await embedding_service.embed_documents([doc.page_content for doc in docs])
+            # Buffered and written in batches by the shared vector store manager
+            await vector_stores.add(collection, docs, vectors)
+        return len(docs)
+
+    async def store_text(self, text: str, url: str, collection: str) -> Tuple[int, Optional[str]]:
+        """Chunks and stores the text unless it's a near-duplicate, returns the chunks stored and the url it duplicates"""
+        duplicate_of = await dedup_index.claim_document(collection, url, text)
+        if duplicate_of:
+            return 0, duplicate_of
+        try:
+            docs = await self.docs_from_text(text, url)
+            return await self.store_doc_embeddings(docs, collection), None
+        except BaseException:
+            dedup_index.release_document(collection, url)
+            raise
+
+    async def store_cached(self, url: str, collection: str, run_id: Optional[str] = None) -> Optional[str]:
+        """Stores the prefetched or cached extraction of the url in the vector database, None if there is none"""
+        prefetched = await prefetch_registry.take(run_id, url)
+        if prefetched is not None:
+            if prefetched.shareable:
+                # Passed the prefetcher's substance check, later runs can serve it from the cache
+                await document_cache.put(url, prefetched.text, title=prefetched.title, **prefetched.validators)
+            text, source = prefetched.text, "prefetched copy"
+        else:
+            cached = await document_cache.get(url)
+            if cached is None:
+                return None
+            text, source = cached.text, "document cache"
+        stored, duplicate_of = await self.store_text(text, url, collection)
+        if duplicate_of:
+            return duplicate_action(url, duplicate_of)
+        return f"Loaded the url {url} from the {source} and stored {stored} chunks in a vector database for future reference"
+
+    async def store_pdf(self, url: str, collection: str) -> str:
+        """Streams the PDF into the vector database a batch of pages at a time, returns the action taken"""
+        stored = 0
+        texts = []
+        validators = {}
+        try:
+            # Closed explicitly so an early return stops the download and removes the temp file
+            async with aclosing(iter_pdf_text(url, clean=self.clean_pdf, validators=validators)) as batches:
+                async for text in batches:
+                    if not texts:
+                        # The first pages (title, authors, abstract) identify a preprint and its publisher copy
+                        duplicate_of = await dedup_index.claim_document(collection, url, text)
+                        if duplicate_of:
+                            return duplicate_action(url, duplicate_of)
+                    texts.append(text)
+                    docs = await self.docs_from_text(text, url)
+                    stored += await self.store_doc_embeddings(docs, collection)
+        except Exception as e:
+            print(f"Error processing PDF {url}: {e}")
+            if not stored:
+                if texts:
+                    dedup_index.release_document(collection, url)
+                return f"Scraping the webpage {url} failed, should try another url"
+        else:
+            if stored:
+                await document_cache.put(url, "\n".join(texts), **validators)
+
+        if not stored:
+            return f"No textual content found on the webpage {url}, try looking for url that has data"
+        return f"Scraped the url {url} and stored {stored} chunks in a vector database for future reference"
+
+    async def scrape_result_link(self, context, url: str, semaphore: asyncio.Semaphore, collection: str, run_id: Optional[str] = None) -> str:
+        """Scrapes one result link in a background tab and stores it in the vector database"""
+        async with semaphore:
+            cached = await self.store_cached(url, collection, run_id)
+            if cached:
+                return cached
+
+            if url.lower().endswith(".pdf"):
+                return await self.store_pdf(url, collection)
+
+            tab = await context.new_page()
+            try:
+                response = await tab.goto(url, timeout=20000, wait_until="domcontentloaded")
+                content_type = response.headers.get("content-type", "") if response else ""
+                kind = content_kind(content_type, tab.url)
+                if kind == "pdf":
+                    return await self.store_pdf(url, collection)
+                if kind == "binary":
+                    return f"The url {url} is a {content_type} file, not a readable page"
+                result = await self.scrape_text(tab)
+                if result not in ("Forbidden", "No data found") and await shareable_response(response):
+                    await document_cache.put(url, result, title=await tab.title(),
+                                             **validators_from_headers(response.headers if response else {}))
+            except Exception as e:
+                print(f"Error loading {url}: {e}")
+                result = "Forbidden"
+            finally:
+                await tab.close()
+
+        if result == "Forbidden":
+            return f"Scraping the webpage {url} failed"
+        if result == "No data found":
+            return f"No textual content found on the webpage {url}"
+        stored, duplicate_of = await self.store_text(result, url, collection)
+        if duplicate_of:
+            return duplicate_action(url, duplicate_of)
+        return f"Scraped the url {url} and stored {stored} chunks in the vector database"
+
+    async def scrape_results(self, page, dom_elements: list, visited_urls: List[str], collection: str, run_id: Optional[str] = None) -> dict:
+        """Scrapes the top result links of a results page concurrently, returns the node's state update"""
+        urls = select_result_links(dom_elements, visited_urls, RESULTS_FAN_OUT)
+        if not urls:
+            return {"actions_taken": ["No unvisited result links on this page, try a different search"]}
+
+        semaphore = asyncio.Semaphore(SCRAPE_CONCURRENCY)
+        outcomes = await asyncio.gather(
+            *(self.scrape_result_link(page.context, url, semaphore, collection, run_id) for url in urls),
+            return_exceptions=True,
+        )
+        await page.bring_to_front()
+
+        actions_taken = [
+            outcome if isinstance(outcome, str) else f"Scraping the webpage {url} failed: {outcome}"
+            for url, outcome in zip(urls, outcomes)
+        ]
+        return {"actions_taken": actions_taken, "visited_urls": urls}
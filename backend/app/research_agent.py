@@ -1,36 +1,32 @@
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
 import os
 from typing import TypedDict, Annotated, List, Literal
 from playwright.async_api import Page
 from operator import add
 from pydantic import BaseModel, Field
 from Browser.webrover_browser import WebRoverBrowser
+from Browser.wait_engine import wait_engine
+from Browser.navigation_tracker import navigation_tracker
 import asyncio
 from playwright.async_api import async_playwright
 from playwright.async_api import Page, Locator
 import platform
-from langchain_text_splitters import NLTKTextSplitter, SpacyTextSplitter
-from newspaper import Article
-import aiohttp
 import asyncio
 from io import BytesIO
-from PyPDF2 import PdfReader
 from langchain_core.documents import Document
-from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
 from langchain_core.messages import SystemMessage, HumanMessage
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import OpenAIEmbeddings
 from langgraph.graph import START, END, StateGraph
-from IPython.display import Image, display
-from langchain_huggingface import HuggingFaceEmbeddings
-import nltk
-nltk.download('punkt')
+from .dom_marking import execute_script, remove_highlights
+from .dom_ranking import rank_elements, resolve_action_element, UnresolvedElement
+from .vector_store import run_collection, vector_stores
+from .model_registry import models
+from .document_cache import document_cache
+from .search import build_search_url, is_results_page, search_engine_host, search_home_url, select_result_links
+from .prefetch import prefetch_registry, PREFETCH_LINKS
+from .rag_pipeline import RagPipeline, duplicate_action, shareable_response
 
 
-embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-
 load_dotenv()
 def set_env_vars(var):
     value = os.getenv(var)
@@ -43,12 +39,13 @@ vars = ["GEMINI_API_KEY", "LANGCHAIN_API_KEY", "LANGCHAIN_TRACING_V2", "LANGCHAI
 for var in vars:
     set_env_vars(var)
 
-llm_4o = ChatOpenAI(model="gpt-4o", temperature=0)
-llm_mini = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-llm_o3_mini = ChatOpenAI(model="o3-mini", reasoning_effort="high")
+# Built on first use and shared with the other agent, importing the module creates no clients
+llm_4o = models.lazy("gpt-4o")
+llm_mini = models.lazy("gpt-4o-mini")
+llm_o3_mini = models.lazy("o3-mini")
 
-llm_anthropic = ChatOpenAI(model="gpt-4o", temperature=0)
-llm_openai_o1 = ChatOpenAI(model="o1-preview", temperature=1)
+llm_anthropic = models.lazy("gpt-4o")
+llm_openai_o1 = models.lazy("o1-preview")
 llm = llm_4o
 
 
@@ -71,15 +68,17 @@ class DomElement(TypedDict):
 
 class Action(TypedDict):
     thought : str
-    action_type : Literal["click", "type", "scroll_read", "close_page", "wait", "go_back", "go_to_search", "retry", "respond"]
+    action_type : Literal["click", "type", "scroll_read", "close_page", "wait", "go_back", "go_to_search", "search", "scrape_results", "retry", "respond"]
     args : str 
     action_element : DomElement
 
     
 class AgentState(TypedDict):
     input: str
+    run_id: str
     page : Page
     dom_elements : List[DomElement]
+    prompt_elements : List[dict]
 
     action : Action
     actions_taken : Annotated[List[str], add]
@@ -96,6 +95,7 @@ async def setup_browser(go_to_page: str):
     print(f"Setting up browser for {go_to_page}")
     browser = WebRoverBrowser()
     browser, context = await browser.connect_to_chrome()
+    navigation_tracker.attach(context)
 
     page = await context.new_page()
     
@@ -114,73 +114,6 @@ async def setup_browser(go_to_page: str):
 # Screen Annotations
 
 
-# Load the JavaScript file
-with open("marking_scripts/final_marking.js", "r", encoding="utf-8") as f:
-    marking_script = f.read()
-
-async def execute_script(page):
-
-    await asyncio.sleep(3)
-    
-    # Run the JavaScript marking function
-    dom_tree = await page.evaluate(f"""
-        (function() {{
-            {marking_script}
-            return captureInteractiveElements();
-        }})();
-    """)
-
-        
-    return dom_tree
-
-async def remove_highlights(page):
-
-    await asyncio.sleep(1)
-    # Ensure the function is executed properly
-    await page.evaluate("""
-        (function() {
-            if (typeof unmarkElements === 'function') {
-                unmarkElements();
-            } else {
-                console.error('unmarkElements() not found. Re-injecting...');
-                (function() {
-                    function unmarkElements() {
-                        console.log("Removing highlights...");
-
-                        // Remove highlight container
-                        const highlightContainer = document.getElementById('web-agent-highlight-container');
-                        if (highlightContainer) {
-                            highlightContainer.remove();
-                            console.log("Highlight container removed.");
-                        }
-
-                        // Remove all highlight overlays
-                        document.querySelectorAll("div").forEach(el => {
-                            const style = window.getComputedStyle(el);
-                            if (
-                                (el.id && el.id.includes("highlight")) || 
-                                style.border.includes("2px solid") || 
-                                style.backgroundColor.includes("22") || 
-                                style.zIndex === "2147483647"
-                            ) {
-                                el.remove();
-                            }
-                        });
-
-                        // Remove lingering elements
-                        setTimeout(() => {
-                            document.querySelectorAll("[id^='highlight-'], div[style*='border: 2px solid'], div[style*='z-index: 2147483647']")
-                                .forEach(el => el.remove());
-                        }, 100);
-                    }
-
-                    unmarkElements();
-                })();
-            }
-        })();
-    """)
-
-
 # Click
 
 async def click(state: AgentState):
@@ -321,7 +254,8 @@ async def click(state: AgentState):
                 "new_page": False
             }
 
-    await asyncio.sleep(2)
+    # Resolves as soon as the clicked page stops changing
+    await wait_engine.wait_for(state["page"], "click", until=("dom_stable",))
     
     element_description = (
         f"{state['action']['action_element']['type']} element "
@@ -354,29 +288,23 @@ async def type(state: AgentState):
     try:
         bbox_x, bbox_y = state["action"]["action_element"]["x"], state["action"]["action_element"]["y"]
         await page.mouse.click(bbox_x, bbox_y, click_count=3)
-        await asyncio.sleep(1)
         select_all = "Meta+A" if platform.system() == "Darwin" else "Control+A"
         await page.keyboard.press(select_all)
-        await asyncio.sleep(1)
         await page.keyboard.press("Backspace")
-        await asyncio.sleep(1)
         await page.keyboard.type(text)
-        await asyncio.sleep(4)
 
     except Exception as e:
         xpath = state["action"]["action_element"]["xpath"]
         await page.locator(f'xpath={xpath}').click()
-        await asyncio.sleep(1)
         select_all = "document.execCommand('selectAll', false, null);"
         await page.locator(f'xpath={xpath}').evaluate(select_all)
-        await asyncio.sleep(1)
         await page.locator(f'xpath={xpath}').type(text)
-        await asyncio.sleep(4)
         
 
     element_description = f"{state['action']['action_element']['type']} element {state['action']['action_element']['description']}"
-    await page.keyboard.press("Enter")
-    await asyncio.sleep(2)
+    # Submitting usually navigates to a results page, the watch waits for it to commit
+    async with wait_engine.watch(page, "type", until=("dom_stable",)):
+        await page.keyboard.press("Enter")
     
     return {"actions_taken": [f"Typed {text} into {element_description}"]}
 
@@ -472,25 +400,27 @@ async def close_opened_link(state: AgentState):
 # Wait
 
 async def wait(state: AgentState):
-    """Waits for a specified amount of time."""
-    seconds = state["action"]["args"]
-    await asyncio.sleep(5)
-    return {"actions_taken": [f"Waited for {seconds} seconds"]}
+    """Waits for the page to settle, for at most the requested number of seconds."""
+    try:
+        seconds = max(0.0, min(float(state["action"]["args"]), 10))
+    except (TypeError, ValueError):
+        seconds = 5
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    await wait_engine.wait_for(state["page"], "wait", until=("network_idle", "dom_stable"), timeout=int(seconds * 1000))
+    return {"actions_taken": [f"Waited {loop.time() - start:.1f} seconds for the page to settle"]}
 
 
 
 # Go back 
 
 async def go_back(state: AgentState):
-    """Goes back to the previous page by calling window.history.back() and waiting for a known element."""
+    """Goes back to the previous page by calling window.history.back() and waiting for it to commit and settle."""
     page = state["page"]
     # Trigger back navigation via JavaScript.
     previous_page = page.url
-    await page.evaluate("window.history.back()")
-    # Wait a bit for the navigation to complete.
-    # Optionally, you can wait for a specific selector you expect on the previous page:
-    # await page.wait_for_selector("css=selector-of-known-element", timeout=30000)
-    await page.wait_for_timeout(5000)
+    async with wait_engine.watch(page, "go_back", until=("navigation", "dom_stable")):
+        await page.evaluate("window.history.back()")
     current_page = page.url
     return {"actions_taken": [f"Navigated back to {current_page} from {previous_page}"]}
 
@@ -498,124 +428,63 @@ async def go_back(state: AgentState):
 # Go to Search
 
 async def go_to_search(state: AgentState):
-    """Goes to google.com"""
+    """Goes to the search engine's home page"""
     page = state["page"]
-    await page.goto("https://www.google.com", timeout=30000, wait_until="domcontentloaded")
-    return {"actions_taken": [f"Navigated to Google"]}
-
-
-# WebPage RAG
-
-# Scrape Text
-
-
-
-async def scrape_text(page):        
-    # Evaluate JavaScript in the page context to extract text and images.
-
-# URL of the news article
-    url = page.url
-
-    # Create an Article object
-    article = Article(url)
-
-    # Download the article's HTML content
-    try:
-        article.download()
-
-        # Parse the downloaded content
-        article.parse()
-
-        data = article.text
-
-        if data == "":
-            return "No data found"
-
-        return data
-   
-    except Exception as e:
-        return "Forbidden"
-
-    
-# Scrape PDF
-
-async def scrape_pdf(page):
-    """
-    Fetches the PDF file from the current page's URL and extracts its text.
-    Returns:
-        - Extracted text if successful.
-        - "No data found" if no text is extracted.
-        - "Forbidden" if the PDF could not be downloaded.
-    """
-    url = page.url
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
-            if response.status == 200:
-                content = await response.read()
-                pdf_data = BytesIO(content)
-                try:
-                    reader = PdfReader(pdf_data)
-                    text = ""
-                    for page_num in range(len(reader.pages)):
-                        page_obj = reader.pages[page_num]
-                        page_text = page_obj.extract_text()
-                        if page_text:
-                            text += page_text + "\n"
-                    if text.strip() == "":
-                        return "No data found"
-                    return text
-                except Exception as e:
-                    print(f"Error parsing PDF: {e}")
-                    return "Forbidden"
-            else:
-                return "Forbidden"
+    await page.goto(search_home_url(), timeout=30000, wait_until="domcontentloaded")
+    return {"actions_taken": [f"Navigated to {search_engine_host()}"]}
 
 
-# Docs from Text
-
-async def docs_from_text(data, url):
-    text_splitter = NLTKTextSplitter(chunk_size=500, chunk_overlap=10)
-    
-    texts = text_splitter.split_text(data)
+# Search
 
-    docs = [Document(page_content=text, metadata={"source": url}) for text in texts]
-
-    return docs
-
-# Store Doc Embeddings
+async def search(state: AgentState):
+    """Loads the results page for the query in args in a single navigation"""
+    page = state["page"]
+    query = state["action"]["args"]
+    await page.goto(build_search_url(query), timeout=30000, wait_until="domcontentloaded")
+    return {"actions_taken": [f"Searched for {query}"]}
 
-async def store_doc_embeddings(docs):
 
-    embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
+# WebPage RAG
 
-    vector_store = Chroma(
-        collection_name="webpage_rag",
-        embedding_function=embeddings,
-        persist_directory="./rag_store_webpage",  # Where to save data locally, remove if not necessary
-    )
+rag = RagPipeline(chunk_size=128, chunk_overlap=8)
 
-    vector_store.add_documents(docs)
 
+def rag_collection(state: AgentState) -> str:
+    """Vector store collection of this run, so concurrent runs never read each other's pages"""
+    return run_collection(state.get("run_id"))
 
 
 async def web_page_rag(state: AgentState):
     try:
         page = state["page"]
 
-        if state["is_pdf"]:
-            result = await scrape_pdf(page)
-        else:
-            result = await scrape_text(page)
+        # Pages seen in this or an earlier run, or prefetched for this one, skip download and extraction
+        cached = await rag.store_cached(page.url, rag_collection(state), state.get("run_id"))
+        if cached:
+            return {"actions_taken": [cached]}
+
+        navigation = navigation_tracker.get(page)
+        if navigation is not None and navigation.kind == "binary":
+            return {"actions_taken": [f"The url {page.url} is a {navigation.content_type} file, not a readable page, should try another url"]}
+
+        is_pdf = navigation.kind == "pdf" if navigation is not None else state["is_pdf"]
+        if is_pdf:
+            return {"actions_taken": [await rag.store_pdf(page.url, rag_collection(state))]}
+
+        result = await rag.scrape_text(page)
 
         if result == "Forbidden":
             return {"actions_taken": [f"Scraping the webpage {page.url} failed, should try another url"]}
         elif result == "No data found":
             return {"actions_taken": [f"No textual content found on the webpage {page.url}, try looking for url that has data"]}
         else:
-            docs = await docs_from_text(result, page.url)
-            print(len(docs))
-
-            await store_doc_embeddings(docs)
+            # The tab carries the session's cookies, only pages fetched without them are shared
+            if navigation is not None and await shareable_response(navigation.response):
+                await document_cache.put(page.url, result, title=await page.title(), **navigation.validators)
+            stored, duplicate_of = await rag.store_text(result, page.url, rag_collection(state))
+            if duplicate_of:
+                return {"actions_taken": [duplicate_action(page.url, duplicate_of)]}
+            print(stored)
 
             return {"actions_taken":[f"Scraped the url {page.url} and stored the information in a vector database for future reference"]}
     except Exception as e:
@@ -623,6 +492,14 @@ async def web_page_rag(state: AgentState):
         return {"actions_taken": [f"Error processing page content: {str(e)}"]}
 
 
+# Scrape Results
+
+async def scrape_results(state: AgentState):
+    """Scrapes the top result links of the current results page concurrently"""
+    return await rag.scrape_results(state["page"], state["dom_elements"], state.get("visited_urls", []),
+                                    rag_collection(state), state.get("run_id"))
+
+
 # Note Scroll Read
 
 async def note_scroll_read(state: AgentState):
@@ -705,6 +582,16 @@ async def annotate_page(state: AgentState):
 
     await remove_highlights(page)
 
+    if is_results_page(page.url):
+        # Fetch the top results while the LLM decides, a click on one of them then reads from the cache
+        prefetch_registry.schedule(
+            state.get("run_id"),
+            select_result_links(dom_elements, state.get("visited_urls", []), PREFETCH_LINKS),
+        )
+
+    navigation = navigation_tracker.get(page)
+    if navigation is not None:
+        return {"dom_elements": dom_elements, "is_pdf": navigation.kind == "pdf"}
     if dom_elements[0]["type"] == "pdf":
         return {"dom_elements": dom_elements, "is_pdf": True}
     else:
@@ -712,6 +599,14 @@ async def annotate_page(state: AgentState):
 
 
 
+async def rank_dom_elements(state: AgentState):
+    # Keep only what fits the prompt budget, llm_call_node maps the pick back by index
+    prompt_elements = rank_elements(state["dom_elements"], state["input"])
+    print(f"Ranked {len(prompt_elements)} of {len(state['dom_elements'])} elements for the prompt")
+    return {"prompt_elements": prompt_elements}
+
+
+
 # Llm Call Node
 
 async def llm_call_node(state: AgentState):
@@ -724,17 +619,20 @@ async def llm_call_node(state: AgentState):
             - Close Page: Close the current tab and switch focus to the last opened tab.
             - Wait: Pause for a specified amount of time.
             - Go Back: Navigate back to the previous page.
-            - Go to Search: Navigate to Google.
+            - Go to Search: Navigate to the search engine's home page.
+            - Search: Open the search results for the query given in args directly, without typing into a search box.
+            - Scrape Results: On a search results page, read the top result links all at once in background tabs and store them in the vector database.
 
         Your inputs include:
             - The user's query (what the user wants to achieve).
-            - A list of interactive DOM elements on the current page with properties: [xpath, type, text, description, x, y].
+            - A list of the most relevant interactive DOM elements on the current page with properties: [index, type, text, description, and xpath when the element has an id].
             - A record of actions taken so far.
             - A list of URLs already visited (do not revisit the same URL).
 
         Your task:
             - Decide the next best action (or a coherent sequence of actions) to move closer to fulfilling the user's request.
             - Evaluate the context by carefully reviewing the user's query, previous actions taken, visited URLs, and conversation history.
+            - Always include the element's "index" when selecting a DOM element, it identifies the element on the page.
             - **Important:** When selecting a DOM element for an action, examine its "text" and "description" fields. For example, if the task is to input a departure date on Google Flights, only choose an input field if its description or visible text includes keywords like "departure", "depart", or "depart date". Do not select a generic input element that lacks specific contextual clues.
             - Avoid repeating the same search or action if it has already been performed without progress. If a search term or action was already attempted and yielded no new information, refine or change your approach.
             - Plan your steps: If multiple sequential actions are needed (e.g., scroll then click, or type a refined search query), output them in order until a page navigation or significant state change occurs.
@@ -747,6 +645,8 @@ async def llm_call_node(state: AgentState):
             - Close Page: Use when you need to exit a tab and return to a previous page.
             - Wait: Use to allow the page sufficient time to load or update after an action.
             - Go Back: Use when you need to return to a previous state or page.
+            - Search: Prefer this over Go to Search followed by Type in Inputs whenever you want to run a new web search; put the query in args.
+            - Scrape Results: Prefer this over clicking results one by one when the results page has several relevant, unvisited links.
             - Go to Search & WebPage Search: Use these to initiate or refine searches if no better actions are available.
             - Retry: Use only when you are unable to infer the next action from the current context.
 
@@ -779,14 +679,19 @@ async def llm_call_node(state: AgentState):
 
 
     actions_taken = state.get("actions_taken", [])
-    dom_elements = state["dom_elements"]
+    dom_elements = state.get("prompt_elements") or state["dom_elements"]
     input = state["input"]
     visited_urls = state.get("visited_urls", [])
     prompt_value = prompt.invoke({"actions_taken": actions_taken, "dom_elements": dom_elements, "input": input, "visited_urls": visited_urls})
 
     response = llm.with_structured_output(Action).invoke(prompt_value)
 
-    action = response
+    try:
+        action = resolve_action_element(response, state["dom_elements"])
+    except UnresolvedElement as e:
+        # Scan the page again and ask for a new pick rather than act without coordinates
+        return {"action": {**response, "action_type": "retry"},
+                "actions_taken": [f"{e}, picking again from the current list of elements"]}
 
     return {"action": action}
 
@@ -800,6 +705,8 @@ tools = {
     "wait" : "wait",
     "go_back" : "go_back",
     "go_to_search" : "go_to_search",
+    "search" : "search",
+    "scrape_results" : "scrape_results",
 }
 
 # Tool Router
@@ -818,8 +725,13 @@ async def scroll_and_read(state: AgentState):
 
     page = state["page"]
     await page.wait_for_load_state("domcontentloaded")
-    
-    page = state["page"]
+
+    # The navigation response already says what the document is
+    navigation = navigation_tracker.get(page)
+    if navigation is not None:
+        return {"is_pdf": navigation.kind == "pdf"}
+
+    # Unknown for pages opened before tracking started, fall back to probing the DOM
     result = await page.evaluate("""
         () => {
             const url = window.location.href.toLowerCase();
@@ -851,14 +763,8 @@ async def webpage_or_pdf(state: AgentState):
 # Self Review
 
 async def self_review(state: AgentState):
-    vector_store = Chroma(
-    collection_name="webpage_rag",
-    embedding_function=embeddings,
-    persist_directory="./rag_store_webpage",
-)
-
     input_text = state["input"]
-    relevant_docs = vector_store.similarity_search(input_text, k=60)
+    relevant_docs = await vector_stores.search(rag_collection(state), input_text, k=60)
 
     print(f"Number of documents: {len(relevant_docs)}")
 
@@ -907,17 +813,11 @@ async def after_self_review_router(state: AgentState):
 
 async def answer_node(state: AgentState):
 
-    vector_store = Chroma(
-        collection_name="webpage_rag",
-        embedding_function=embeddings,
-        persist_directory="./rag_store_webpage",  # Where to save data locally, remove if not necessary
-    )
-
     input = state["input"]
 
-    total_docs = vector_store._collection.count() 
-    print("Total docs: ", total_docs)
-    relevant_docs = vector_store.similarity_search(input, k=total_docs)
+    # Every stored chunk, ranked by relevance to the query
+    relevant_docs = await vector_stores.search(rag_collection(state), input)
+    print("Total docs: ", len(relevant_docs))
     
     visited_urls = state.get("visited_urls", [])
 
@@ -1030,15 +930,8 @@ async def answer_node(state: AgentState):
 
 async def empty_rag_store(state : AgentState):
 
-    vector_store = Chroma(
-    collection_name="webpage_rag",
-    embedding_function=embeddings,
-    persist_directory="./rag_store_webpage",
-    )
-
     try:
-        client = vector_store._client  # Access the underlying Chroma client
-        client.delete_collection("webpage_rag")
+        await vector_stores.delete(rag_collection(state))
         return {"actions_taken" : ["Emptied Vector Store"]}
 
     except Exception as e:
@@ -1053,6 +946,7 @@ builder = StateGraph(AgentState)
 
 builder.add_node("url_decide_node", url_decide_node)
 builder.add_node("annotate_page", annotate_page)
+builder.add_node("rank_dom_elements", rank_dom_elements)
 builder.add_node("llm_call_node", llm_call_node)
 builder.add_node("click", click)
 builder.add_node("type", type)
@@ -1065,6 +959,8 @@ builder.add_node("close_page", close_page)
 builder.add_node("wait", wait)
 builder.add_node("go_back", go_back)
 builder.add_node("go_to_search", go_to_search)
+builder.add_node("search", search)
+builder.add_node("scrape_results", scrape_results)
 builder.add_node("answer_node", answer_node)
 builder.add_node("empty_rag_store", empty_rag_store)
 builder.add_node("close_opened_link", close_opened_link)
@@ -1073,8 +969,9 @@ builder.add_node("self_review", self_review)
 
 builder.add_edge(START, "url_decide_node")
 builder.add_edge("url_decide_node", "annotate_page")
-builder.add_edge("annotate_page", "llm_call_node")
-builder.add_conditional_edges("llm_call_node", tool_router, ["annotate_page", "click", "type", "scroll_and_read", "close_page", "wait", "go_back", "go_to_search"])
+builder.add_edge("annotate_page", "rank_dom_elements")
+builder.add_edge("rank_dom_elements", "llm_call_node")
+builder.add_conditional_edges("llm_call_node", tool_router, ["annotate_page", "click", "type", "scroll_and_read", "close_page", "wait", "go_back", "go_to_search", "search", "scrape_results"])
 builder.add_edge("scroll_and_read", "web_page_rag")
 builder.add_conditional_edges("scroll_and_read", webpage_or_pdf, ["scroll_page", "scroll_pdf"])
 builder.add_edge("scroll_pdf", "note_scroll_read")
@@ -1091,5 +988,7 @@ builder.add_edge("close_page", "annotate_page")
 builder.add_edge("wait", "annotate_page")
 builder.add_edge("go_back", "annotate_page")
 builder.add_edge("go_to_search", "annotate_page")
+builder.add_edge("search", "annotate_page")
+builder.add_edge("scrape_results", "self_review")
 
 research_agent = builder.compile()
\ No newline at end of file
@@ -0,0 +1,76 @@
+from dotenv import load_dotenv
+import os
+import re
+from typing import Dict, List
+from urllib.parse import parse_qs, quote_plus, urldefrag, urlparse
+
+# Search engine used by the search actions, point it at a local stand-in for tests
+
+load_dotenv()
+
+SEARCH_ENGINE_URL = os.getenv("SEARCH_ENGINE_URL", "https://www.google.com/search?q={query}")
+
+# How many result links the scrape_results action reads at once, and how many in parallel
+RESULTS_FAN_OUT = int(os.getenv("RESULTS_FAN_OUT", "5"))
+SCRAPE_CONCURRENCY = int(os.getenv("SCRAPE_CONCURRENCY", "3"))
+
+ENGINE_HOST_RE = re.compile(r"(?:^|\.)(?:google\.[a-z.]+|gstatic\.com|googleusercontent\.com)$")
+
+
+def build_search_url(query: str) -> str:
+    """Results page URL for `query`, so a search is one navigation instead of typing into a box"""
+    if "{query}" in SEARCH_ENGINE_URL:
+        return SEARCH_ENGINE_URL.replace("{query}", quote_plus(query.strip()))
+    separator = "&" if "?" in SEARCH_ENGINE_URL else "?"
+    return f"{SEARCH_ENGINE_URL}{separator}q={quote_plus(query.strip())}"
+
+
+def search_home_url() -> str:
+    """Landing page of the configured search engine"""
+    parsed = urlparse(SEARCH_ENGINE_URL)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+def search_engine_host() -> str:
+    """Host of the configured search engine, how actions name it in the run's history"""
+    return urlparse(SEARCH_ENGINE_URL).netloc
+
+
+def is_results_page(url: str) -> bool:
+    """Whether `url` is a results page of the configured search engine"""
+    parsed = urlparse(url)
+    engine = urlparse(SEARCH_ENGINE_URL)
+    if not parsed.netloc or not (parsed.netloc == engine.netloc or ENGINE_HOST_RE.search(parsed.hostname or "")):
+        return False
+    return parsed.path == engine.path or "q=" in parsed.query
+
+
+def _result_url(href: str) -> str:
+    parsed = urlparse(href)
+    # Google sometimes wraps results in /url?q=<target>
+    if parsed.path == "/url":
+        href = parse_qs(parsed.query).get("q", [""])[0]
+    return urldefrag(href)[0]
+
+
+def select_result_links(dom_elements: List[Dict], visited_urls: List[str], k: int = RESULTS_FAN_OUT) -> List[str]:
+    """Top `k` outbound result links on a results page, in ranking order, skipping visited ones"""
+    engine_host = urlparse(SEARCH_ENGINE_URL).netloc
+    visited = {urldefrag(url)[0] for url in visited_urls}
+    links = []
+    for element in dom_elements:
+        if element["type"] != "link" or not (element.get("text") or "").strip():
+            continue
+        url = _result_url(element.get("href") or "")
+        host = urlparse(url).netloc
+        if not url.startswith(("http://", "https://")) or not host:
+            continue
+        # Skip the engine's own pages (tabs, pagination, related searches, cached copies)
+        if host == engine_host or ENGINE_HOST_RE.search(host):
+            continue
+        if url in visited or url in links:
+            continue
+        links.append(url)
+        if len(links) == k:
+            break
+    return links
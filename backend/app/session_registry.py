@@ -0,0 +1,128 @@
+from dotenv import load_dotenv
+import asyncio
+import os
+import time
+import uuid
+from typing import Dict, Optional, Set
+
+from playwright.async_api import Page
+from Browser.webrover_browser import WebRoverBrowser
+from .browser_manager import setup_browser, cleanup_browser_session
+
+load_dotenv()
+
+# Sessions without a query or request for this long hand their browser back to the pool
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "1800"))
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "60"))
+
+
+class SessionBusy(Exception):
+    """The session is running a query and can't be replaced"""
+
+
+class BrowserSession:
+    """A single tenant's pooled browser, its page and its event stream"""
+
+    def __init__(self, session_id: str, browser: WebRoverBrowser, page: Page):
+        self.session_id = session_id
+        self.browser = browser
+        self.page = page
+        self.events: asyncio.Queue = asyncio.Queue()
+        # Only one agent run may drive the session's page at a time
+        self.lock = asyncio.Lock()
+        self.created_at = time.time()
+        self.last_used = self.created_at
+
+    def touch(self):
+        self.last_used = time.time()
+
+
+class SessionRegistry:
+    """Browser sessions keyed by session id, so concurrent users never share a page.
+
+    Sessions idle for `idle_ttl` seconds are closed by `run_reaper()`, so
+    clients that go away without calling /cleanup don't keep pool browsers
+    checked out.
+    """
+
+    def __init__(self, idle_ttl: float = SESSION_IDLE_TTL, sweep_interval: float = SESSION_SWEEP_INTERVAL):
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        self._sessions: Dict[str, BrowserSession] = {}
+        # Ids with a browser being set up, a second setup for one of them would leak a pool browser
+        self._creating: Set[str] = set()
+        self._reaped = 0
+
+    def get(self, session_id: Optional[str]) -> Optional[BrowserSession]:
+        session = self._sessions.get(session_id) if session_id else None
+        if session:
+            session.touch()
+        return session
+
+    async def create(self, url: str, session_id: Optional[str] = None) -> BrowserSession:
+        """Set up a browser for the session, replacing only that session's previous browser.
+
+        Clients without a session id get a new one. Raises SessionBusy while the
+        session's browser is driven by a running query or already being set up.
+        """
+        session_id = session_id or uuid.uuid4().hex
+        if session_id in self._creating:
+            raise SessionBusy(f"Session {session_id} is already being set up")
+        existing = self._sessions.get(session_id)
+        if existing is not None:
+            if existing.lock.locked():
+                raise SessionBusy(f"Session {session_id} is running a query")
+            # Never released, a /query still holding the old session gets a 409 instead of a closed page
+            await existing.lock.acquire()
+
+        self._creating.add(session_id)
+        try:
+            await self.close(session_id)
+            browser, page = await setup_browser(url)
+            session = BrowserSession(session_id, browser, page)
+            self._sessions[session_id] = session
+        finally:
+            self._creating.discard(session_id)
+        return session
+
+    async def close(self, session_id: Optional[str]) -> bool:
+        session = self._sessions.pop(session_id, None) if session_id else None
+        if not session:
+            return False
+        await cleanup_browser_session(session.browser)
+        return True
+
+    async def reap(self) -> int:
+        """Close sessions idle past the TTL, never one that is running a query"""
+        now = time.time()
+        idle = [
+            session_id for session_id, session in self._sessions.items()
+            if not session.lock.locked() and now - session.last_used > self.idle_ttl
+        ]
+        for session_id in idle:
+            print(f"Closing session {session_id}, idle for {self.idle_ttl}s")
+            await self.close(session_id)
+        self._reaped += len(idle)
+        return len(idle)
+
+    async def run_reaper(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.reap()
+            except Exception as e:
+                print(f"Reaping idle sessions failed: {e}")
+
+    async def close_all(self):
+        for session_id in list(self._sessions):
+            await self.close(session_id)
+
+    def stats(self) -> dict:
+        return {
+            "active": len(self._sessions),
+            "running": sum(1 for s in self._sessions.values() if s.lock.locked()),
+            "reaped": self._reaped,
+        }
+
+
+session_registry = SessionRegistry()
@@ -0,0 +1,306 @@
+from dotenv import load_dotenv
+import asyncio
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import chromadb
+from langchain_chroma import Chroma
+
+from .dedup import dedup_index
+from .embedding_service import chunk_id, embedding_service
+from .executor import executor
+
+# One persistent Chroma client per process, with cached collection handles and buffered writes
+
+load_dotenv()
+
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR", "./rag_store_webpage")
+# Buffered chunks are written this often, or as soon as this many are waiting
+VECTOR_FLUSH_INTERVAL = float(os.getenv("VECTOR_FLUSH_INTERVAL", "2"))
+VECTOR_FLUSH_SIZE = int(os.getenv("VECTOR_FLUSH_SIZE", "256"))
+# Run collections idle this long are dropped even if their run never cleaned up
+VECTOR_COLLECTION_TTL = float(os.getenv("VECTOR_COLLECTION_TTL", "21600"))
+VECTOR_SWEEP_INTERVAL = float(os.getenv("VECTOR_SWEEP_INTERVAL", "600"))
+
+# Collection of callers without a run
+DEFAULT_COLLECTION = "webpage_rag"
+RUN_PREFIX = "run_"
+
+
+def run_collection(run_id: Optional[str], subtopic: Optional[int] = None) -> str:
+    """Collection of a research run, or of one subtopic of a deep research run"""
+    if not run_id:
+        return DEFAULT_COLLECTION
+    name = f"{RUN_PREFIX}{run_id}"
+    return name if subtopic is None else f"{name}_{subtopic}"
+
+
+class VectorStoreManager:
+    """Hands out long-lived Chroma handles and batches writes to them.
+
+    Writes are buffered per collection and upserted together on a timer, when
+    the buffer fills, or on demand. `search()` flushes the collection first,
+    so a query always sees every chunk stored before it.
+
+    Runs write to their own collections (see `run_collection`). They are
+    dropped when the run ends, or by `sweep()` once idle for `ttl` seconds,
+    which also removes segment directories Chroma left behind for deleted
+    collections.
+    """
+
+    def __init__(self,
+                 persist_directory: str = VECTOR_STORE_DIR,
+                 flush_interval: float = VECTOR_FLUSH_INTERVAL,
+                 flush_size: int = VECTOR_FLUSH_SIZE,
+                 ttl: float = VECTOR_COLLECTION_TTL,
+                 sweep_interval: float = VECTOR_SWEEP_INTERVAL):
+        self.persist_directory = persist_directory
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self._client = None
+        self._handles: Dict[str, Chroma] = {}
+        self._buffers: Dict[str, List[Tuple[str, str, dict, List[float]]]] = {}
+        self._last_used: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._handles_lock = threading.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._counters = {
+            "buffered": 0, "written": 0, "flushes": 0, "failed_flushes": 0,
+            "discarded": 0, "dropped": 0, "expired": 0, "orphans_removed": 0,
+        }
+
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = chromadb.PersistentClient(path=self.persist_directory)
+            return self._client
+
+    def get(self, collection: str) -> Chroma:
+        """The cached handle of a collection, created on first use"""
+        self._last_used[collection] = time.time()
+        handle = self._handles.get(collection)
+        if handle is not None:
+            return handle
+        # Opened from I/O pool threads, one handle per collection
+        with self._handles_lock:
+            handle = self._handles.get(collection)
+            if handle is None:
+                handle = Chroma(
+                    client=self.client(),
+                    collection_name=collection,
+                    embedding_function=embedding_service.as_langchain(),
+                    # Lets a later process expire collections this one left behind
+                    collection_metadata={"created_at": time.time()},
+                )
+                self._handles[collection] = handle
+        return handle
+
+    async def search(self, collection: str, query: str, k: Optional[int] = None) -> list:
+        """Chunks most similar to `query` once buffered writes are stored, every chunk when `k` is None.
+
+        Runs on the I/O pool, embedding the query can load the model and Chroma blocks on disk.
+        """
+        await self.flush(collection)
+        return await executor.run_io("vector_store_search", self._search, collection, query, k)
+
+    def _search(self, collection: str, query: str, k: Optional[int]) -> list:
+        handle = self.get(collection)
+        if k is None:
+            k = handle._collection.count()
+        # Chroma rejects a query for zero results
+        return handle.similarity_search(query, k=k) if k else []
+
+    def _ensure_flusher(self):
+        loop = asyncio.get_running_loop()
+        if self._flusher is None or self._flusher.done() or self._loop is not loop:
+            self._loop = loop
+            self._flusher = loop.create_task(self._run_flusher())
+
+    async def _run_flusher(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Scheduled vector store flush failed, retrying next time: {e}")
+
+    async def add(self, collection: str, docs: list, vectors: List[List[float]]):
+        """Buffer embedded chunks for the collection, written with the next flush"""
+        self._last_used[collection] = time.time()
+        if collection not in self._handles:
+            # Opened here, never by a flush, so a flush racing a delete can't bring the collection back
+            await executor.run_io("vector_store_open", self.get, collection)
+        buffer = self._buffers.setdefault(collection, [])
+        buffer.extend((chunk_id(doc), doc.page_content, doc.metadata, vector) for doc, vector in zip(docs, vectors))
+        self._counters["buffered"] += len(docs)
+        if len(buffer) >= self.flush_size:
+            await self.flush(collection)
+        else:
+            self._ensure_flusher()
+
+    def _upsert(self, collection: str, handle: Optional[Chroma], entries) -> bool:
+        """Write the entries through the handle they were buffered for, False if the collection was deleted since"""
+        # Later entries win when one chunk was buffered twice, Chroma rejects duplicate ids in one call
+        unique = {entry[0]: entry for entry in entries}
+        ids, documents, metadatas, embeddings = zip(*unique.values())
+        with self._write_lock:
+            if handle is None or self._handles.get(collection) is not handle:
+                return False
+            handle._collection.upsert(
+                ids=list(ids),
+                documents=list(documents),
+                metadatas=list(metadatas),
+                embeddings=list(embeddings),
+            )
+        return True
+
+    async def flush(self, collection: Optional[str] = None):
+        """Write the buffered chunks of one collection, or of all of them"""
+        for name in [collection] if collection else list(self._buffers):
+            entries = self._buffers.pop(name, None)
+            if not entries:
+                continue
+            try:
+                written = await executor.run_io("vector_store_write", self._upsert, name, self._handles.get(name), entries)
+            except Exception:
+                self._counters["failed_flushes"] += 1
+                # Put them back in front of anything buffered meanwhile
+                self._buffers[name] = entries + self._buffers.get(name, [])
+                raise
+            if not written:
+                self._counters["discarded"] += len(entries)
+                continue
+            self._counters["flushes"] += 1
+            self._counters["written"] += len(entries)
+
+    async def delete(self, collection: str):
+        """Drop a collection, its handle, its fingerprints and anything still buffered for it"""
+        self._buffers.pop(collection, None)
+        self._last_used.pop(collection, None)
+        dedup_index.clear(collection)
+        await executor.run_io("vector_store_delete", self._delete, collection)
+        self._counters["dropped"] += 1
+
+    def _delete(self, collection: str):
+        # After any write in flight, which then finds its handle gone and discards the rest
+        with self._write_lock:
+            self._handles.pop(collection, None)
+            self.client().delete_collection(collection)
+
+    def _stored(self) -> Dict[str, dict]:
+        """Name and metadata of every collection on disk"""
+        stored = {}
+        for entry in self.client().list_collections():
+            # Some Chroma versions list names only
+            if isinstance(entry, str):
+                entry = self.client().get_collection(entry)
+            stored[entry.name] = entry.metadata or {}
+        return stored
+
+    async def drop_run(self, run_id: str) -> List[str]:
+        """Drop every collection of a finished run, returns their names"""
+        prefix = run_collection(run_id)
+
+        def owned(name: str) -> bool:
+            return name == prefix or name.startswith(f"{prefix}_")
+
+        stored = await executor.run_io("vector_store_list", self._stored)
+        for name in [name for name in list(self._buffers) + list(self._handles) if owned(name) and name not in stored]:
+            # Never written, nothing on disk to delete
+            self._buffers.pop(name, None)
+            self._handles.pop(name, None)
+            self._last_used.pop(name, None)
+            dedup_index.clear(name)
+        names = [name for name in stored if owned(name)]
+        for name in names:
+            await self.delete(name)
+        return names
+
+    def _expired(self) -> List[str]:
+        now = time.time()
+        expired = []
+        for name, metadata in self._stored().items():
+            if not name.startswith(RUN_PREFIX):
+                continue
+            # Collections from earlier processes have only their creation time
+            last_used = self._last_used.get(name, metadata.get("created_at", 0))
+            if now - last_used > self.ttl:
+                expired.append(name)
+        return expired
+
+    def _sweep_orphans(self) -> int:
+        """Remove segment directories that no segment row of chroma.sqlite3 refers to"""
+        root = Path(self.persist_directory)
+        database = root / "chroma.sqlite3"
+        if not database.exists():
+            return 0
+        # Held so no write of ours creates a segment mid-sweep
+        with self._write_lock:
+            conn = sqlite3.connect(f"file:{database}?mode=ro", uri=True)
+            try:
+                live = {row[0] for row in conn.execute("SELECT id FROM segments")}
+            finally:
+                conn.close()
+            removed = 0
+            for path in root.iterdir():
+                if not path.is_dir() or path.name in live:
+                    continue
+                try:
+                    uuid.UUID(path.name)
+                except ValueError:
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        return removed
+
+    async def sweep(self) -> dict:
+        """Drop run collections idle past the TTL, then orphaned segment directories"""
+        expired = await executor.run_io("vector_store_list", self._expired)
+        for name in expired:
+            await self.delete(name)
+        orphans = await executor.run_io("vector_store_sweep", self._sweep_orphans)
+        self._counters["expired"] += len(expired)
+        self._counters["orphans_removed"] += orphans
+        return {"expired": expired, "orphans_removed": orphans}
+
+    async def run_janitor(self):
+        """Sweep at startup and every `sweep_interval` seconds after"""
+        while True:
+            try:
+                swept = await self.sweep()
+                if swept["expired"] or swept["orphans_removed"]:
+                    print(f"Vector store sweep: {swept}")
+            except Exception as e:
+                print(f"Vector store sweep failed: {e}")
+            await asyncio.sleep(self.sweep_interval)
+
+    async def close(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"Final vector store flush failed: {e}")
+
+    def stats(self) -> dict:
+        stats = dict(self._counters)
+        stats.update({
+            "open": self._client is not None,
+            "collections": sorted(self._handles),
+            "pending": {name: len(entries) for name, entries in self._buffers.items() if entries},
+        })
+        return stats
+
+
+vector_stores = VectorStoreManager()
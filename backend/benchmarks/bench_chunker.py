@@ -0,0 +1,80 @@
+"""Throughput of the token-aware chunker against the NLTK splitter it replaced.
+
+Run from backend/:
+
+    python benchmarks/bench_chunker.py
+    python benchmarks/bench_chunker.py --input paper.txt --size-mb 8
+
+The corpus is the text of the given files (or of the HTML fixtures), repeated
+up to --size-mb. Besides MB/s, it reports how many chunks of each splitter are
+longer than the embedding model's input limit, which the model truncates.
+"""
+import argparse
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from langchain_text_splitters import NLTKTextSplitter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.chunking import EMBEDDING_MODEL, chunk_text, count_tokens  # noqa: E402
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+TAG_RE = re.compile(r"<(script|style)[^>]*>.*?</\1>|<[^>]+>", re.IGNORECASE | re.DOTALL)
+
+# all-MiniLM-L6-v2 embeds at most 256 word pieces, [CLS] and [SEP] included
+MODEL_MAX_TOKENS = 256
+
+
+def load_corpus(paths, size_mb: float) -> str:
+    texts = []
+    for path in paths:
+        raw = path.read_text(encoding="utf-8", errors="replace")
+        texts.append(TAG_RE.sub(" ", raw) if path.suffix.startswith(".htm") else raw)
+    text = "\n\n".join(t.strip() for t in texts if t.strip())
+    if not text:
+        sys.exit("Empty corpus")
+    target = int(size_mb * 1024 * 1024)
+    return (text + "\n\n") * max(1, target // (len(text) + 2))
+
+
+def run(name: str, split, text: str, repeat: int):
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        chunks = split(text)
+        runs.append(time.perf_counter() - started)
+    seconds = statistics.median(runs)
+    tokens = count_tokens(chunks)
+    over = sum(1 for n in tokens if n + 2 > MODEL_MAX_TOKENS)
+    mb = len(text.encode("utf-8")) / (1024 * 1024)
+    print(f"{name:<26}{mb / seconds:>9.2f}{len(chunks):>9}{statistics.mean(tokens):>12.1f}{max(tokens):>12}{over:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", type=Path, nargs="*", help="text or HTML files, the fixtures by default")
+    parser.add_argument("--size-mb", type=float, default=2.0, help="corpus size after repetition")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs, the median is reported")
+    args = parser.parse_args()
+
+    text = load_corpus(args.input or sorted(FIXTURES_DIR.glob("*.htm*")), args.size_mb)
+    print(f"Corpus {len(text) / (1024 * 1024):.2f} MB, tokens counted with {EMBEDDING_MODEL}")
+    print(f"{'splitter':<26}{'MB/s':>9}{'chunks':>9}{'avg tokens':>12}{'max tokens':>12}{'truncated':>12}")
+
+    # Warm up the tokenizer and punkt so loading them isn't timed
+    chunk_text(text[:10000], 250, 16)
+    NLTKTextSplitter(chunk_size=1200, chunk_overlap=50).split_text(text[:10000])
+
+    for size, overlap, tokens, token_overlap in ((500, 10, 128, 8), (1200, 50, 250, 16)):
+        nltk_splitter = NLTKTextSplitter(chunk_size=size, chunk_overlap=overlap)
+        run(f"nltk {size}/{overlap} chars", nltk_splitter.split_text, text, args.repeat)
+        run(f"chunker {tokens}/{token_overlap} tokens",
+            lambda t: [chunk.text for chunk in chunk_text(t, tokens, token_overlap)], text, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
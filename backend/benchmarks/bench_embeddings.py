@@ -0,0 +1,95 @@
+"""Throughput and retrieval agreement of the ONNX int8 embeddings against PyTorch.
+
+Run from backend/:
+
+    python benchmarks/bench_embeddings.py
+    python benchmarks/bench_embeddings.py --input paper.txt notes.txt --k 5
+
+The corpus is the given files (or the HTML fixtures) chunked the way the agents
+chunk pages. Every `--query-every`th chunk's first sentence is a query. Recall@k
+is the share of PyTorch's top k chunks per query that ONNX also ranks in its
+top k.
+"""
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from langchain_huggingface import HuggingFaceEmbeddings
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.chunking import EMBEDDING_MODEL, chunk_text, split_sentences  # noqa: E402
+from app.onnx_embeddings import EMBEDDING_ONNX_FILE, OnnxEmbeddings  # noqa: E402
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+TAG_RE = re.compile(r"<(script|style)[^>]*>.*?</\1>|<[^>]+>", re.IGNORECASE | re.DOTALL)
+
+
+def load_chunks(paths, chunk_tokens: int):
+    chunks = []
+    for path in paths:
+        raw = path.read_text(encoding="utf-8", errors="replace")
+        text = TAG_RE.sub(" ", raw) if path.suffix.startswith(".htm") else raw
+        chunks.extend(chunk.text for chunk in chunk_text(text, chunk_tokens, 0))
+    return chunks
+
+
+def throughput(embeddings, chunks, repeat: int):
+    embeddings.embed_documents(chunks[:8])  # Warm up
+    started = time.perf_counter()
+    for _ in range(repeat):
+        vectors = embeddings.embed_documents(chunks)
+    seconds = time.perf_counter() - started
+    return np.array(vectors, dtype=np.float32), len(chunks) * repeat / seconds
+
+
+def top_k(queries: np.ndarray, corpus: np.ndarray, k: int) -> np.ndarray:
+    # Both backends L2-normalize, so the dot product is the cosine similarity
+    return np.argsort(-(queries @ corpus.T), axis=1)[:, :k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", type=Path, nargs="*", help="text or HTML files, the fixtures by default")
+    parser.add_argument("--chunk-tokens", type=int, default=64)
+    parser.add_argument("--query-every", type=int, default=3)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5, help="passes over the corpus when timing")
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.input or sorted(FIXTURES_DIR.glob("*.htm*")), args.chunk_tokens)
+    queries = []
+    for chunk in chunks[::args.query_every]:
+        start, end = split_sentences(chunk)[0]
+        queries.append(chunk[start:end])
+    k = min(args.k, len(chunks))
+    print(f"{len(chunks)} chunks, {len(queries)} queries, {EMBEDDING_MODEL}, ONNX file {EMBEDDING_ONNX_FILE}")
+
+    torch_embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+    onnx_embeddings = OnnxEmbeddings(EMBEDDING_MODEL)
+
+    torch_corpus, torch_rate = throughput(torch_embeddings, chunks, args.repeat)
+    onnx_corpus, onnx_rate = throughput(onnx_embeddings, chunks, args.repeat)
+    torch_queries = np.array(torch_embeddings.embed_documents(queries), dtype=np.float32)
+    onnx_queries = np.array(onnx_embeddings.embed_documents(queries), dtype=np.float32)
+
+    expected, found = top_k(torch_queries, torch_corpus, k), top_k(onnx_queries, onnx_corpus, k)
+    recall = np.mean([len(set(a) & set(b)) / k for a, b in zip(expected, found)])
+    # ONNX queries against the PyTorch-built store, the case right after switching backends
+    mixed = top_k(onnx_queries, torch_corpus, k)
+    mixed_recall = np.mean([len(set(a) & set(b)) / k for a, b in zip(expected, mixed)])
+    cosine = np.mean(np.sum(torch_corpus * onnx_corpus, axis=1))
+
+    print(f"{'backend':<10}{'chunks/s':>12}")
+    print(f"{'torch':<10}{torch_rate:>12.1f}")
+    print(f"{'onnx':<10}{onnx_rate:>12.1f}   {onnx_rate / torch_rate:.1f}x")
+    print(f"recall@{k} onnx vs torch: {recall:.3f}")
+    print(f"recall@{k} onnx queries on a torch store: {mixed_recall:.3f}")
+    print(f"mean cosine between backends: {cosine:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Compare the lxml extractor against the old BeautifulSoup one on saved HTML pages.
+
+Run from backend/:
+
+    python benchmarks/bench_html_extractor.py
+    python benchmarks/bench_html_extractor.py --fixtures ~/saved_pages --repeat 50 --scale 20
+
+Save real pages with the browser's "Save page as, HTML only" into a folder to
+benchmark them. `--scale` repeats each page's body to mimic very long pages.
+"""
+import argparse
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.extraction import extract_text_from_html  # noqa: E402
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+
+def extract_text_from_html_bs4(html_content):
+    """The extractor before the lxml rewrite, kept verbatim as the reference"""
+    try:
+        soup = BeautifulSoup(html_content, 'html.parser')
+
+        # Remove unwanted elements
+        for element in soup(['script', 'style', 'nav', 'header', 'footer', 'aside', 'advertisement']):
+            element.decompose()
+
+        # Try different content selectors in order of preference
+        content_selectors = [
+            # Academic paper selectors
+            '.ltx_document', '.paper-content', '.full-text', '.article-text',
+            # General article selectors
+            'article', 'main', '.content', '.post-content', '.entry-content',
+            '.article-body', '.story-body', '.text-content', '.main-text',
+            # Fallback selectors
+            '#content', '#main-content', '.main-content', '.container'
+        ]
+
+        text = ""
+        for selector in content_selectors:
+            elements = soup.select(selector)
+            if elements:
+                text = '\n'.join([elem.get_text(separator=' ', strip=True) for elem in elements])
+                if len(text.strip()) > 100:  # Only use if substantial content
+                    break
+
+        # If no specific content found, try body
+        if not text or len(text.strip()) < 100:
+            body = soup.find('body')
+            if body:
+                text = body.get_text(separator=' ', strip=True)
+
+        # Clean up text
+        if text:
+            # Remove excessive whitespace
+            text = re.sub(r'\s+', ' ', text)
+            # Remove common boilerplate
+            text = re.sub(r'(cookies?|privacy policy|terms of service|subscribe|newsletter).*?(?=\.|$)', '', text, flags=re.IGNORECASE)
+            # Clean up
+            text = text.strip()
+
+        return text if text and len(text.strip()) > 50 else ""
+
+    except Exception as e:
+        return ""
+
+
+def scale_page(html: str, factor: int) -> str:
+    """The page with its body content repeated `factor` times"""
+    match = re.search(r"(<body[^>]*>)(.*)(</body>)", html, flags=re.IGNORECASE | re.DOTALL)
+    if factor <= 1 or not match:
+        return html
+    return html[:match.start(2)] + match.group(2) * factor + html[match.end(2):]
+
+
+def time_ms(fn, html: str, repeat: int) -> float:
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(html)
+        runs.append((time.perf_counter() - started) * 1000)
+    return statistics.median(runs)
+
+
+def token_jaccard(a: str, b: str) -> float:
+    left, right = set(a.split()), set(b.split())
+    if not left and not right:
+        return 1.0
+    return len(left & right) / len(left | right)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", type=Path, default=FIXTURES_DIR, help="folder of saved .html pages")
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per page, the median is reported")
+    parser.add_argument("--scale", type=int, default=1, help="repeat each page's body this many times")
+    args = parser.parse_args()
+
+    pages = sorted(args.fixtures.glob("*.htm*"))
+    if not pages:
+        sys.exit(f"No .html files in {args.fixtures}")
+
+    print(f"{'page':<28}{'KB':>8}{'bs4 ms':>10}{'lxml ms':>10}{'speedup':>9}{'same':>6}{'jaccard':>9}")
+    total_old = total_new = 0.0
+    for path in pages:
+        html = scale_page(path.read_text(encoding="utf-8", errors="replace"), args.scale)
+        old_text = extract_text_from_html_bs4(html)
+        new_text = extract_text_from_html(html)
+        old_ms = time_ms(extract_text_from_html_bs4, html, args.repeat)
+        new_ms = time_ms(extract_text_from_html, html, args.repeat)
+        total_old += old_ms
+        total_new += new_ms
+        print(f"{path.name[:27]:<28}{len(html.encode()) / 1024:>8.1f}{old_ms:>10.2f}{new_ms:>10.2f}"
+              f"{old_ms / max(new_ms, 1e-6):>8.1f}x{'yes' if old_text == new_text else 'no':>6}"
+              f"{token_jaccard(old_text, new_text):>9.3f}")
+
+    print(f"{'total':<36}{total_old:>10.2f}{total_new:>10.2f}{total_old / max(total_new, 1e-6):>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,43 @@
-function captureInteractiveElements(options = {}) {
-    const DEBUG_HIGHLIGHT = options.debugHighlight || false;
-    const highlightColors = ['#FF0000', '#00FF00', '#0000FF', '#FFA500'];
-    let elementIndex = 0;
-    let highlightContainer = null;
-  
-    // --- PDF Detection ---
-    // Check if the URL ends with ".pdf" or if the document contains an embed/iframe that likely shows a PDF.
+(function () {
+  // Registered as an init script and possibly injected again into an
+  // already-loaded document, only install once per document.
+  if (window.captureInteractiveElementsDelta) return;
+
+  const highlightColors = ['#FF0000', '#00FF00', '#0000FF', '#FFA500'];
+
+  // Marks every node we add to the page so the mutation observer ignores it.
+  const OVERLAY_ATTR = 'data-webrover-overlay';
+
+  // Every overlay root we attach, so unmarkElements removes exactly those
+  // instead of scanning the page for things that look like highlights.
+  const highlightRegistry = new Set();
+
+  function registerOverlay(node) {
+    node.setAttribute(OVERLAY_ATTR, '');
+    highlightRegistry.add(node);
+    return node;
+  }
+
+  function unmarkElements() {
+    highlightRegistry.forEach((node) => node.remove());
+    highlightRegistry.clear();
+  }
+
+  // --- PDF Detection ---
+  // Check if the URL ends with ".pdf" or if the document contains an embed/iframe that likely shows a PDF.
+  function isPdfDocument() {
     const url = window.location.href.toLowerCase();
-    if (
+    return Boolean(
       url.endsWith('.pdf') ||
       document.querySelector("embed[type*='pdf']") ||
       document.querySelector("iframe[src*='.pdf']")
-    ) {
+    );
+  }
+
+  function capturePdf(debugHighlight) {
+    if (debugHighlight) {
       // Create an overlay message for PDF detection
-      const pdfOverlay = document.createElement("div");
+      const pdfOverlay = registerOverlay(document.createElement("div"));
       pdfOverlay.textContent = "PDF Detected";
       Object.assign(pdfOverlay.style, {
         position: "fixed",
@@ -27,268 +51,575 @@ function captureInteractiveElements(options = {}) {
         fontSize: "16px"
       });
       document.body.appendChild(pdfOverlay);
-      console.log("PDF viewer detected.");
-      
-      // Return a minimal representation indicating PDF detection.
-      const pdfElement = [{
-        index: 0,
-        type: "pdf",
-        xpath: "",
-        description: "PDF viewer detected",
-        text: "",
-        x: 0,
-        y: 0
-      }];
-      console.log("Interactive DOM Tree:", pdfElement);
-      return pdfElement;
-    }
-    // --- End PDF Detection ---
-  
-    // Create an overlay container for debug highlighting.
-    if (DEBUG_HIGHLIGHT) {
-        highlightContainer = document.createElement('div');
-        highlightContainer.id = 'web-agent-highlight-container';
-        Object.assign(highlightContainer.style, {
-            position: 'absolute',
-            pointerEvents: 'none',
-            top: '0',
-            left: '0',
-            width: '100%',
-            height: '100%',
-            zIndex: '2147483647'
-        });
-        document.body.appendChild(highlightContainer);
     }
-  
-    // Compute an XPath for a given element.
-    function getXPath(element) {
-        if (!element) return '';
-        if (element.id) return `//*[@id="${element.id}"]`;
-  
-        const parts = [];
-        while (element && element.nodeType === Node.ELEMENT_NODE) {
-            let index = 1;
-            let sibling = element.previousSibling;
-            while (sibling) {
-                if (sibling.nodeType === Node.ELEMENT_NODE && sibling.tagName === element.tagName) {
-                    index++;
-                }
-                sibling = sibling.previousSibling;
-            }
-            const tagName = element.tagName.toLowerCase();
-            parts.unshift(index > 1 ? `${tagName}[${index}]` : tagName);
-            element = element.parentNode;
+    console.log("PDF viewer detected.");
+
+    // Return a minimal representation indicating PDF detection.
+    const pdfElement = [{
+      index: 0,
+      type: "pdf",
+      xpath: "",
+      description: "PDF viewer detected",
+      text: "",
+      href: window.location.href,
+      x: 0,
+      y: 0
+    }];
+    console.log("Interactive DOM Tree:", pdfElement);
+    return pdfElement;
+  }
+  // --- End PDF Detection ---
+
+  // Create an overlay container for debug highlighting.
+  function createHighlightContainer() {
+    // Overlays from a previous capture would be stale, start from a clean slate
+    unmarkElements();
+    const highlightContainer = registerOverlay(document.createElement('div'));
+    highlightContainer.id = 'web-agent-highlight-container';
+    Object.assign(highlightContainer.style, {
+      position: 'absolute',
+      pointerEvents: 'none',
+      top: '0',
+      left: '0',
+      width: '100%',
+      height: '100%',
+      zIndex: '2147483647'
+    });
+    document.body.appendChild(highlightContainer);
+    return highlightContainer;
+  }
+
+  // Compute an XPath for a given element.
+  function getXPath(element) {
+    if (!element) return '';
+    if (element.id) return `//*[@id="${element.id}"]`;
+
+    const parts = [];
+    while (element && element.nodeType === Node.ELEMENT_NODE) {
+      let index = 1;
+      let sibling = element.previousSibling;
+      while (sibling) {
+        if (sibling.nodeType === Node.ELEMENT_NODE && sibling.tagName === element.tagName) {
+          index++;
         }
-        return '/' + parts.join('/');
+        sibling = sibling.previousSibling;
+      }
+      const tagName = element.tagName.toLowerCase();
+      parts.unshift(index > 1 ? `${tagName}[${index}]` : tagName);
+      element = element.parentNode;
     }
-  
-    // Heuristic to determine if an element is interactive.
-    function isInteractiveElement(element) {
-        // Exclude elements that are hidden.
-        if (!element.offsetWidth || !element.offsetHeight) return false;
-        const style = window.getComputedStyle(element);
-        if (style.display === 'none' || style.visibility === 'hidden' || style.opacity === '0') {
-            return false;
-        }
-  
-        const interactiveTags = new Set(['a', 'button', 'input', 'select', 'textarea', 'summary']);
-        const interactiveRoles = new Set([
-            'button', 'link', 'textbox', 'checkbox', 'radio', 'combobox',
-            'listbox', 'menuitem', 'menuitemcheckbox', 'menuitemradio', 'option',
-            'switch', 'searchbox'
-        ]);
-  
-        const tagName = element.tagName.toLowerCase();
-        const role = element.getAttribute('role');
-  
-        if (interactiveTags.has(tagName)) return true;
-        if (role && interactiveRoles.has(role.toLowerCase())) return true;
-        if (element.onclick || element.getAttribute('onclick')) return true;
-        if (element.getAttribute('tabindex') && element.getAttribute('tabindex') !== '-1') return true;
-  
-        return style.cursor === 'pointer';
+    return '/' + parts.join('/');
+  }
+
+  // Heuristic to determine if an element is interactive.
+  function isInteractiveElement(element) {
+    // Exclude elements that are hidden.
+    if (!element.offsetWidth || !element.offsetHeight) return false;
+    const style = window.getComputedStyle(element);
+    if (style.display === 'none' || style.visibility === 'hidden' || style.opacity === '0') {
+      return false;
     }
-  
-    // Determine a meaningful type for the element.
-    function getElementType(element) {
-      const tag = element.tagName.toLowerCase();
-    
-      // For <input> elements, return "button" for button types, else "input".
-      if (tag === "input") {
-        const inputType = element.getAttribute("type")
-          ? element.getAttribute("type").toLowerCase()
-          : "text";
-        if (["button", "submit", "reset"].includes(inputType)) {
-          return "button";
-        }
-        return "input";
-      }
-    
-      // Prioritize the actual tag: if it is a <button>, always classify as "button"
-      if (tag === "button") {
+
+    const interactiveTags = new Set(['a', 'button', 'input', 'select', 'textarea', 'summary']);
+    const interactiveRoles = new Set([
+      'button', 'link', 'textbox', 'checkbox', 'radio', 'combobox',
+      'listbox', 'menuitem', 'menuitemcheckbox', 'menuitemradio', 'option',
+      'switch', 'searchbox'
+    ]);
+
+    const tagName = element.tagName.toLowerCase();
+    const role = element.getAttribute('role');
+
+    if (interactiveTags.has(tagName)) return true;
+    if (role && interactiveRoles.has(role.toLowerCase())) return true;
+    if (element.onclick || element.getAttribute('onclick')) return true;
+    if (element.getAttribute('tabindex') && element.getAttribute('tabindex') !== '-1') return true;
+
+    return style.cursor === 'pointer';
+  }
+
+  // Determine a meaningful type for the element.
+  function getElementType(element) {
+    const tag = element.tagName.toLowerCase();
+
+    // For <input> elements, return "button" for button types, else "input".
+    if (tag === "input") {
+      const inputType = element.getAttribute("type")
+        ? element.getAttribute("type").toLowerCase()
+        : "text";
+      if (["button", "submit", "reset"].includes(inputType)) {
         return "button";
       }
-    
-      // Check the role attribute only if the tag is not already forcing a specific type.
-      const role = element.getAttribute("role");
-      if (role) {
-        const r = role.toLowerCase();
-    
-        // Special handling for combobox
-        if (r === "combobox") {
-          if (element.hasAttribute("aria-autocomplete") || element.querySelector("input")) {
-            return "input";
-          }
-          return "combobox";
-        }
-    
-        // For a role of "link", only consider it a link if the element is an <a> tag.
-        if (r === "link" && tag !== "a") {
-          return tag;
-        }
-    
-        // Return the role if it matches common interactive types.
-        if (["button", "textbox", "checkbox", "radio", "listbox", "menuitem", "switch", "searchbox"].includes(r)) {
-          return r;
+      return "input";
+    }
+
+    // Prioritize the actual tag: if it is a <button>, always classify as "button"
+    if (tag === "button") {
+      return "button";
+    }
+
+    // Check the role attribute only if the tag is not already forcing a specific type.
+    const role = element.getAttribute("role");
+    if (role) {
+      const r = role.toLowerCase();
+
+      // Special handling for combobox
+      if (r === "combobox") {
+        if (element.hasAttribute("aria-autocomplete") || element.querySelector("input")) {
+          return "input";
         }
+        return "combobox";
       }
-    
-      // For anchor tags, confirm it's a proper link.
-      if (tag === "a" && element.hasAttribute("href")) {
-        return "link";
+
+      // For a role of "link", only consider it a link if the element is an <a> tag.
+      if (r === "link" && tag !== "a") {
+        return tag;
+      }
+
+      // Return the role if it matches common interactive types.
+      if (["button", "textbox", "checkbox", "radio", "listbox", "menuitem", "switch", "searchbox"].includes(r)) {
+        return r;
       }
-      if (tag === "select") return "select";
-      if (tag === "textarea") return "textarea";
-      if (element.onclick || element.getAttribute("onclick")) return "button";
-    
-      return tag;
     }
-    
-    // Generate a description for the element.
-    function getElementDescription(element, type) {
-        let desc = element.getAttribute("aria-label");
-        if (desc && desc.trim().length > 0) return desc.trim();
-        desc = element.getAttribute("title");
-        if (desc && desc.trim().length > 0) return desc.trim();
-  
-        if (type === "link") {
-            const txt = element.textContent.trim();
-            return txt ? `Go to ${txt}` : "link";
-        }
-        if (type === "button") {
-            const txt = element.textContent.trim();
-            return txt ? txt : "button";
-        }
-        if (type === "input") {
-            const placeholder = element.getAttribute("placeholder");
-            if (placeholder && placeholder.trim().length > 0) {
-                return placeholder.trim();
-            }
-            const val = element.value;
-            if (val && val.trim().length > 0) {
-                return val.trim();
-            }
-            return "input field";
-        }
-        const txt = element.textContent.trim();
-        return txt ? txt : "";
+
+    // For anchor tags, confirm it's a proper link.
+    if (tag === "a" && element.hasAttribute("href")) {
+      return "link";
     }
-  
-    // Retrieve relevant text for the element.
-    function getElementText(element, type) {
-        if (type === "input") {
-            const value = element.value;
-            if (value && value.trim().length > 0) {
-                return value.trim();
-            }
-            const placeholder = element.getAttribute("placeholder");
-            return placeholder ? placeholder.trim() : "";
-        }
-        return element.textContent.trim();
+    if (tag === "select") return "select";
+    if (tag === "textarea") return "textarea";
+    if (element.onclick || element.getAttribute("onclick")) return "button";
+
+    return tag;
+  }
+
+  // Generate a description for the element.
+  function getElementDescription(element, type) {
+    let desc = element.getAttribute("aria-label");
+    if (desc && desc.trim().length > 0) return desc.trim();
+    desc = element.getAttribute("title");
+    if (desc && desc.trim().length > 0) return desc.trim();
+
+    if (type === "link") {
+      const txt = element.textContent.trim();
+      return txt ? `Go to ${txt}` : "link";
     }
-  
-    // Draw a colored overlay box on the element.
-    function highlightElement(element, index) {
-        if (!DEBUG_HIGHLIGHT || !highlightContainer) return;
-        const rect = element.getBoundingClientRect();
-        const color = highlightColors[index % highlightColors.length];
-  
-        const overlay = document.createElement('div');
-        Object.assign(overlay.style, {
-            position: 'absolute',
-            border: `2px solid ${color}`,
-            backgroundColor: `${color}22`,
-            top: `${rect.top + window.scrollY}px`,
-            left: `${rect.left + window.scrollX}px`,
-            width: `${rect.width}px`,
-            height: `${rect.height}px`
-        });
-  
-        const label = document.createElement('div');
-        Object.assign(label.style, {
-            position: 'absolute',
-            top: '-20px',
-            left: '0',
-            background: color,
-            color: 'white',
-            padding: '2px 4px',
-            borderRadius: '3px',
-            fontSize: '12px'
-        });
-        label.textContent = index;
-        overlay.appendChild(label);
-  
-        highlightContainer.appendChild(overlay);
+    if (type === "button") {
+      const txt = element.textContent.trim();
+      return txt ? txt : "button";
+    }
+    if (type === "input") {
+      const placeholder = element.getAttribute("placeholder");
+      if (placeholder && placeholder.trim().length > 0) {
+        return placeholder.trim();
+      }
+      const val = element.value;
+      if (val && val.trim().length > 0) {
+        return val.trim();
+      }
+      return "input field";
+    }
+    const txt = element.textContent.trim();
+    return txt ? txt : "";
+  }
+
+  // Retrieve relevant text for the element.
+  function getElementText(element, type) {
+    if (type === "input") {
+      const value = element.value;
+      if (value && value.trim().length > 0) {
+        return value.trim();
+      }
+      const placeholder = element.getAttribute("placeholder");
+      return placeholder ? placeholder.trim() : "";
+    }
+    return element.textContent.trim();
+  }
+
+  // Draw a colored overlay box on the element.
+  function highlightElement(highlightContainer, element, index) {
+    if (!highlightContainer) return;
+    const rect = element.getBoundingClientRect();
+    const color = highlightColors[index % highlightColors.length];
+
+    const overlay = document.createElement('div');
+    Object.assign(overlay.style, {
+      position: 'absolute',
+      border: `2px solid ${color}`,
+      backgroundColor: `${color}22`,
+      top: `${rect.top + window.scrollY}px`,
+      left: `${rect.left + window.scrollX}px`,
+      width: `${rect.width}px`,
+      height: `${rect.height}px`
+    });
+
+    const label = document.createElement('div');
+    Object.assign(label.style, {
+      position: 'absolute',
+      top: '-20px',
+      left: '0',
+      background: color,
+      color: 'white',
+      padding: '2px 4px',
+      borderRadius: '3px',
+      fontSize: '12px'
+    });
+    label.textContent = index;
+    overlay.appendChild(label);
+
+    highlightContainer.appendChild(overlay);
+  }
+
+  // Absolute URL a link points to, so result pages can be fetched without clicking.
+  function getElementHref(element) {
+    const anchor = element.closest('a[href]');
+    return anchor ? anchor.href : "";
+  }
+
+  function describeElement(el, index) {
+    const rect = el.getBoundingClientRect();
+    const type = getElementType(el);
+    return {
+      index: index,
+      type: type,
+      xpath: getXPath(el),
+      description: getElementDescription(el, type),
+      text: getElementText(el, type),
+      href: getElementHref(el),
+      x: rect.left + window.scrollX,
+      y: rect.top + window.scrollY
+    };
+  }
+
+  // True if any ancestor of `node` (up to, but excluding, `stop`) is in `captured`.
+  function hasCapturedAncestor(node, captured, stop) {
+    let parent = node.parentElement;
+    while (parent && parent !== stop) {
+      if (captured.has(parent)) return true;
+      parent = parent.parentElement;
+    }
+    return false;
+  }
+
+  // Walk `root` (inclusive) and return the outermost interactive elements in document order.
+  function scanInteractive(root, captured = new Set()) {
+    const found = [];
+    const consider = (node) => {
+      if (hasCapturedAncestor(node, captured, root.parentElement)) return;
+      captured.add(node);
+      found.push(node);
+    };
+    if (root !== document.body && root.nodeType === Node.ELEMENT_NODE && isInteractiveElement(root)) {
+      consider(root);
     }
-  
-    // Use a TreeWalker to traverse the document and capture interactive elements.
-    const capturedElements = [];
     const walker = document.createTreeWalker(
-        document.body,
-        NodeFilter.SHOW_ELEMENT,
-        {
-            acceptNode: (node) =>
-                isInteractiveElement(node)
-                    ? NodeFilter.FILTER_ACCEPT
-                    : NodeFilter.FILTER_SKIP
-        }
+      root,
+      NodeFilter.SHOW_ELEMENT,
+      {
+        acceptNode: (node) =>
+          !node.hasAttribute(OVERLAY_ATTR) && isInteractiveElement(node)
+            ? NodeFilter.FILTER_ACCEPT
+            : NodeFilter.FILTER_SKIP
+      }
     );
-  
     while (walker.nextNode()) {
-        const current = walker.currentNode;
-        if (capturedElements.some((el) => el.contains(current))) {
-            continue;
-        }
-        capturedElements.push(current);
-        highlightElement(current, elementIndex);
-        elementIndex++;
+      consider(walker.currentNode);
     }
-  
-    const result = capturedElements.map((el, idx) => {
-        const rect = el.getBoundingClientRect();
-        const type = getElementType(el);
-        return {
-            index: idx,
-            type: type,
-            xpath: getXPath(el),
-            description: getElementDescription(el, type),
-            text: getElementText(el, type),
-            x: rect.left + window.scrollX,
-            y: rect.top + window.scrollY
-        };
-    });
+    return found;
+  }
+
+  // Full scan, returns the complete element list with positional indices.
+  function captureInteractiveElements(options = {}) {
+    const DEBUG_HIGHLIGHT = options.debugHighlight || false;
+
+    if (isPdfDocument()) return capturePdf(DEBUG_HIGHLIGHT);
+
+    const highlightContainer = DEBUG_HIGHLIGHT ? createHighlightContainer() : null;
+    const capturedElements = scanInteractive(document.body);
+    capturedElements.forEach((el, idx) => highlightElement(highlightContainer, el, idx));
+
+    const result = capturedElements.map((el, idx) => describeElement(el, idx));
     console.log("Interactive DOM Tree:", result);
     return result;
   }
 
-    // --- Usage Example ---
-    const interactiveDomTree = captureInteractiveElements({ debugHighlight: true });
+  // --- Incremental tracking ---
+  // A MutationObserver records which parts of the DOM changed between captures,
+  // so captureInteractiveElementsDelta only rescans those subtrees and only
+  // returns the elements that were added, removed or changed.
+
+  // Past this many pending roots a full rescan is cheaper than the bookkeeping.
+  const MAX_DIRTY_NODES = 500;
+  const WATCHED_ATTRIBUTES = [
+    'class', 'style', 'hidden', 'href', 'id', 'role', 'tabindex', 'onclick', 'type',
+    'aria-label', 'aria-hidden', 'aria-disabled', 'aria-expanded', 'title', 'placeholder', 'disabled', 'open'
+  ];
+
+  // Attributes that can change what we report for the element and its neighbours.
+  // Any other watched attribute only decides whether its own element is interactive,
+  // coordinates are re-read on every capture whatever moved them.
+  function shiftsLayout(attribute) {
+    return attribute === 'href' || attribute === 'disabled' || attribute === 'hidden' || attribute.startsWith('aria-');
+  }
+
+  const tracker = {
+    sessionId: Math.random().toString(36).slice(2),
+    nextId: 0,
+    ids: new WeakMap(),      // element -> stable index
+    tracked: new Map(),      // index -> { el, record }
+    dirtyRoots: new Set(),   // subtrees whose interactive elements must be rescanned
+    touched: new Set(),      // nodes whose enclosing tracked element may have new text
+    shifted: new Set(),      // subtrees whose xpaths and records may have shifted
+    needsFull: true,
+    observer: null
+  };
+
+  function isOverlayNode(node) {
+    const el = node.nodeType === Node.ELEMENT_NODE ? node : node.parentElement;
+    return Boolean(el && el.closest(`[${OVERLAY_ATTR}]`));
+  }
+
+  function markDirty(set, node) {
+    if (tracker.needsFull) return;
+    set.add(node);
+    if (tracker.dirtyRoots.size + tracker.touched.size + tracker.shifted.size > MAX_DIRTY_NODES) {
+      tracker.needsFull = true;
+      tracker.dirtyRoots.clear();
+      tracker.touched.clear();
+      tracker.shifted.clear();
+    }
+  }
+
+  function onMutations(records) {
+    for (const record of records) {
+      if (tracker.needsFull) return;
+      if (isOverlayNode(record.target)) continue;
+
+      if (record.type === 'childList') {
+        const ownNodesOnly = [...record.addedNodes, ...record.removedNodes]
+          .every((node) => node.nodeType === Node.ELEMENT_NODE && node.hasAttribute(OVERLAY_ATTR));
+        if (ownNodesOnly) continue;
+        // Siblings after the change get new positional xpaths
+        markDirty(tracker.shifted, record.target);
+        record.addedNodes.forEach((node) => {
+          if (node.nodeType === Node.ELEMENT_NODE) markDirty(tracker.dirtyRoots, node);
+        });
+        markDirty(tracker.touched, record.target);
+      } else if (record.type === 'attributes') {
+        if (shiftsLayout(record.attributeName)) markDirty(tracker.shifted, record.target);
+        markDirty(tracker.dirtyRoots, record.target);
+      } else {
+        markDirty(tracker.touched, record.target.parentElement);
+      }
+    }
+  }
+
+  function startObserver() {
+    if (tracker.observer) tracker.observer.disconnect();
+    tracker.observer = new MutationObserver(onMutations);
+    tracker.observer.observe(document.documentElement, {
+      childList: true,
+      subtree: true,
+      attributes: true,
+      attributeFilter: WATCHED_ATTRIBUTES,
+      characterData: true
+    });
+  }
+
+  // Typing changes .value without a mutation, so form fields remember the value last reported
+  function track(index, el, record) {
+    tracker.tracked.set(index, { el, record, value: el.value });
+  }
+
+  function isInside(el, roots) {
+    for (let node = el; node; node = node.parentElement) {
+      if (roots.has(node)) return true;
+    }
+    return false;
+  }
+
+  function idFor(el) {
+    let id = tracker.ids.get(el);
+    if (id === undefined) {
+      id = tracker.nextId++;
+      tracker.ids.set(el, id);
+    }
+    return id;
+  }
+
+  function sameRecord(a, b) {
+    return a.type === b.type && a.xpath === b.xpath && a.description === b.description &&
+      a.text === b.text && a.href === b.href && a.x === b.x && a.y === b.y;
+  }
+
+  function orderedEntries() {
+    return [...tracker.tracked.values()].sort((a, b) =>
+      a.el.compareDocumentPosition(b.el) & Node.DOCUMENT_POSITION_FOLLOWING ? -1 : 1
+    );
+  }
+
+  function trackedAncestorOrSelf(node) {
+    let el = node && (node.nodeType === Node.ELEMENT_NODE ? node : node.parentElement);
+    while (el) {
+      const id = tracker.ids.get(el);
+      if (id !== undefined && tracker.tracked.has(id)) return id;
+      el = el.parentElement;
+    }
+    return undefined;
+  }
+
+  function fullRescan() {
+    tracker.tracked.clear();
+    for (const el of scanInteractive(document.body)) {
+      const index = idFor(el);
+      track(index, el, describeElement(el, index));
+    }
+    tracker.dirtyRoots.clear();
+    tracker.touched.clear();
+    tracker.shifted.clear();
+    tracker.needsFull = false;
+  }
+
+  function incrementalRescan() {
+    const added = [];
+    const removed = [];
+    const refresh = new Set();
+
+    // Tracked elements that left the document
+    for (const [index, entry] of tracker.tracked) {
+      if (!entry.el.isConnected) {
+        tracker.tracked.delete(index);
+        removed.push(index);
+      }
+    }
+
+    // Keep only the outermost connected roots
+    const roots = [...tracker.dirtyRoots].filter((root) => root.isConnected && !isOverlayNode(root));
+    const rootSet = new Set(roots);
+    const outermost = roots.filter((root) => {
+      let parent = root.parentElement;
+      while (parent) {
+        if (rootSet.has(parent)) return false;
+        parent = parent.parentElement;
+      }
+      return true;
+    });
+
+    for (const root of outermost) {
+      const enclosing = trackedAncestorOrSelf(root.parentElement);
+      if (enclosing !== undefined) {
+        // Root sits inside an element we already report, only its text can change
+        refresh.add(enclosing);
+        continue;
+      }
+
+      const before = [...tracker.tracked.entries()].filter(([, entry]) => root.contains(entry.el));
+      const found = new Set(scanInteractive(root, new Set()));
+
+      for (const [index, entry] of before) {
+        if (found.has(entry.el)) {
+          refresh.add(index);
+        } else {
+          tracker.tracked.delete(index);
+          removed.push(index);
+        }
+      }
+      for (const el of found) {
+        const index = idFor(el);
+        if (!tracker.tracked.has(index)) {
+          const record = describeElement(el, index);
+          track(index, el, record);
+          added.push(record);
+        }
+      }
+    }
+
+    for (const node of tracker.touched) {
+      const index = trackedAncestorOrSelf(node);
+      if (index !== undefined) refresh.add(index);
+    }
+
+    // Elements inside a shifted subtree are described again, the rest can at most have moved.
+    // Class and style changes, images and fonts loading or a resize move them without
+    // any mutation we watch, so their rects are read on every capture.
+    const shifted = new Set([...tracker.shifted].filter((node) => node.isConnected));
+    const moved = new Set();
+    for (const [index, entry] of tracker.tracked) {
+      if (entry.el.value !== entry.value || (shifted.size && isInside(entry.el, shifted))) {
+        refresh.add(index);
+      } else {
+        moved.add(index);
+      }
+    }
 
+    const addedIds = new Set(added.map((record) => record.index));
+    const changed = [];
+    for (const index of refresh) {
+      const entry = tracker.tracked.get(index);
+      if (!entry || addedIds.has(index)) continue;
+      const record = describeElement(entry.el, index);
+      entry.value = entry.el.value;
+      if (!sameRecord(record, entry.record)) {
+        entry.record = record;
+        changed.push(record);
+      }
+    }
+    for (const index of moved) {
+      const entry = tracker.tracked.get(index);
+      if (refresh.has(index) || addedIds.has(index)) continue;
+      const rect = entry.el.getBoundingClientRect();
+      const x = rect.left + window.scrollX;
+      const y = rect.top + window.scrollY;
+      if (x !== entry.record.x || y !== entry.record.y) {
+        entry.record = { ...entry.record, x, y };
+        changed.push(entry.record);
+      }
+    }
 
+    tracker.dirtyRoots.clear();
+    tracker.touched.clear();
+    tracker.shifted.clear();
+    return { added, removed, changed };
+  }
 
+  // Returns {mode: "full", elements} on the first call (or when `sessionId`
+  // doesn't match this document's tracker), otherwise {mode: "delta", added,
+  // removed, changed}. `order` always lists the current indices in document order.
+  function captureInteractiveElementsDelta(options = {}) {
+    const DEBUG_HIGHLIGHT = options.debugHighlight || false;
 
+    if (isPdfDocument()) {
+      tracker.needsFull = true;
+      return { mode: "full", sessionId: tracker.sessionId, elements: capturePdf(DEBUG_HIGHLIGHT), order: [0] };
+    }
 
+    if (!tracker.observer) startObserver();
 
+    let result;
+    if (tracker.needsFull || options.sessionId !== tracker.sessionId) {
+      fullRescan();
+      const entries = orderedEntries();
+      result = {
+        mode: "full",
+        elements: entries.map((entry) => entry.record),
+        order: entries.map((entry) => entry.record.index)
+      };
+    } else {
+      result = { mode: "delta", ...incrementalRescan() };
+      result.order = orderedEntries().map((entry) => entry.record.index);
+    }
+    result.sessionId = tracker.sessionId;
 
+    if (DEBUG_HIGHLIGHT) {
+      const highlightContainer = createHighlightContainer();
+      orderedEntries().forEach((entry) => highlightElement(highlightContainer, entry.el, entry.record.index));
+    }
+    return result;
+  }
 
-    
\ No newline at end of file
+  // Exposed on window so they survive being registered as an init script
+  // and can be called per step without re-sending the script source.
+  window.captureInteractiveElements = captureInteractiveElements;
+  window.captureInteractiveElementsDelta = captureInteractiveElementsDelta;
+  window.unmarkElements = unmarkElements;
+})();
@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# Tests import app and Browser the way main.py does, run from backend/:
+#
+#     python -m pytest tests
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,76 @@
+import pytest
+
+from app import chunking
+from app.chunking import chunk_text, split_sentences
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    # Word and punctuation counts instead of a downloaded tokenizer, so sizes are predictable
+    monkeypatch.setattr(chunking, "_tokenizer", lambda model: None)
+
+
+def sentences(text):
+    return [text[start:end] for start, end in split_sentences(text)]
+
+
+def test_split_sentences_at_terminal_punctuation_and_blank_lines():
+    text = "First one here. Second one?  Third one!\n\nHeading without stop\nstill heading"
+    assert sentences(text) == ["First one here.", "Second one?", "Third one!", "Heading without stop\nstill heading"]
+
+
+def test_split_sentences_keeps_abbreviations_and_initials():
+    text = "Dr. Smith et al. wrote it, e.g. in Fig. 2 of vol. 3. J. R. Tolkien agreed. The U.S. team left."
+    assert sentences(text) == [
+        "Dr. Smith et al. wrote it, e.g. in Fig. 2 of vol. 3.",
+        "J. R. Tolkien agreed.",
+        "The U.S. team left.",
+    ]
+
+
+def test_split_sentences_keeps_closing_quotes_and_lowercase_continuations():
+    text = 'He said "stop." Then he left. version 2.5 is out. it continues'
+    assert sentences(text) == ['He said "stop."', "Then he left. version 2.5 is out. it continues"]
+
+
+def test_split_sentences_offsets_exclude_surrounding_whitespace():
+    text = "  One sentence.   Two sentence.  "
+    assert split_sentences(text) == [(2, 15), (18, 31)]
+
+
+def test_chunk_offsets_index_into_the_text():
+    text = " ".join(f"Sentence number {n} has a few words." for n in range(40))
+    chunks = chunk_text(text, 30, 0)
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert text[chunk.start:chunk.end] == chunk.text
+        assert chunk.tokens <= 30
+    # Without overlap, chunks follow each other and cover every sentence
+    assert chunks[0].start == 0 and chunks[-1].end == len(text)
+    assert all(a.end < b.start for a, b in zip(chunks, chunks[1:]))
+
+
+def test_chunks_share_trailing_sentences_up_to_the_overlap():
+    text = " ".join(f"Sentence number {n} is here." for n in range(20))
+    # Each sentence is 6 estimated tokens
+    chunks = chunk_text(text, 18, 6)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        overlap = text[chunk.start:previous.end] if chunk.start < previous.end else ""
+        assert overlap == previous.text.split(". ")[-1]
+        assert chunk.tokens <= 18
+
+
+def test_overlong_sentence_is_cut_at_token_boundaries():
+    words = [f"w{n}" for n in range(25)]
+    text = "Short start. " + " ".join(words) + ". Short end."
+    chunks = chunk_text(text, 10, 0)
+    assert max(chunk.tokens for chunk in chunks) <= 10
+    assert all(text[chunk.start:chunk.end] == chunk.text for chunk in chunks)
+    # Every word of the long sentence lands in exactly one chunk
+    covered = " ".join(chunk.text for chunk in chunks)
+    assert all(covered.count(f"{word} ") + covered.count(f"{word}.") == 1 for word in words)
+
+
+def test_empty_text_has_no_chunks():
+    assert chunk_text("", 10, 2) == []
+    assert chunk_text("   \n\n  ", 10, 2) == []
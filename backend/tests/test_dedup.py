@@ -0,0 +1,76 @@
+import asyncio
+import random
+
+from langchain_core.documents import Document
+
+from app.dedup import DedupIndex, FingerprintIndex, simhash
+
+
+def flip(fingerprint, *bits):
+    for bit in bits:
+        fingerprint ^= 1 << bit
+    return fingerprint
+
+
+def test_find_matches_within_distance_only():
+    index = FingerprintIndex(distance=3)
+    stored = random.Random(1).getrandbits(64)
+    index.add(stored, "https://example.org/a")
+
+    assert index.find(stored) == "https://example.org/a"
+    # Spread over different bands and all in one band
+    assert index.find(flip(stored, 0, 20, 63)) == "https://example.org/a"
+    assert index.find(flip(stored, 0, 1, 2)) == "https://example.org/a"
+    assert index.find(flip(stored, 0, 20, 40, 63)) is None
+
+
+def test_find_checks_every_band_including_the_widest_last_one():
+    rng = random.Random(2)
+    for _ in range(200):
+        stored = rng.getrandbits(64)
+        index = FingerprintIndex(distance=2)
+        index.add(stored, "doc")
+        bits = rng.sample(range(64), 2)
+        assert index.find(flip(stored, *bits)) == "doc"
+
+
+def test_remove_forgets_every_fingerprint_of_a_value():
+    index = FingerprintIndex(distance=3)
+    rng = random.Random(3)
+    a1, a2, b = rng.getrandbits(64), rng.getrandbits(64), rng.getrandbits(64)
+    index.add(a1, "a")
+    index.add(a2, "a")
+    index.add(b, "b")
+    assert index.size == 3
+
+    index.remove("a")
+    assert index.find(a1) is None and index.find(a2) is None
+    assert index.find(b) == "b"
+    assert index.size == 1
+
+    index.remove("missing")
+    assert index.size == 1
+
+
+def test_simhash_of_near_duplicates_is_close():
+    text = " ".join(f"word{n}" for n in range(300))
+    edited = text.replace("word150", "changed", 1)
+    assert (simhash(text) ^ simhash(edited)).bit_count() <= 3
+    assert simhash("too short to fingerprint") is None
+
+
+def test_released_document_frees_its_chunks_for_a_retry():
+    async def main():
+        index = DedupIndex()
+        url = "https://example.org/a"
+        docs = [Document(page_content=" ".join(f"chunk{c} word{n}" for n in range(20)), metadata={"source": url})
+                for c in range(3)]
+        assert await index.claim_document("run", url, " ".join(doc.page_content for doc in docs)) is None
+        assert len(await index.filter_chunks("run", docs)) == 3
+        # Storing failed, the retry must not find its own chunks
+        index.release_document("run", url)
+        assert await index.claim_document("run", url, " ".join(doc.page_content for doc in docs)) is None
+        assert len(await index.filter_chunks("run", docs)) == 3
+        assert await index.filter_chunks("run", docs) == []
+
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+import asyncio
+
+from app.document_cache import DocumentCache, is_shareable, normalize_url
+
+
+def test_normalize_url_drops_fragment_tracking_params_and_default_port():
+    assert normalize_url("HTTPS://Example.org:443/a/b/?utm_source=x&b=2&a=1#top") == "https://example.org/a/b?a=1&b=2"
+    assert normalize_url("http://example.org:80") == "http://example.org/"
+    assert normalize_url("http://example.org:8080/x?gclid=1") == "http://example.org:8080/x"
+
+
+def test_normalize_url_keeps_meaningful_query_and_blank_values():
+    assert normalize_url("https://example.org/search?q=a+b&page=") == "https://example.org/search?page=&q=a+b"
+    assert normalize_url("https://example.org/a?id=1") != normalize_url("https://example.org/a?id=2")
+
+
+def test_is_shareable_rejects_credentials_and_private_responses():
+    assert is_shareable({"Content-Type": "text/html", "Cache-Control": "max-age=60"}, {"Accept": "*/*"})
+    assert not is_shareable({"Set-Cookie": "session=1"})
+    assert not is_shareable({}, {"Cookie": "session=1"})
+    assert not is_shareable({}, {"Authorization": "Bearer token"})
+    assert not is_shareable({"Cache-Control": "private, max-age=0"})
+    assert not is_shareable({"cache-control": "no-store"})
+
+
+def test_fresh_entries_are_served_and_shared_by_url_variants(tmp_path):
+    async def main():
+        cache = DocumentCache(root=tmp_path, fresh_for=3600)
+        await cache.put("https://example.org/a?utm_medium=x", "article text", title="A")
+        cached = await cache.get("https://example.org/a#section")
+        assert cached is not None and cached.text == "article text" and cached.title == "A"
+        assert await cache.get("https://example.org/b") is None
+        assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    asyncio.run(main())
+
+
+def test_stale_entries_without_validators_are_dropped(tmp_path):
+    async def main():
+        cache = DocumentCache(root=tmp_path, fresh_for=-1)
+        await cache.put("https://example.org/a", "article text")
+        assert await cache.get("https://example.org/a") is None
+        assert not await cache.contains("https://example.org/a")
+        assert cache.stats()["entries"] == 0 and cache.stats()["bytes"] == 0
+
+    asyncio.run(main())
+
+
+def test_stale_entries_confirmed_by_the_origin_are_served(tmp_path):
+    async def main():
+        cache = DocumentCache(root=tmp_path, fresh_for=-1)
+        checked = []
+
+        async def revalidate(url, etag, last_modified):
+            checked.append((url, etag, last_modified))
+            return True
+
+        cache._revalidate = revalidate
+        await cache.put("https://example.org/a", "article text", etag='"v1"')
+        cached = await cache.get("https://example.org/a")
+        assert cached is not None and cached.text == "article text"
+        assert checked == [("https://example.org/a", '"v1"', None)]
+
+    asyncio.run(main())
+
+
+def test_entries_past_max_age_are_dropped_without_revalidating(tmp_path):
+    async def main():
+        cache = DocumentCache(root=tmp_path, fresh_for=-1, max_age=-1)
+
+        async def revalidate(url, etag, last_modified):
+            raise AssertionError("expired entries must not be revalidated")
+
+        cache._revalidate = revalidate
+        await cache.put("https://example.org/a", "article text", etag='"v1"')
+        assert await cache.get("https://example.org/a") is None
+
+    asyncio.run(main())
+
+
+def test_eviction_drops_least_recently_used_entries_under_the_cap(tmp_path):
+    async def main():
+        cache = DocumentCache(root=tmp_path, max_bytes=250)
+        await cache.put("https://example.org/1", "a" * 100)
+        await cache.put("https://example.org/2", "b" * 100)
+        # Touched, so the second page is now the least recently used
+        assert await cache.get("https://example.org/1") is not None
+        await cache.put("https://example.org/3", "c" * 100)
+
+        assert await cache.contains("https://example.org/1")
+        assert not await cache.contains("https://example.org/2")
+        assert await cache.contains("https://example.org/3")
+        assert cache.stats()["bytes"] == 200 and cache.stats()["entries"] == 2
+
+    asyncio.run(main())
+
+
+def test_urls_sharing_a_blob_count_its_bytes_once(tmp_path):
+    async def main():
+        cache = DocumentCache(root=tmp_path)
+        await cache.put("https://example.org/original", "same text")
+        await cache.put("https://mirror.example.net/copy", "same text")
+        assert cache.stats()["entries"] == 2 and cache.stats()["bytes"] == len("same text")
+
+        # Replacing one URL's text keeps the blob the other one still uses
+        await cache.put("https://example.org/original", "new text")
+        assert (await cache.get("https://mirror.example.net/copy")).text == "same text"
+        assert cache.stats()["bytes"] == len("same text") + len("new text")
+
+    asyncio.run(main())
@@ -0,0 +1,23 @@
+from app.pdf_pipeline import select_pages
+
+
+def test_select_pages_reads_short_documents_whole():
+    assert select_pages(5, max_pages=40) == [0, 1, 2, 3, 4]
+    assert select_pages(40, max_pages=40) == list(range(40))
+
+
+def test_select_pages_reads_head_then_tail_then_middle():
+    assert select_pages(100, max_pages=8, head=3, tail=2) == [0, 1, 2, 98, 99, 3, 4, 5]
+
+
+def test_select_pages_never_exceeds_budget_or_repeats_pages():
+    for page_count in range(1, 60):
+        for max_pages in (1, 4, 10):
+            pages = select_pages(page_count, max_pages=max_pages, head=6, tail=3)
+            assert len(pages) == min(page_count, max_pages)
+            assert len(set(pages)) == len(pages)
+            assert all(0 <= n < page_count for n in pages)
+
+
+def test_select_pages_head_larger_than_budget():
+    assert select_pages(50, max_pages=4, head=10, tail=5) == [0, 1, 2, 3]
@@ -0,0 +1,40 @@
+from app.search import select_result_links
+
+
+def link(href, text="Result"):
+    return {"type": "link", "href": href, "text": text}
+
+
+def test_select_result_links_keeps_ranking_order_and_skips_engine_pages():
+    elements = [
+        link("https://www.google.com/search?q=next&start=10", "Next"),
+        link("https://example.org/a"),
+        {"type": "button", "href": "https://example.org/button", "text": "Button"},
+        link("https://maps.google.com/place"),
+        link("https://example.net/b"),
+    ]
+    assert select_result_links(elements, [], k=5) == ["https://example.org/a", "https://example.net/b"]
+
+
+def test_select_result_links_unwraps_redirects_and_drops_fragments():
+    elements = [
+        link("https://www.google.com/url?q=https://example.org/page&sa=U"),
+        link("https://example.org/page#section"),
+        link("https://example.com/other#top"),
+    ]
+    assert select_result_links(elements, [], k=5) == ["https://example.org/page", "https://example.com/other"]
+
+
+def test_select_result_links_skips_visited_textless_and_relative_links():
+    elements = [
+        link("https://example.org/seen"),
+        link("https://example.org/icon", text="  "),
+        link("/relative/path"),
+        link("https://example.org/new"),
+    ]
+    assert select_result_links(elements, ["https://example.org/seen#frag"], k=5) == ["https://example.org/new"]
+
+
+def test_select_result_links_stops_at_k():
+    elements = [link(f"https://example.org/{n}") for n in range(10)]
+    assert select_result_links(elements, [], k=3) == [f"https://example.org/{n}" for n in range(3)]
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("chromadb")
+pytest.importorskip("langchain_chroma")
+
+from langchain_core.documents import Document  # noqa: E402
+
+from app.vector_store import VectorStoreManager, run_collection  # noqa: E402
+
+
+def embedded(texts, url="https://example.org/a"):
+    docs = [Document(page_content=text, metadata={"source": url, "chunk_index": n}) for n, text in enumerate(texts)]
+    # Vectors are given, nothing here loads the embedding model
+    vectors = [[float(n), 1.0, 0.0] for n in range(len(texts))]
+    return docs, vectors
+
+
+def manager(tmp_path, **kwargs):
+    kwargs.setdefault("flush_interval", 3600)
+    kwargs.setdefault("flush_size", 1000)
+    return VectorStoreManager(persist_directory=str(tmp_path), **kwargs)
+
+
+def test_run_collection_names():
+    assert run_collection(None) == "webpage_rag"
+    assert run_collection("abc") == "run_abc"
+    assert run_collection("abc", 2) == "run_abc_2"
+
+
+def test_writes_are_buffered_until_flushed(tmp_path):
+    async def main():
+        stores = manager(tmp_path)
+        await stores.add("run_a", *embedded(["one", "two"]))
+        assert stores.stats()["pending"] == {"run_a": 2}
+        assert stores.get("run_a")._collection.count() == 0
+
+        await stores.flush()
+        assert stores.get("run_a")._collection.count() == 2
+        assert stores.stats()["written"] == 2 and stores.stats()["pending"] == {}
+        await stores.close()
+
+    asyncio.run(main())
+
+
+def test_full_buffer_flushes_on_add(tmp_path):
+    async def main():
+        stores = manager(tmp_path, flush_size=2)
+        await stores.add("run_a", *embedded(["one", "two", "three"]))
+        assert stores.get("run_a")._collection.count() == 3
+        await stores.close()
+
+    asyncio.run(main())
+
+
+def test_flush_racing_delete_never_recreates_the_collection(tmp_path):
+    async def main():
+        stores = manager(tmp_path)
+        for attempt in range(5):
+            name = f"run_race_{attempt}"
+            await stores.add(name, *embedded(["one", "two", "three"]))
+            # The flush is on the I/O pool when the delete starts, whichever takes the write lock first
+            flush = asyncio.create_task(stores.flush(name))
+            await asyncio.sleep(0)
+            await stores.delete(name)
+            await flush
+
+            assert name not in await asyncio.to_thread(stores._stored)
+            assert name not in stores.stats()["collections"]
+        await stores.close()
+
+    asyncio.run(main())
+
+
+def test_entries_buffered_before_a_delete_are_discarded(tmp_path):
+    async def main():
+        stores = manager(tmp_path)
+        await stores.add("run_a", *embedded(["one"]))
+        handle = stores.get("run_a")
+        await stores.delete("run_a")
+
+        # A write that was already holding the old handle finds it gone
+        assert stores._upsert("run_a", handle, [("id", "one", {"source": "x"}, [0.0, 1.0, 0.0])]) is False
+        assert "run_a" not in stores._stored()
+        await stores.close()
+
+    asyncio.run(main())
+
+
+def test_drop_run_removes_every_collection_of_the_run(tmp_path):
+    async def main():
+        stores = manager(tmp_path)
+        for name in (run_collection("r1"), run_collection("r1", 0), run_collection("r1", 1), run_collection("r10")):
+            await stores.add(name, *embedded(["one"]))
+        await stores.flush()
+        # Still buffered, its collection was opened by the add
+        await stores.add(run_collection("r1", 2), *embedded(["two"]))
+
+        dropped = await stores.drop_run("r1")
+        assert sorted(dropped) == ["run_r1", "run_r1_0", "run_r1_1", "run_r1_2"]
+        assert set(stores._stored()) == {"run_r10"}
+        assert stores.stats()["pending"] == {}
+        await stores.close()
+
+    asyncio.run(main())
@@ -6,6 +6,7 @@ import { ResponseDisplay } from '@/components/rover/ResponseDisplay';
 import { QueryInput } from '@/components/rover/QueryInput';
 import { ParticlesBackground } from '@/components/ui/ParticlesBackground';
 import { ToggleSwitch } from '@/components/ui/ToggleSwitch';
+import { getSessionId } from '@/lib/utils';
 
 interface Message {
   type: 'thought' | 'action' | 'dom_update' | 'interaction' | 'browser_action' | 
@@ -28,6 +29,8 @@ export default function AgentPage() {
     try {
       const response = await fetch('http://localhost:8000/cleanup', {
         method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ session_id: getSessionId() }),
       });
       
       if (!response.ok) {
@@ -152,7 +155,8 @@ export default function AgentPage() {
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
           query: currentQuery,
-          agent_type: currentAgent 
+          agent_type: currentAgent,
+          session_id: getSessionId()
         }),
       });
 
@@ -3,6 +3,7 @@
 import { useRouter } from 'next/navigation';
 import { useState } from 'react';
 import { SpotlightCard } from '@/components/ui/SpotlightCard';
+import { getSessionId } from '@/lib/utils';
 
 export default function Home() {
   const router = useRouter();
@@ -20,7 +21,7 @@ export default function Home() {
         headers: {
           'Content-Type': 'application/json',
         },
-        body: JSON.stringify({ url: 'https://www.google.com' }),
+        body: JSON.stringify({ url: 'https://www.google.com', session_id: getSessionId() }),
       });
       
       console.log('Response status:', response.status);
@@ -6,6 +6,7 @@ import { createRoot } from 'react-dom/client';
 import ReactMarkdown from 'react-markdown';
 import remarkGfm from 'remark-gfm';
 import { markdownComponents } from './ResponseDisplay';
+import { getSessionId } from '@/lib/utils';
 
 interface ResponseActionsProps {
   content: string;
@@ -35,7 +36,7 @@ export function ResponseActions({ content, isResearchResponse }: ResponseActions
         headers: {
           'Content-Type': 'application/json',
         },
-        body: JSON.stringify({ content }),
+        body: JSON.stringify({ content, session_id: getSessionId() }),
       });
 
       if (!response.ok) {
@@ -3,4 +3,16 @@ import { twMerge } from 'tailwind-merge';
 
 export function cn(...inputs: ClassValue[]) {
   return twMerge(clsx(inputs));
-}
\ No newline at end of file
+}
+
+const SESSION_KEY = 'agentr_session_id';
+
+// Each browser tab drives its own backend browser session
+export function getSessionId(): string {
+  let sessionId = sessionStorage.getItem(SESSION_KEY);
+  if (!sessionId) {
+    sessionId = crypto.randomUUID();
+    sessionStorage.setItem(SESSION_KEY, sessionId);
+  }
+  return sessionId;
+}